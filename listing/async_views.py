@@ -0,0 +1,92 @@
+"""
+Асинхронные (ASGI) обработчики чтения объектов жилья:
+
+- GET /api/async/properties/ — как list у PropertyViewSet;
+- GET /api/async/properties/<id>/ — как retrieve.
+
+Фильтры, поиск, сортировка, пагинация, кэш ответов и учет просмотров —
+те же, что в PropertyViewSet: queryset строится его же filter_backends,
+а выполняется асинхронным ORM (aiterator / aget). Под ASGI такой запрос
+не занимает поток на все время обработки.
+"""
+from asgiref.sync import sync_to_async
+from django.views import View
+from rest_framework import status
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+
+from .cache import property_cache
+from .counters import view_counter
+from .history import search_history_buffer, view_history_buffer
+from .views import PropertyViewSet
+
+
+class AsyncPropertyView(View):
+    http_method_names = ['get', 'head', 'options']
+
+    # Размер пачки aiterator: prefetch категорий выполняется на каждую пачку
+    chunk_size = 2000
+
+    def get_viewset(self, request, action, **kwargs):
+        viewset = PropertyViewSet(action_map={'get': action}, kwargs=kwargs, format_kwarg=None, args=())
+        viewset.request = viewset.initialize_request(request, **kwargs)
+        viewset.headers = viewset.default_response_headers
+        return viewset
+
+    async def get_user(self, viewset):
+        # Аутентификация может обратиться к БД; без заголовка Authorization она не нужна
+        if 'HTTP_AUTHORIZATION' not in viewset.request.META:
+            return None
+        user = await sync_to_async(lambda: viewset.request.user)()
+        return user if user.is_authenticated else None
+
+    async def get(self, request, pk=None):
+        if pk is None:
+            viewset = self.get_viewset(request, 'list')
+        else:
+            viewset = self.get_viewset(request, 'retrieve', pk=pk)
+        try:
+            viewset.check_permissions(viewset.request)
+            user = await self.get_user(viewset)
+            if pk is None:
+                response = await self.list(viewset, user)
+            else:
+                response = await self.retrieve(viewset, user, pk)
+        except Exception as exc:
+            response = viewset.handle_exception(exc)
+        response = viewset.finalize_response(viewset.request, response)
+        return response.render()
+
+    async def list(self, viewset, user):
+        request = viewset.request
+        search_query = request.query_params.get('search', None)
+        if search_query and user is not None:
+            await sync_to_async(search_history_buffer.add)(user_id=user.pk, keyword=search_query[:255])
+
+        async def compute():
+            queryset = viewset.filter_queryset(viewset.get_queryset())
+            page = await viewset.paginator.apaginate_queryset(queryset, request, viewset)
+            if page is not None:
+                return viewset.paginator.get_paginated_response(viewset.get_serializer(page, many=True).data)
+            properties = [prop async for prop in queryset.aiterator(chunk_size=self.chunk_size)]
+            return Response(viewset.get_serializer(properties, many=True).data)
+
+        return await property_cache.arespond(request, lambda: property_cache.alist_key(request), compute)
+
+    async def retrieve(self, viewset, user, pk):
+        request = viewset.request
+
+        async def compute():
+            queryset = viewset.filter_queryset(viewset.get_queryset())
+            try:
+                instance = await queryset.aget(pk=pk)
+            except queryset.model.DoesNotExist:
+                raise NotFound()
+            return Response(viewset.get_serializer(instance).data)
+
+        response = await property_cache.arespond(request, lambda: property_cache.adetail_key(pk), compute)
+        if response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            view_counter.incr(pk)
+            if user is not None:
+                await sync_to_async(view_history_buffer.add)(user_id=user.pk, property_id=pk)
+        return response
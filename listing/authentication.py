@@ -0,0 +1,144 @@
+import hashlib
+import hmac
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.crypto import salted_hmac
+from rest_framework.authentication import BasicAuthentication
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from .metrics import registry
+from .revocation import check_not_revoked
+
+
+def auth_cache():
+    return caches[settings.AUTH_CACHE['ALIAS']]
+
+
+def user_cache_key(user_id):
+    return f'auth:user:{user_id}'
+
+
+# Поля пользователя, которые хранятся в кэше; хэш пароля туда не попадает
+CACHED_USER_FIELDS = ('id', 'username', 'email', 'first_name', 'last_name', 'role', 'is_active', 'is_staff', 'is_superuser')
+
+
+def cached_field_names():
+    # from_db ждет значения в порядке полей модели
+    return [field.attname for field in get_user_model()._meta.concrete_fields if field.attname in CACHED_USER_FIELDS]
+
+
+def get_cached_user(user_id):
+    """
+    Пользователь по первичному ключу через кэш (settings.AUTH_CACHE['USER_TTL']).
+    Запись удаляется при сохранении и удалении пользователя (см. listing.signals).
+
+    В кэше только CACHED_USER_FIELDS и производные от хэша пароля значения для проверок
+    (password_fingerprint, хэш для REVOKE_TOKEN_CLAIM). Пользователь собирается через
+    from_db: остальные поля отложены и читаются из базы при обращении, а save()
+    записывает только загруженные поля.
+    """
+    key = user_cache_key(user_id)
+    cached = auth_cache().get(key)
+    if cached is not None:
+        registry.incr('auth.user_cache.hits')
+    else:
+        registry.incr('auth.user_cache.misses')
+        User = get_user_model()
+        try:
+            user = User.objects.get(**{jwt_settings.USER_ID_FIELD: user_id})
+        except User.DoesNotExist:
+            return None
+        cached = (
+            [getattr(user, name) for name in cached_field_names()],
+            password_fingerprint(user),
+            get_md5_hash_password(user.password),
+        )
+        auth_cache().set(key, cached, settings.AUTH_CACHE['USER_TTL'])
+
+    values, fingerprint, token_password_hash = cached
+    user = get_user_model().from_db(DEFAULT_DB_ALIAS, cached_field_names(), values)
+    user._password_fingerprint = fingerprint
+    user._token_password_hash = token_password_hash
+    return user
+
+
+def invalidate_user(user):
+    auth_cache().delete(user_cache_key(getattr(user, jwt_settings.USER_ID_FIELD)))
+
+
+def password_fingerprint(user):
+    # В кэш попадает не сам хэш пароля, а его HMAC
+    return salted_hmac('listing.authentication.password', user.password).hexdigest()
+
+
+class CachedBasicAuthentication(BasicAuthentication):
+    """
+    BasicAuthentication без PBKDF2 на каждый запрос.
+
+    Успешная проверка пары логин/пароль запоминается на
+    settings.AUTH_CACHE['CREDENTIALS_TTL'] секунд под ключом HMAC(SECRET_KEY, логин:пароль).
+    Запись действительна, пока у пользователя тот же хэш пароля и он активен:
+    смена пароля или деактивация сохраняют пользователя и сбрасывают его кэш,
+    после чего сохраненный отпечаток пароля перестает совпадать.
+    Неудачные попытки не кэшируются.
+    """
+
+    def credentials_key(self, userid, password):
+        digest = hmac.new(
+            settings.SECRET_KEY.encode(), f'{userid}:{password}'.encode(), hashlib.sha256
+        ).hexdigest()
+        return f'auth:basic:{digest}'
+
+    def authenticate_credentials(self, userid, password, request=None):
+        key = self.credentials_key(userid, password)
+        cached = auth_cache().get(key)
+        if cached is not None:
+            user_id, fingerprint = cached
+            user = get_cached_user(user_id)
+            if user is not None and user.is_active and hmac.compare_digest(user._password_fingerprint, fingerprint):
+                registry.incr('auth.basic_cache.hits')
+                return user, None
+            auth_cache().delete(key)
+
+        registry.incr('auth.basic_cache.misses')
+        user, auth = super().authenticate_credentials(userid, password, request)
+        user_id = getattr(user, jwt_settings.USER_ID_FIELD)
+        auth_cache().set(key, (user_id, password_fingerprint(user)), settings.AUTH_CACHE['CREDENTIALS_TTL'])
+        return user, auth
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication, который берет пользователя из кэша, а не из базы на каждый запрос,
+    и отклоняет отозванные токены (см. listing.revocation).
+    """
+
+    def get_validated_token(self, raw_token):
+        validated_token = super().get_validated_token(raw_token)
+        check_not_revoked(validated_token)
+        return validated_token
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[jwt_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken('Token contained no recognizable user identification')
+
+        user = get_cached_user(user_id)
+        if user is None:
+            raise AuthenticationFailed('User not found', code='user_not_found')
+
+        if not user.is_active:
+            raise AuthenticationFailed('User is inactive', code='user_inactive')
+
+        if jwt_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(jwt_settings.REVOKE_TOKEN_CLAIM) != user._token_password_hash:
+                raise AuthenticationFailed("The user's password has been changed.", code='password_changed')
+
+        return user
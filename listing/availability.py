@@ -0,0 +1,157 @@
+from bisect import bisect_left
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from rest_framework import serializers
+
+from .models import Booking, Property
+
+# Статусы бронирований, которые занимают даты
+ACTIVE_STATUSES = ('pending', 'confirmed')
+
+# Максимальная длина окна для запроса свободных дат
+MAX_AVAILABILITY_WINDOW = timedelta(days=730)
+
+# Максимальная длина бронирования: бронирование, пересекающее дату, начинается
+# не раньше чем за MAX_BOOKING_LENGTH до нее, поэтому поиск пересечений читает
+# ограниченный диапазон индекса (property, start_date), а не всю историю объекта
+MAX_BOOKING_LENGTH = timedelta(days=365)
+
+
+class IntervalIndex:
+    """
+    Отсортированный по началу список непересекающихся полуинтервалов [start, end).
+
+    Начало окна в free_ranges ищется бинарным поиском по началам интервалов.
+    Дата выезда (end_date) не занята: следующее бронирование может начинаться в этот день.
+    """
+
+    def __init__(self, intervals=()):
+        # Пересекающиеся исходные интервалы (например, старые двойные брони) склеиваются
+        self._starts = []
+        self._intervals = []
+        for start, end in sorted(intervals):
+            if self._intervals and start < self._intervals[-1][1]:
+                self._intervals[-1] = (self._intervals[-1][0], max(end, self._intervals[-1][1]))
+                continue
+            self._starts.append(start)
+            self._intervals.append((start, end))
+
+    def __len__(self):
+        return len(self._intervals)
+
+    def __iter__(self):
+        return iter(self._intervals)
+
+    def free_ranges(self, start, end):
+        """
+        Свободные промежутки внутри [start, end).
+        """
+        ranges = []
+        cursor = start
+        position = max(bisect_left(self._starts, start) - 1, 0)
+        for busy_start, busy_end in self._intervals[position:]:
+            if busy_start >= end:
+                break
+            if busy_end <= cursor:
+                continue
+            if busy_start > cursor:
+                ranges.append((cursor, busy_start))
+            cursor = max(cursor, busy_end)
+        if cursor < end:
+            ranges.append((cursor, end))
+        return ranges
+
+
+def active_bookings(property_id):
+    return Booking.objects.filter(property_id=property_id, status__in=ACTIVE_STATUSES)
+
+
+def overlapping(bookings, start_date, end_date):
+    """
+    Бронирования, пересекающиеся с [start_date, end_date).
+
+    Условие пересечения проверяется целиком (`start < end AND end > start`):
+    в старых данных активные бронирования могут пересекаться, поэтому
+    ближайшего бронирования до end_date недостаточно. Нижняя граница
+    start_date из MAX_BOOKING_LENGTH ограничивает диапазон индекса.
+    """
+    return bookings.filter(
+        start_date__gte=start_date - MAX_BOOKING_LENGTH, start_date__lt=end_date, end_date__gt=start_date,
+    )
+
+
+def find_conflict(property_id, start_date, end_date, exclude_id=None):
+    """
+    Ищет активное бронирование объекта, пересекающееся с [start_date, end_date).
+    """
+    bookings = overlapping(active_bookings(property_id), start_date, end_date)
+    if exclude_id is not None:
+        bookings = bookings.exclude(pk=exclude_id)
+    return bookings.order_by('start_date').only('id', 'start_date', 'end_date').first()
+
+
+def available_between(queryset, date_from, date_to):
+    """
+    Оставляет в queryset объектов жилья только свободные в [date_from, date_to).
+
+    Выполняется одним запросом с коррелированным подзапросом NOT EXISTS по индексу
+    (property, start_date): нет активного бронирования, пересекающегося с окном.
+    """
+    bookings = Booking.objects.filter(property=OuterRef('pk'), status__in=ACTIVE_STATUSES)
+    return queryset.filter(~Exists(overlapping(bookings, date_from, date_to)))
+
+
+def load_index(property_id, date_from, date_to):
+    """
+    Строит IntervalIndex по активным бронированиям, пересекающимся с [date_from, date_to).
+    """
+    bookings = overlapping(active_bookings(property_id), date_from, date_to)
+    return IntervalIndex(bookings.values_list('start_date', 'end_date'))
+
+
+def free_ranges(property_id, date_from, date_to):
+    return load_index(property_id, date_from, date_to).free_ranges(date_from, date_to)
+
+
+def lock_property(property_id):
+    """
+    Блокирует строку объекта до конца транзакции, чтобы параллельные
+    бронирования одного объекта проверялись и сохранялись по очереди.
+    """
+    return Property.objects.select_for_update().filter(pk=property_id).values_list('pk', flat=True).first()
+
+
+def save_booking(serializer, **kwargs):
+    """
+    Сохраняет бронирование через serializer.save(), отклоняя пересечения
+    с другими активными бронированиями объекта.
+    """
+    instance = serializer.instance
+    data = serializer.validated_data
+
+    def current(field, default=None):
+        if field in data:
+            return data[field]
+        return getattr(instance, field) if instance is not None else default
+
+    status = current('status', 'pending')
+    prop = current('property')
+
+    with transaction.atomic():
+        if status in ACTIVE_STATUSES:
+            lock_property(prop.pk)
+            conflict = find_conflict(
+                prop.pk,
+                current('start_date'),
+                current('end_date'),
+                exclude_id=instance.pk if instance is not None else None,
+            )
+            if conflict is not None:
+                raise serializers.ValidationError({
+                    'non_field_errors': [
+                        f'Объект уже забронирован с {conflict.start_date} по {conflict.end_date}.'
+                    ]
+                })
+        return serializer.save(**kwargs)
@@ -0,0 +1,63 @@
+import atexit
+import logging
+import os
+import threading
+
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundFlusher:
+    """
+    Базовый класс для буферов, которые периодически сбрасываются в БД
+    из фонового потока.
+
+    Поток запускается лениво при первой записи (после fork воркера
+    запускается заново), при завершении процесса буфер сбрасывается
+    через atexit. Если `flush_interval` равен 0, фоновый поток не
+    создается и сброс выполняется только явно.
+    """
+    name = 'flusher'
+
+    def __init__(self):
+        self._thread = None
+        self._thread_pid = None
+        self._thread_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        atexit.register(self.flush)
+
+    @property
+    def flush_interval(self):
+        raise NotImplementedError
+
+    def flush(self):
+        raise NotImplementedError
+
+    def is_running(self):
+        return self._thread is not None and self._thread_pid == os.getpid()
+
+    def ensure_started(self):
+        if not self.flush_interval or self.is_running():
+            return
+        with self._thread_lock:
+            if self.is_running():
+                return
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread_pid = os.getpid()
+            self._thread.start()
+
+    def wakeup(self):
+        self._wakeup.set()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Background flush failed: %s', self.name)
+            finally:
+                # Соединения этого потока не должны висеть между сбросами
+                connections.close_all()
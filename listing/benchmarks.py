@@ -0,0 +1,730 @@
+"""
+Сценарии для `python manage.py benchmark <scenario>`.
+
+Каждый сценарий создает свои данные внутри транзакции, которая в конце
+откатывается, поэтому бенчмарк можно запускать на рабочей копии базы.
+Сценарии с `rollback=False` обращаются к БД из других потоков и поэтому
+фиксируют данные, а в конце удаляют их сами.
+"""
+import asyncio
+import base64
+import itertools
+import os
+import random
+import statistics
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Max
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings
+from django.utils import timezone
+from rest_framework.authentication import BasicAuthentication
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework.views import APIView
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import availability, bitmaps, facets, geo, profiling
+from .authentication import CachedBasicAuthentication, CachedJWTAuthentication
+from .bitmaps import bitmap_index
+from .filters import PropertyFilter
+from .metrics import registry
+from .models import Booking, Category, Notification, PopularityWatermark, Property, User, ViewHistory
+from .popularity import get_sources, update_popularity, with_trending
+from .profiling import perf_buffer, summarize
+from .recommendations import build_similarity, recommend
+from .streaming import event_stream, notification_hub
+
+SCENARIOS = {}
+
+
+def scenario(name, default_scale, rollback=True):
+    def register(func):
+        func.default_scale = default_scale
+        func.rollback = rollback
+        SCENARIOS[name] = func
+        return func
+    return register
+
+
+@contextmanager
+def rollback():
+    with transaction.atomic():
+        yield
+        transaction.set_rollback(True)
+
+
+def measure(func, repeat):
+    durations = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - started)
+    return durations
+
+
+def report(out, label, durations):
+    durations = sorted(durations)
+    p95 = durations[min(len(durations) - 1, int(len(durations) * 0.95))]
+    p99 = durations[min(len(durations) - 1, int(len(durations) * 0.99))]
+    out.write(
+        f'{label:<40} mean {statistics.mean(durations) * 1000:8.3f} ms   '
+        f'p50 {statistics.median(durations) * 1000:8.3f} ms   p95 {p95 * 1000:8.3f} ms   p99 {p99 * 1000:8.3f} ms'
+    )
+    return statistics.mean(durations)
+
+
+def api_client():
+    return APIClient(SERVER_NAME='localhost')
+
+
+def create_users():
+    owner = User.objects.create(username='bench-landlord', email='bench-landlord@example.com', role='landlord')
+    tenant = User.objects.create(username='bench-tenant', email='bench-tenant@example.com', role='tenant')
+    return owner, tenant
+
+
+@scenario('availability', default_scale=5000)
+def availability_overlap(out, scale, repeat, rng):
+    """
+    Проверка пересечения бронирований: диапазон индекса (property, start_date),
+    ограниченный MAX_BOOKING_LENGTH, против наивного ORM-запроса
+    `start < end AND end > start` на объекте с `scale` бронированиями.
+    """
+    owner, tenant = create_users()
+    prop = Property.objects.create(
+        title='Benchmark property', description='', location='Berlin',
+        price=1000, room_count=2, property_type='apartment', owner=owner
+    )
+
+    # Непересекающиеся бронирования подряд, в основном в прошлом
+    day = date.today() - timedelta(days=scale * 4)
+    bookings = []
+    for _ in range(scale):
+        length = rng.randint(1, 3)
+        bookings.append(Booking(
+            property=prop, user=tenant, start_date=day, end_date=day + timedelta(days=length),
+            status=rng.choice(['confirmed', 'confirmed', 'pending', 'canceled'])
+        ))
+        day += timedelta(days=length + rng.randint(0, 2))
+    Booking.objects.bulk_create(bookings, batch_size=1000)
+    out.write(f'Объект с {scale} бронированиями')
+
+    def random_range():
+        start = date.today() + timedelta(days=rng.randint(-scale * 4, 30))
+        return start, start + timedelta(days=rng.randint(1, 14))
+
+    def indexed():
+        start, end = random_range()
+        availability.find_conflict(prop.pk, start, end)
+
+    def naive():
+        start, end = random_range()
+        availability.active_bookings(prop.pk).filter(start_date__lt=end, end_date__gt=start).exists()
+
+    def window():
+        start = date.today() - timedelta(days=rng.randint(0, scale * 4))
+        availability.free_ranges(prop.pk, start, start + timedelta(days=90))
+
+    fast = report(out, 'find_conflict (bounded index range)', measure(indexed, repeat))
+    slow = report(out, 'naive overlap query', measure(naive, repeat))
+    report(out, 'free_ranges, 90-day window', measure(window, repeat))
+    out.write(f'Ускорение: x{slow / fast:.1f}')
+
+
+LOCATIONS = ['Berlin', 'Munich', 'Hamburg', 'Cologne', 'Frankfurt']
+PROPERTY_TYPES = ['apartment', 'house', 'studio']
+
+
+def seed_properties(owner, count, rng, chunk_size=5000):
+    for offset in range(0, count, chunk_size):
+        Property.objects.bulk_create([
+            Property(
+                title=f'Объект {i}',
+                description=f'Описание объекта {i}',
+                location=rng.choice(LOCATIONS),
+                price=rng.randint(500, 3000),
+                room_count=rng.randint(1, 5),
+                property_type=rng.choice(PROPERTY_TYPES),
+                owner=owner,
+            )
+            for i in range(offset, min(offset + chunk_size, count))
+        ])
+    return list(Property.objects.values_list('pk', flat=True))
+
+
+def seed_bookings(tenant, property_ids, per_property, rng, chunk_size=10000):
+    """
+    Непересекающиеся бронирования каждого объекта в окне ±1 год от сегодняшнего дня.
+    """
+    bookings = []
+    for property_id in property_ids:
+        day = date.today() - timedelta(days=365 + rng.randint(0, 30))
+        for _ in range(per_property):
+            length = rng.randint(2, 10)
+            bookings.append(Booking(
+                property_id=property_id, user=tenant, start_date=day,
+                end_date=day + timedelta(days=length),
+                status=rng.choice(['confirmed', 'pending', 'canceled'])
+            ))
+            day += timedelta(days=length + rng.randint(0, 60))
+        if len(bookings) >= chunk_size:
+            Booking.objects.bulk_create(bookings)
+            bookings = []
+    Booking.objects.bulk_create(bookings)
+
+
+@scenario('property_availability', default_scale=10000)
+def property_availability(out, scale, repeat, rng):
+    """
+    Список объектов с фильтром ?available_from=&available_to= на `scale` объектах
+    и 10 бронированиях на объект (100k объектов / 1M бронирований: --scale 100000).
+    """
+    budget_ms = 100
+    owner, tenant = create_users()
+    property_ids = seed_properties(owner, scale, rng)
+    seed_bookings(tenant, property_ids, 10, rng)
+    out.write(f'{scale} объектов, {Booking.objects.count()} бронирований')
+
+    client = api_client()
+
+    def request(**params):
+        def run_request():
+            start = date.today() + timedelta(days=rng.randint(0, 300))
+            response = client.get('/api/properties/', {
+                'available_from': start,
+                'available_to': start + timedelta(days=rng.randint(2, 14)),
+                'page_size': 20,
+                **params,
+            })
+            assert response.status_code == 200, response.content
+        return run_request
+
+    with override_settings(ALLOWED_HOSTS=['localhost']):
+        results = [
+            report(out, 'available dates', measure(request(), repeat)),
+            report(out, 'available dates + location', measure(request(location='Berlin'), repeat)),
+            report(out, 'available dates + price, by price', measure(
+                request(price__gte=1000, price__lte=1500, ordering='price'), repeat)),
+        ]
+    verdict = 'OK' if max(results) * 1000 <= budget_ms else 'ПРЕВЫШЕН'
+    out.write(f'Бюджет {budget_ms} ms на запрос: {verdict}')
+
+
+def probe_view(authentication_class):
+    class Probe(APIView):
+        authentication_classes = [authentication_class]
+        permission_classes = [IsAuthenticated]
+
+        def get(self, request):
+            return Response({'user': request.user.pk})
+
+    return Probe.as_view()
+
+
+@scenario('auth', default_scale=1)
+def authentication(out, scale, repeat, rng):
+    """
+    Пропускная способность аутентификации: Basic и JWT из DRF против
+    вариантов с кэшем из listing.authentication (пароль хэшируется хэшером по умолчанию).
+    """
+    user = User.objects.create_user(
+        username='bench-user', email='bench-user@example.com', password='bench-password', role='tenant'
+    )
+    factory = APIRequestFactory()
+    basic = 'Basic ' + base64.b64encode(b'bench-user:bench-password').decode()
+    bearer = f'Bearer {AccessToken.for_user(user)}'
+
+    def request(authentication_class, header):
+        view = probe_view(authentication_class)
+
+        def run_request():
+            response = view(factory.get('/probe/', HTTP_AUTHORIZATION=header))
+            assert response.status_code == 200, response.data
+        return run_request
+
+    for label, authentication_class, header in [
+        ('BasicAuthentication', BasicAuthentication, basic),
+        ('CachedBasicAuthentication', CachedBasicAuthentication, basic),
+        ('JWTAuthentication', JWTAuthentication, bearer),
+        ('CachedJWTAuthentication', CachedJWTAuthentication, bearer),
+    ]:
+        run_request = request(authentication_class, header)
+        run_request()  # Первый запрос заполняет кэш
+        mean = report(out, label, measure(run_request, repeat))
+        out.write(f'{"":<40} {1 / mean:.0f} req/s')
+
+
+@scenario('notification_stream', default_scale=2000)
+def notification_stream_load(out, scale, repeat, rng):
+    """
+    Нагрузочный тест потока уведомлений: `scale` одновременных SSE-клиентов
+    в одном цикле событий. Уведомления хранятся в памяти вместо БД, измеряются
+    память на простаивающее подключение и задержка доставки после публикации
+    из другого потока (одному пользователю и всем сразу).
+    """
+    asyncio.run(notification_stream_clients(out, scale, repeat, rng))
+
+
+async def notification_stream_clients(out, scale, repeat, rng):
+    loop = asyncio.get_running_loop()
+    stored = defaultdict(list)
+    ids = itertools.count(1)
+    deliveries = asyncio.Queue()
+
+    async def fetch(user_id, last_id):
+        return [notification for notification in stored[user_id] if notification.pk > last_id]
+
+    async def client(user_id):
+        async for message in event_stream(user_id, 0, fetch=fetch, heartbeat=3600):
+            if message.startswith('id:'):
+                deliveries.put_nowait(time.perf_counter())
+
+    def add_notification(user_id):
+        stored[user_id].append(Notification(
+            pk=next(ids), recipient_id=user_id, event_type='new_review', content='Benchmark'
+        ))
+
+    tracemalloc.start()
+    memory_before = tracemalloc.get_traced_memory()[0]
+    started = time.perf_counter()
+    tasks = [asyncio.create_task(client(user_id)) for user_id in range(scale)]
+    while notification_hub.connections() < scale:
+        await asyncio.sleep(0.01)
+    connected = time.perf_counter() - started
+    per_connection = (tracemalloc.get_traced_memory()[0] - memory_before) / scale
+    tracemalloc.stop()
+    out.write(f'{scale} подключений за {connected * 1000:.0f} ms, ~{per_connection / 1024:.1f} KiB на подключение')
+
+    async def publish(user_ids):
+        for user_id in user_ids:
+            add_notification(user_id)
+        published = time.perf_counter()
+        await loop.run_in_executor(None, notification_hub.publish, user_ids)
+        latest = published
+        for _ in user_ids:
+            latest = await deliveries.get()
+        return latest - published
+
+    single = [await publish([rng.randrange(scale)]) for _ in range(repeat)]
+    report(out, 'доставка одному клиенту', single)
+    broadcast = [await publish(list(range(scale))) for _ in range(max(1, repeat // 20))]
+    report(out, f'доставка всем {scale} клиентам', broadcast)
+
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+@scenario('trending', default_scale=200000)
+def trending(out, scale, repeat, rng):
+    """
+    Расчет популярности (listing.popularity) по `scale` записям истории просмотров
+    на 10 000 объектах: полный проход и пиковая память догоняющих проходов
+    по 1% и 10% новых записей (от объема не зависит — в памяти одна пачка).
+    """
+    owner, tenant = create_users()
+    property_ids = seed_properties(owner, 10000, rng)
+    # Уже существующая в базе история не входит в замер
+    for source in get_sources():
+        model = source.model
+        PopularityWatermark.objects.update_or_create(source=source.name, defaults={
+            'created_at': timezone.now(), 'last_id': model.objects.aggregate(last=Max('pk'))['last'] or 0,
+        })
+
+    def seed_views(count, chunk_size=10000):
+        for offset in range(0, count, chunk_size):
+            ViewHistory.objects.bulk_create([
+                ViewHistory(user=tenant, property_id=rng.choice(property_ids))
+                for _ in range(min(chunk_size, count - offset))
+            ])
+
+    def update():
+        later = timezone.now() + timedelta(seconds=settings.POPULARITY['LAG_SECONDS'] + 1)
+        return update_popularity(now=later)['views']
+
+    seed_views(scale)
+    started = time.perf_counter()
+    processed = update()
+    elapsed = time.perf_counter() - started
+    out.write(f'{"Полный проход":<40} {processed} записей за {elapsed:.2f} s, {processed / elapsed:.0f} записей/s')
+
+    # tracemalloc заметно замедляет код, поэтому память меряется отдельными проходами
+    for share in (100, 10):
+        seed_views(scale // share)
+        tracemalloc.start()
+        started = time.perf_counter()
+        processed = update()
+        elapsed = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        out.write(f'{f"Догоняющий проход, {100 // share}%":<40} {processed} записей за {elapsed:.2f} s, '
+                  f'пик памяти {peak / 2 ** 20:.1f} MiB')
+
+    durations = measure(lambda: list(with_trending(Property.objects.all()).order_by('-trending', '-id')[:20]), repeat)
+    report(out, 'Топ-20 по ?ordering=-trending', durations)
+
+
+@scenario('recommendations', default_scale=200000)
+def recommendations(out, scale, repeat, rng, per_user=20, clusters=200):
+    """
+    Построение соседей (build_similarity) по `scale` просмотрам scale / 20 пользователей
+    на 10 000 объектах и задержка GET /api/properties/recommended/.
+    Пользователи смотрят в основном объекты «своей» группы, как при поиске по городу и цене.
+    """
+    owner, _ = create_users()
+    property_ids = seed_properties(owner, 10000, rng)[-10000:]
+    groups = [property_ids[i::clusters] for i in range(clusters)]
+    users = User.objects.bulk_create([
+        User(username=f'bench-viewer-{i}', email=f'bench-viewer-{i}@example.com', role='tenant')
+        for i in range(scale // per_user)
+    ])
+    for offset in range(0, len(users), 500):
+        ViewHistory.objects.bulk_create([
+            ViewHistory(
+                user=user,
+                property_id=rng.choice(group if rng.random() < 0.8 else property_ids),
+            )
+            for user in users[offset:offset + 500]
+            for group in [rng.choice(groups)]
+            for _ in range(per_user)
+        ])
+
+    started = time.perf_counter()
+    views, pairs = build_similarity()
+    elapsed = time.perf_counter() - started
+    out.write(f'{"Построение соседей":<40} {views} просмотров за {elapsed:.2f} s, {pairs} пар')
+
+    report(out, 'recommend()', measure(lambda: recommend(rng.choice(users).pk, 10), repeat))
+    client = api_client()
+
+    def request():
+        client.force_authenticate(user=rng.choice(users))
+        response = client.get('/api/properties/recommended/')
+        assert response.status_code == 200, response.status_code
+
+    with override_settings(ALLOWED_HOSTS=['localhost']):
+        report(out, 'GET /api/properties/recommended/', measure(request, repeat))
+
+
+@scenario('geo', default_scale=100000)
+def geo_search(out, scale, repeat, rng, cities=50, chunk_size=10000):
+    """
+    ?near=&radius_km= и ?bbox= на `scale` объектах с координатами (1M точек: --scale 1000000).
+    Большая часть объектов собрана вокруг «городов», остальные разбросаны по Европе.
+    """
+    owner, _ = create_users()
+    centers = [(rng.uniform(36, 60), rng.uniform(-9, 30)) for _ in range(cities)]
+
+    def point():
+        if rng.random() < 0.8:
+            latitude, longitude = rng.choice(centers)
+            return latitude + rng.gauss(0, 0.15), longitude + rng.gauss(0, 0.25)
+        return rng.uniform(35, 61), rng.uniform(-10, 31)
+
+    started = time.perf_counter()
+    for offset in range(0, scale, chunk_size):
+        properties = []
+        for i in range(offset, min(offset + chunk_size, scale)):
+            latitude, longitude = point()
+            properties.append(Property(
+                title=f'Объект {i}', description='', location='Europe', price=rng.randint(500, 3000),
+                room_count=rng.randint(1, 5), property_type=rng.choice(PROPERTY_TYPES), owner=owner,
+                latitude=latitude, longitude=longitude, geo_cell=geo.cell_of(latitude, longitude),
+            ))
+        Property.objects.bulk_create(properties)
+    out.write(f'{scale} объектов с координатами за {time.perf_counter() - started:.1f} s')
+
+    client = api_client()
+
+    def request(radius_km=None, box_degrees=None):
+        def run_request():
+            latitude, longitude = rng.choice(centers)
+            params = {'page_size': 20}
+            if radius_km:
+                params.update(near=f'{latitude},{longitude}', radius_km=radius_km)
+            else:
+                params['bbox'] = f'{latitude},{longitude},{latitude + box_degrees},{longitude + box_degrees}'
+            response = client.get('/api/properties/', params)
+            assert response.status_code == 200, response.status_code
+        return run_request
+
+    def full_scan():
+        latitude, longitude = rng.choice(centers)
+        list(
+            Property.objects.annotate(distance=geo.distance_km(latitude, longitude))
+            .filter(distance__lte=5).order_by('distance', 'id')[:20]
+        )
+
+    with override_settings(ALLOWED_HOSTS=['localhost'], API_CACHE={**settings.API_CACHE, 'TIMEOUT': 0}):
+        report(out, 'near, radius_km=5', measure(request(radius_km=5), repeat))
+        report(out, 'near, radius_km=50', measure(request(radius_km=50), repeat))
+        report(out, 'bbox 0.2° x 0.2°', measure(request(box_degrees=0.2), repeat))
+    report(out, 'Без сетки: расстояние до всех объектов', measure(full_scan, min(repeat, 5)))
+
+
+@scenario('facets', default_scale=100000)
+def facet_counts(out, scale, repeat, rng, chunk_size=10000):
+    """
+    GET /api/properties/facets/ на `scale` объектах (1M: --scale 1000000), треть из них с категориями:
+    построение групп из базы, ответы при переключении фасетов и наивные COUNT по каждому значению.
+    """
+    budget_ms = 50
+    owner, tenant = create_users()
+    property_ids = seed_properties(owner, scale, rng)[-scale:]
+    categories = Category.objects.bulk_create([Category(name=f'Категория {i}') for i in range(10)])
+    through = Property.categories.through
+    linked = property_ids[::3]
+    for offset in range(0, len(linked), chunk_size):
+        through.objects.bulk_create([
+            through(property_id=pk, category_id=rng.choice(categories).pk) for pk in linked[offset:offset + chunk_size]
+        ])
+
+    queryset = Property.objects.filter(price__lte=2500)
+    report(out, 'Группы из базы (GROUP BY)', measure(lambda: facets.load_groups(queryset), min(repeat, 5)))
+
+    def naive():
+        for property_type, _ in Property.PROPERTY_TYPES:
+            queryset.filter(property_type=property_type).count()
+        for location in LOCATIONS:
+            queryset.filter(location=location).count()
+        for room_count in range(1, 6):
+            queryset.filter(room_count=room_count).count()
+        for category in categories:
+            queryset.filter(categories=category).count()
+
+    report(out, 'COUNT по каждому значению фасета', measure(naive, min(repeat, 5)))
+
+    client = api_client()
+    # Авторизованные ответы не кэшируются целиком: замеряется пересчет фасетов по группам
+    client.force_authenticate(user=tenant)
+
+    def request():
+        params = {'price__lte': 2500}
+        if rng.random() < 0.5:
+            params['property_type'] = rng.choice(PROPERTY_TYPES)
+        if rng.random() < 0.5:
+            params['location'] = rng.choice(LOCATIONS)
+        if rng.random() < 0.5:
+            params['room_count__gte'] = rng.randint(1, 5)
+        response = client.get('/api/properties/facets/', params)
+        assert response.status_code == 200, response.status_code
+
+    with override_settings(ALLOWED_HOSTS=['localhost']):
+        request()
+        result = report(out, 'GET /api/properties/facets/', measure(request, repeat))
+    verdict = 'OK' if result * 1000 <= budget_ms else 'ПРЕВЫШЕН'
+    out.write(f'Бюджет {budget_ms} ms на запрос: {verdict}')
+
+
+@scenario('bitmaps', default_scale=100000)
+def bitmap_filters(out, scale, repeat, rng, chunk_size=10000):
+    """
+    Сочетания фильтров по типу, статусу, городу, комнатам и категориям на `scale`
+    объектах: PropertyFilter с битовым индексом (listing.bitmaps) против обычных
+    условий ORM, построение индекса, загрузка снимка и занимаемая им память.
+    """
+    owner, _ = create_users()
+    property_ids = seed_properties(owner, scale, rng)[-scale:]
+    inactive = property_ids[::10]
+    for offset in range(0, len(inactive), chunk_size):
+        Property.objects.filter(pk__in=inactive[offset:offset + chunk_size]).update(status='inactive')
+    categories = Category.objects.bulk_create([Category(name=f'Категория {i}') for i in range(10)])
+    through = Property.categories.through
+    linked = property_ids[::3]
+    for offset in range(0, len(linked), chunk_size):
+        through.objects.bulk_create([
+            through(property_id=pk, category_id=rng.choice(categories).pk) for pk in linked[offset:offset + chunk_size]
+        ])
+
+    config = {**settings.BITMAP_INDEX, 'ENABLED': True, 'SNAPSHOT_PATH': None, 'REFRESH_INTERVAL': 3600}
+    with override_settings(BITMAP_INDEX={**config, 'REBUILD_INTERVAL': 0}):
+        report(out, 'Построение индекса из базы', measure(lambda: bitmaps.build(config['CHUNK_SIZE']), min(repeat, 3)))
+        bitmap_index.refresh(force=True)
+    index, watermark = bitmaps.build(config['CHUNK_SIZE'])
+    for field, values, ids, size in bitmaps.memory_report(index):
+        out.write(f'  {field:<15} значений: {values:>6}  id: {ids:>9}  {size / 1024:10.1f} КиБ')
+    out.write(f'Индекс: {bitmaps.total_bytes(index) / 2 ** 20:.2f} МиБ, бюджет {config["MEMORY_BUDGET_MB"]} МиБ')
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'bitmaps.bin')
+        bitmaps.write_snapshot(path, index, watermark)
+        out.write(f'Снимок: {os.path.getsize(path) / 2 ** 20:.2f} МиБ')
+        report(out, 'Загрузка снимка', measure(lambda: bitmaps.read_snapshot(path), min(repeat, 3)))
+
+    combinations = [
+        ('тип + статус + город + комнаты', lambda: {
+            'property_type': rng.choice(PROPERTY_TYPES), 'status': 'active',
+            'location': rng.choice(LOCATIONS), 'room_count__gte': rng.randint(1, 5), 'room_count__lte': 5,
+        }),
+        ('город + комнаты + категории', lambda: {
+            'location': rng.choice(LOCATIONS), 'room_count__lte': rng.randint(1, 3),
+            'categories': ','.join(str(category.pk) for category in rng.sample(categories, 2)),
+        }),
+        ('тип + город + комнаты + категория', lambda: {
+            'property_type': rng.choice(PROPERTY_TYPES), 'location': rng.choice(LOCATIONS),
+            'room_count__gte': (rooms := rng.randint(1, 5)), 'room_count__lte': rooms,
+            'categories': str(rng.choice(categories).pk),
+        }),
+        ('все фильтры + цена', lambda: {
+            'property_type': rng.choice(PROPERTY_TYPES), 'status': 'active', 'location': rng.choice(LOCATIONS),
+            'room_count__gte': 2, 'categories': str(rng.choice(categories).pk), 'price__lte': 2000,
+        }),
+    ]
+
+    def first_page(params):
+        def run():
+            filterset = PropertyFilter(params(), queryset=Property.objects.all())
+            list(filterset.qs.order_by('-created_at', '-id').values_list('pk', flat=True)[:20])
+        return run
+
+    for label, params in combinations:
+        with override_settings(BITMAP_INDEX={**config, 'ENABLED': False}):
+            orm = report(out, f'ORM: {label}', measure(first_page(params), repeat))
+        with override_settings(BITMAP_INDEX=config):
+            registry.reset()
+            indexed = report(out, f'Индекс: {label}', measure(first_page(params), repeat))
+            fallbacks = registry.value('bitmap_index.fallbacks')
+        out.write(f'Ускорение: x{orm / indexed:.1f}, запросов через ORM (больше MAX_IDS): {fallbacks}')
+
+
+@scenario('profiling', default_scale=200)
+def profiling_overhead(out, scale, repeat, rng):
+    """
+    Накладные расходы PerfProfilingMiddleware на GET /api/properties/ (`scale` объектов).
+    Запросы без профилирования (обертки install() сняты) и с ним чередуются по одному,
+    порядок в паре меняется; итог — разница медиан против цели 2%.
+    """
+    budget_percent = 2
+    owner, _ = create_users()
+    property_ids = seed_properties(owner, scale, rng)[-scale:]
+    # Фильтр по категории ограничивает ответ объектами сценария
+    category = Category.objects.create(name='Бенчмарк профилирования')
+    category.property_set.add(*property_ids)
+    config = {**settings.PERF_PROFILING, 'SAMPLE_RATE': 1.0, 'PUBLISH_INTERVAL': 0}
+    overrides = {'ALLOWED_HOSTS': ['testserver'], 'API_CACHE': {**settings.API_CACHE, 'TIMEOUT': 0}}
+
+    def request(client):
+        started = time.perf_counter()
+        response = client.get('/api/properties/', {'categories': category.pk})
+        elapsed = time.perf_counter() - started
+        assert response.status_code == 200, response.status_code
+        return elapsed
+
+    # Цепочка middleware собирается при первом запросе клиента
+    clients = {}
+    with override_settings(PERF_PROFILING={**config, 'ENABLED': False}, **overrides):
+        clients[False] = Client()
+        request(clients[False])
+    with override_settings(PERF_PROFILING={**config, 'ENABLED': True}, **overrides):
+        clients[True] = Client()
+        request(clients[True])
+        perf_buffer.clear()
+
+        durations = {False: [], True: []}
+        for number in range(repeat):
+            for enabled in ((False, True) if number % 2 == 0 else (True, False)):
+                if enabled:
+                    profiling.install()
+                else:
+                    profiling.uninstall()
+                durations[enabled].append(request(clients[enabled]))
+        profiling.uninstall()
+
+    report(out, 'GET /api/properties/, без профилирования', durations[False])
+    report(out, 'GET /api/properties/, с профилированием', durations[True])
+    overhead = (statistics.median(durations[True]) / statistics.median(durations[False]) - 1) * 100
+    verdict = 'OK' if overhead <= budget_percent else 'ПРЕВЫШЕН'
+    out.write(f'Накладные расходы (медианы): {overhead:+.1f}%, цель не более {budget_percent}%: {verdict}')
+    for row in summarize(perf_buffer.records(), limit=3):
+        out.write(
+            f'  {row["view"]:<30} p95 {row["p95_ms"]:8.3f} ms  БД {row["db_ms"]:8.3f} ms  '
+            f'запросов {row["queries"]:5.1f}  сериализация {row["serializer_ms"]:8.3f} ms'
+        )
+    perf_buffer.clear()
+
+
+@scenario('async_reads', default_scale=2000, rollback=False)
+def async_reads(out, scale, repeat, rng, concurrency=50):
+    """
+    Список объектов под конкурентной нагрузкой (`repeat` запросов, 50 одновременно):
+    PropertyViewSet через WSGI-клиент в пуле потоков против асинхронного
+    обработчика через ASGI-клиент в одном цикле событий. Кэш ответов отключен.
+    """
+    owner, tenant = create_users()
+    try:
+        seed_properties(owner, scale, rng)
+        out.write(f'{scale} объектов, {repeat} запросов, {concurrency} одновременно')
+
+        def params():
+            return {'location': rng.choice(LOCATIONS), 'page_size': 20, 'ordering': rng.choice(['price', '-price'])}
+
+        def report_run(label, durations, total):
+            report(out, label, durations)
+            out.write(f'{"":<40} {len(durations) / total:.0f} req/s')
+
+        with override_settings(ALLOWED_HOSTS=['testserver'], API_CACHE={**settings.API_CACHE, 'TIMEOUT': 0}):
+            report_run('WSGI, PropertyViewSet', *wsgi_load('/api/properties/', params, repeat, concurrency))
+            report_run('ASGI, PropertyViewSet', *asyncio.run(
+                asgi_load('/api/properties/', params, repeat, concurrency)))
+            report_run('ASGI, AsyncPropertyView', *asyncio.run(
+                asgi_load('/api/async/properties/', params, repeat, concurrency)))
+    finally:
+        owner.delete()
+        tenant.delete()
+
+
+def wsgi_load(url, params, repeat, concurrency):
+    def worker(count):
+        client = Client()
+        durations = []
+        try:
+            for _ in range(count):
+                started = time.perf_counter()
+                response = client.get(url, params())
+                assert response.status_code == 200, response.status_code
+                durations.append(time.perf_counter() - started)
+        finally:
+            connections.close_all()
+        return durations
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        counts = [repeat // concurrency + (i < repeat % concurrency) for i in range(concurrency)]
+        durations = [duration for result in pool.map(worker, counts) for duration in result]
+    return durations, time.perf_counter() - started
+
+
+async def asgi_load(url, params, repeat, concurrency):
+    client = AsyncClient()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def request():
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.get(url, params())
+            assert response.status_code == 200, response.status_code
+            return time.perf_counter() - started
+
+    started = time.perf_counter()
+    durations = await asyncio.gather(*(request() for _ in range(repeat)))
+    return list(durations), time.perf_counter() - started
+
+
+def run(name, out, scale=None, repeat=100, seed=0):
+    func = SCENARIOS[name]
+    if not func.rollback:
+        return func(out, scale or func.default_scale, repeat, random.Random(seed))
+    with rollback():
+        func(out, scale or func.default_scale, repeat, random.Random(seed))
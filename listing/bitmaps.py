@@ -0,0 +1,579 @@
+"""
+Битовый индекс фильтров списка объектов (settings.BITMAP_INDEX).
+
+Для каждого значения property_type, status, location, room_count и каждой
+категории в памяти процесса хранится множество id объектов в виде
+RoaringBitmap. Сочетание фильтров PropertyFilter сводится к AND/OR этих
+множеств; если результат не больше MAX_IDS, список объектов выбирается
+по `pk IN (...)` вместо пересечения больших диапазонов индексов в базе.
+Больший результат и фильтры вне индекса обрабатывает обычный ORM.
+
+Индекс обновляется:
+- в своем процессе — сразу после фиксации транзакции по сигналам (listing.signals);
+- изменения из других процессов — не реже раза в REFRESH_INTERVAL секунд
+  по колонке Property.updated_at;
+- полностью — раз в REBUILD_INTERVAL секунд (так уходят удаленные объекты).
+
+При первом обращении индекс загружается из снимка SNAPSHOT_PATH и дочитывает
+изменения после него; без снимка строится из базы и сохраняет снимок.
+Если индекс не укладывается в MEMORY_BUDGET_MB, он не используется.
+
+Город сравнивается без учета регистра и диакритики (как в сопоставлении
+MySQL по умолчанию): индекс отбирает кандидатов, а точное условие по location
+применяет ORM к `pk IN (...)`, поэтому результат совпадает с обычной фильтрацией
+при любом сопоставлении базы.
+"""
+import asyncio
+import json
+import logging
+import os
+import struct
+import threading
+import time
+import unicodedata
+from array import array
+from bisect import bisect_left
+from datetime import datetime, timedelta
+from functools import lru_cache, reduce
+from itertools import groupby
+from operator import and_, or_
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .metrics import registry
+from .models import Property
+
+logger = logging.getLogger(__name__)
+
+# Контейнер с большим числом значений хранится битовой картой (8 КиБ), с меньшим — массивом.
+# В Roaring порог 4096 (равный объем), здесь он ниже: AND/OR битовых карт выполняются в C,
+# а значения массивов перебираются в Python
+ARRAY_MAX = 1024
+BITS_BYTES = (1 << 16) // 8
+
+# Номера единичных битов каждого значения байта
+BYTE_POSITIONS = [tuple(bit for bit in range(8) if byte >> bit & 1) for byte in range(256)]
+
+
+def bits_to_array(bits):
+    data = bits.to_bytes(BITS_BYTES, 'little')
+    return array('H', [index * 8 + bit for index, byte in enumerate(data) if byte for bit in BYTE_POSITIONS[byte]])
+
+
+def array_to_bits(values):
+    data = bytearray(BITS_BYTES)
+    for value in values:
+        data[value >> 3] |= 1 << (value & 7)
+    return int.from_bytes(data, 'little')
+
+
+def compact(container):
+    """
+    Контейнер в подходящем представлении или None, если он пуст.
+    """
+    if isinstance(container, int):
+        count = container.bit_count()
+        if count > ARRAY_MAX:
+            return container
+        return bits_to_array(container) if count else None
+    if len(container) > ARRAY_MAX:
+        return array_to_bits(container)
+    return container if len(container) else None
+
+
+# Результаты AND и OR живут только до конца запроса и не приводятся
+# к представлению по ARRAY_MAX: массив может быть длиннее, битовая карта — реже
+
+def and_containers(a, b):
+    if isinstance(a, int) and isinstance(b, int):
+        return a & b or None
+    if isinstance(a, int):
+        a, b = b, a
+    if isinstance(b, int):
+        data = b.to_bytes(BITS_BYTES, 'little')
+        return array('H', [value for value in a if data[value >> 3] >> (value & 7) & 1]) or None
+    if len(a) > len(b):
+        a, b = b, a
+    lookup = set(b)
+    return array('H', [value for value in a if value in lookup]) or None
+
+
+def or_containers(a, b):
+    if isinstance(a, int) and isinstance(b, int):
+        return a | b
+    if isinstance(a, int) or isinstance(b, int):
+        bits, values = (a, b) if isinstance(a, int) else (b, a)
+        return bits | array_to_bits(values)
+    return array('H', sorted(set(a).union(b)))
+
+
+class RoaringBitmap:
+    """
+    Множество неотрицательных целых в духе Roaring: значения делятся по старшим
+    16 битам на контейнеры, разреженный контейнер — отсортированный array('H'),
+    плотный — битовая карта на 65536 бит (целое число Python, AND/OR выполняются в C).
+    """
+    __slots__ = ('containers',)
+
+    def __init__(self, containers=None):
+        self.containers = containers or {}
+
+    @classmethod
+    def from_sorted(cls, values):
+        containers = {}
+        for high, group in groupby(values, key=lambda value: value >> 16):
+            container = compact(array('H', [value & 0xFFFF for value in group]))
+            if container is not None:
+                containers[high] = container
+        return cls(containers)
+
+    def add(self, value):
+        high, low = value >> 16, value & 0xFFFF
+        container = self.containers.get(high)
+        if container is None:
+            self.containers[high] = array('H', [low])
+        elif isinstance(container, int):
+            self.containers[high] = container | (1 << low)
+        else:
+            index = bisect_left(container, low)
+            if index == len(container) or container[index] != low:
+                container.insert(index, low)
+                if len(container) > ARRAY_MAX:
+                    self.containers[high] = array_to_bits(container)
+
+    def discard(self, value):
+        high, low = value >> 16, value & 0xFFFF
+        container = self.containers.get(high)
+        if container is None:
+            return
+        if isinstance(container, int):
+            container &= ~(1 << low)
+        else:
+            index = bisect_left(container, low)
+            if index < len(container) and container[index] == low:
+                del container[index]
+        container = compact(container)
+        if container is None:
+            del self.containers[high]
+        else:
+            self.containers[high] = container
+
+    def __contains__(self, value):
+        container = self.containers.get(value >> 16)
+        if container is None:
+            return False
+        low = value & 0xFFFF
+        if isinstance(container, int):
+            return bool(container >> low & 1)
+        index = bisect_left(container, low)
+        return index < len(container) and container[index] == low
+
+    def __len__(self):
+        return sum(
+            container.bit_count() if isinstance(container, int) else len(container)
+            for container in self.containers.values()
+        )
+
+    def __bool__(self):
+        return bool(self.containers)
+
+    def __iter__(self):
+        for high in sorted(self.containers):
+            container = self.containers[high]
+            if isinstance(container, int):
+                container = bits_to_array(container)
+            base = high << 16
+            for low in container:
+                yield base + low
+
+    def __and__(self, other):
+        containers = {}
+        for high in self.containers.keys() & other.containers.keys():
+            container = and_containers(self.containers[high], other.containers[high])
+            if container is not None:
+                containers[high] = container
+        return RoaringBitmap(containers)
+
+    def __or__(self, other):
+        containers = dict(self.containers)
+        for high, container in other.containers.items():
+            containers[high] = or_containers(containers[high], container) if high in containers else container
+        return RoaringBitmap(containers)
+
+    def nbytes(self):
+        """
+        Объем данных контейнеров в байтах (без накладных расходов объектов Python).
+        """
+        return sum(
+            BITS_BYTES if isinstance(container, int) else container.itemsize * len(container)
+            for container in self.containers.values()
+        )
+
+    def to_bytes(self):
+        chunks = []
+        for high in sorted(self.containers):
+            container = self.containers[high]
+            if isinstance(container, int):
+                chunks.append(struct.pack('<IBI', high, 1, BITS_BYTES) + container.to_bytes(BITS_BYTES, 'little'))
+            else:
+                chunks.append(struct.pack('<IBI', high, 0, len(container)) + container.tobytes())
+        return b''.join(chunks)
+
+    @classmethod
+    def from_bytes(cls, data):
+        containers = {}
+        offset = 0
+        while offset < len(data):
+            high, kind, size = struct.unpack_from('<IBI', data, offset)
+            offset += 9
+            if kind == 1:
+                containers[high] = int.from_bytes(data[offset:offset + size], 'little')
+                offset += size
+            else:
+                container = array('H')
+                container.frombytes(data[offset:offset + size * 2])
+                containers[high] = container
+                offset += size * 2
+        return cls(containers)
+
+
+# Поля объекта в индексе; категории хранятся под именем 'categories'
+SCALAR_FIELDS = ('property_type', 'status', 'location', 'room_count')
+INDEXED_FIELDS = (*SCALAR_FIELDS, 'categories')
+
+# Параметры PropertyFilter, которые вычисляются по индексу
+INDEXED_FILTERS = ('property_type', 'status', 'location', 'room_count__gte', 'room_count__lte', 'categories')
+# Параметры, которые индекс только сужает до кандидатов: ORM применяет их повторно
+RECHECKED_FILTERS = ('location',)
+
+SNAPSHOT_VERSION = 1
+
+
+@lru_cache(maxsize=65536)
+def text_key(value):
+    """
+    Ключ сравнения строки без учета регистра, диакритики и пробелов в конце:
+    равные в сопоставлениях *_ci/*_ai строки дают равные ключи.
+    """
+    decomposed = unicodedata.normalize('NFKD', value.casefold().rstrip(' '))
+    return ''.join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def build(chunk_size):
+    """
+    Строит индекс из базы: ({поле: {значение: RoaringBitmap}}, отметка времени начала чтения).
+    """
+    watermark = timezone.now()
+    ids = {field: {} for field in INDEXED_FIELDS}
+    rows = Property.objects.order_by('pk').values_list('pk', *SCALAR_FIELDS)
+    for pk, *values in rows.iterator(chunk_size=chunk_size):
+        for field, value in zip(SCALAR_FIELDS, values):
+            ids[field].setdefault(value, array('q')).append(pk)
+    links = Property.categories.through.objects.order_by('category_id', 'property_id')
+    for category_id, pk in links.values_list('category_id', 'property_id').iterator(chunk_size=chunk_size):
+        ids['categories'].setdefault(category_id, array('q')).append(pk)
+    bitmaps = {
+        field: {value: RoaringBitmap.from_sorted(pks) for value, pks in by_value.items()}
+        for field, by_value in ids.items()
+    }
+    return bitmaps, watermark
+
+
+def total_bytes(bitmaps):
+    return sum(bitmap.nbytes() for by_value in bitmaps.values() for bitmap in by_value.values())
+
+
+def memory_report(bitmaps):
+    """
+    [(поле, число значений, число id, байт), ...].
+    """
+    return [
+        (field, len(by_value), sum(len(bitmap) for bitmap in by_value.values()),
+         sum(bitmap.nbytes() for bitmap in by_value.values()))
+        for field, by_value in bitmaps.items()
+    ]
+
+
+def write_snapshot(path, bitmaps, watermark):
+    """
+    Снимок индекса: длина заголовка (4 байта), JSON-заголовок с отметкой
+    и размерами, затем сериализованные RoaringBitmap подряд.
+    """
+    entries, blobs = [], []
+    for field, by_value in bitmaps.items():
+        for value, bitmap in by_value.items():
+            blob = bitmap.to_bytes()
+            entries.append([field, value, len(blob)])
+            blobs.append(blob)
+    header = json.dumps({
+        'version': SNAPSHOT_VERSION, 'watermark': watermark.isoformat(), 'bitmaps': entries,
+    }).encode('utf-8')
+    # Снимок могут одновременно писать несколько процессов: подменяем файл целиком
+    temporary = f'{path}.{os.getpid()}.tmp'
+    with open(temporary, 'wb') as snapshot:
+        snapshot.write(struct.pack('<I', len(header)))
+        snapshot.write(header)
+        for blob in blobs:
+            snapshot.write(blob)
+    os.replace(temporary, path)
+
+
+def read_snapshot(path):
+    """
+    (bitmaps, watermark) из снимка или None, если снимка нет или он другой версии.
+    """
+    try:
+        with open(path, 'rb') as snapshot:
+            size, = struct.unpack('<I', snapshot.read(4))
+            header = json.loads(snapshot.read(size))
+            if header['version'] != SNAPSHOT_VERSION:
+                return None
+            bitmaps = {field: {} for field in INDEXED_FIELDS}
+            for field, value, length in header['bitmaps']:
+                bitmaps[field][value] = RoaringBitmap.from_bytes(snapshot.read(length))
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, KeyError, struct.error):
+        logger.exception('Bitmap index snapshot %s is unreadable', path)
+        return None
+    return bitmaps, datetime.fromisoformat(header['watermark'])
+
+
+def in_event_loop():
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+class BitmapIndex:
+    """
+    Индекс процесса. Изменения из других процессов видны с задержкой
+    до REFRESH_INTERVAL, удаления из других процессов — до REBUILD_INTERVAL
+    (лишний id в `pk IN (...)` не находит строки и на ответ не влияет).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._bitmaps = None  # {поле: {значение: RoaringBitmap}}
+        self._watermark = None  # Изменения с updated_at после этой отметки еще не прочитаны
+        self._over_budget = False
+        self._refreshed_at = 0.0
+        self._rebuilt_at = 0.0
+        registry.gauge('bitmap_index.bytes', lambda: total_bytes(self._bitmaps) if self._bitmaps else 0)
+
+    @property
+    def config(self):
+        return settings.BITMAP_INDEX
+
+    @property
+    def enabled(self):
+        return self.config['ENABLED']
+
+    def resolve(self, data):
+        """
+        id объектов, подходящих под индексируемые фильтры из data (cleaned_data
+        PropertyFilter), или None, если индекс не применим и фильтровать должен ORM:
+        индекс выключен, фильтров из индекса нет или результат больше MAX_IDS.
+        """
+        if not self.enabled:
+            return None
+        terms = self._terms(data)
+        if not terms or not self._ready():
+            return None
+
+        started = time.perf_counter()
+        with self._lock:
+            if self._bitmaps is None:
+                return None
+            unions = []
+            for field, matches in terms:
+                bitmaps = [bitmap for value, bitmap in self._bitmaps[field].items() if matches(value)]
+                unions.append(reduce(or_, bitmaps, RoaringBitmap()))
+            # Пересечение начинаем с самого маленького множества
+            unions.sort(key=len)
+            result = reduce(and_, unions)
+            count = len(result)
+            ids = list(result) if count <= self.config['MAX_IDS'] else None
+        registry.observe('bitmap_index.resolve', time.perf_counter() - started)
+        registry.incr('bitmap_index.hits' if ids is not None else 'bitmap_index.fallbacks')
+        return ids
+
+    @staticmethod
+    def _terms(data):
+        """
+        [(поле, проверка значения), ...] для заданных индексируемых фильтров.
+        """
+        terms = []
+        for field in ('property_type', 'status'):
+            if data.get(field):
+                terms.append((field, lambda value, selected=data[field]: value == selected))
+        if data.get('location'):
+            terms.append(('location', lambda value, selected=text_key(data['location']): text_key(value) == selected))
+        low, high = data.get('room_count__gte'), data.get('room_count__lte')
+        if low is not None or high is not None:
+            terms.append(('room_count', lambda value: (low is None or value >= low) and (high is None or value <= high)))
+        if data.get('categories'):
+            selected = {int(pk) for pk in data['categories']}
+            terms.append(('categories', lambda value: value in selected))
+        return terms
+
+    def _ready(self):
+        # Из асинхронного кода к базе не обращаемся: используется то, что уже загружено
+        if in_event_loop():
+            return self._bitmaps is not None
+        try:
+            self.refresh()
+        except Exception:
+            logger.exception('Bitmap index refresh failed, falling back to ORM filtering')
+            return False
+        return self._bitmaps is not None
+
+    def _is_fresh(self, now):
+        loaded = self._bitmaps is not None or self._over_budget
+        return loaded and now - self._refreshed_at < self.config['REFRESH_INTERVAL']
+
+    def refresh(self, force=False):
+        now = time.monotonic()
+        if not force and self._is_fresh(now):
+            return
+        with self._lock:
+            if not force and self._is_fresh(now):
+                return
+            if self._bitmaps is None and not self._over_budget:
+                if not self._load_snapshot(now):
+                    self._rebuild(now)
+            elif now - self._rebuilt_at >= self.config['REBUILD_INTERVAL']:
+                self._rebuild(now)
+            if self._bitmaps is not None:
+                self._catch_up()
+            self._refreshed_at = now
+
+    def _load_snapshot(self, now):
+        path = self.config['SNAPSHOT_PATH']
+        loaded = read_snapshot(path) if path else None
+        if loaded is None:
+            return False
+        self._install(*loaded, now)
+        registry.incr('bitmap_index.snapshot_loads')
+        return True
+
+    def _rebuild(self, now):
+        started = time.perf_counter()
+        bitmaps, watermark = build(self.config['CHUNK_SIZE'])
+        if self._install(bitmaps, watermark, now) and self.config['SNAPSHOT_PATH']:
+            write_snapshot(self.config['SNAPSHOT_PATH'], bitmaps, watermark)
+        registry.observe('bitmap_index.rebuild', time.perf_counter() - started)
+
+    def _install(self, bitmaps, watermark, now):
+        self._rebuilt_at = now
+        size, budget = total_bytes(bitmaps), self.config['MEMORY_BUDGET_MB'] * 2 ** 20
+        self._over_budget = size > budget
+        if self._over_budget:
+            # До следующей перестройки фильтрует ORM
+            logger.warning('Bitmap index needs %d bytes over the %d budget, falling back to ORM filtering', size, budget)
+            self._bitmaps = self._watermark = None
+            return False
+        self._bitmaps, self._watermark = bitmaps, watermark
+        return True
+
+    def _catch_up(self):
+        """
+        Перечитывает объекты, измененные после отметки. Запас LAG_SECONDS покрывает
+        транзакции, зафиксированные позже своего updated_at.
+        """
+        since = self._watermark - timedelta(seconds=self.config['LAG_SECONDS'])
+        self._watermark = timezone.now()
+        chunk_size = self.config['CHUNK_SIZE']
+        rows = list(
+            Property.objects.filter(updated_at__gte=since).order_by()
+            .values_list('pk', *SCALAR_FIELDS).iterator(chunk_size=chunk_size)
+        )
+        if not rows:
+            return
+        categories = load_categories([row[0] for row in rows], chunk_size)
+        for pk, *values in rows:
+            self._apply(pk, dict(zip(SCALAR_FIELDS, values)), categories.get(pk, []))
+        registry.incr('bitmap_index.caught_up', len(rows))
+
+    def _apply(self, pk, values, categories=None):
+        # Прежние значения не хранятся, но их немного: id убирается из всех
+        # множеств поля и добавляется в множество нового значения
+        changes = list(values.items())
+        if categories is not None:
+            changes.append(('categories', None))
+        for field, value in changes:
+            by_value = self._bitmaps[field]
+            for bitmap in by_value.values():
+                bitmap.discard(pk)
+            for item in (categories if field == 'categories' else [value]):
+                by_value.setdefault(item, RoaringBitmap()).add(pk)
+
+    # Изменения в своем процессе (вызываются из listing.signals и listing.bulk)
+
+    def property_saved(self, instance):
+        values = {field: getattr(instance, field) for field in SCALAR_FIELDS}
+        self._on_commit(lambda: self._apply(instance.pk, values))
+
+    def property_deleted(self, pk):
+        def discard():
+            for by_value in self._bitmaps.values():
+                for bitmap in by_value.values():
+                    bitmap.discard(pk)
+        self._on_commit(discard)
+
+    def categories_changed(self, pks):
+        """
+        У объектов pks изменились категории. Отметка updated_at сообщает об этом
+        другим процессам; здесь категории перечитываются после фиксации.
+        """
+        if not self.enabled:
+            return
+        pks = list(pks)
+        Property.objects.filter(pk__in=pks).update(updated_at=timezone.now())
+        if self._bitmaps is None:
+            return
+
+        def reload():
+            categories = load_categories(pks, self.config['CHUNK_SIZE'])
+            with self._lock:
+                if self._bitmaps is not None:
+                    for pk in pks:
+                        self._apply(pk, {}, categories.get(pk, []))
+        transaction.on_commit(reload)
+
+    def properties_changed(self):
+        """
+        Объекты изменены в обход сигналов (listing.bulk): дочитываем их после фиксации.
+        """
+        if self.enabled and self._bitmaps is not None:
+            transaction.on_commit(lambda: self.refresh(force=True))
+
+    def _on_commit(self, change):
+        if not self.enabled or self._bitmaps is None:
+            return
+
+        def apply():
+            with self._lock:
+                if self._bitmaps is not None:
+                    change()
+        transaction.on_commit(apply)
+
+
+def load_categories(pks, chunk_size):
+    """
+    {id объекта: [id категорий]} для объектов pks.
+    """
+    through = Property.categories.through
+    categories = {}
+    for start in range(0, len(pks), chunk_size):
+        links = through.objects.filter(property_id__in=pks[start:start + chunk_size])
+        for pk, category_id in links.values_list('property_id', 'category_id'):
+            categories.setdefault(pk, []).append(category_id)
+    return categories
+
+
+bitmap_index = BitmapIndex()
@@ -0,0 +1,141 @@
+"""
+Массовое создание и обновление объектов жилья: POST /api/properties/bulk/.
+
+Строки (JSON-массив или CSV-файл) проверяются BulkPropertyListSerializer
+и записываются в одной транзакции пачками по BULK_CHUNK_SIZE: bulk_create
+для новых объектов, bulk_update для строк с `id`, связи с категориями —
+bulk_create по промежуточной таблице. bulk_create и bulk_update не отправляют
+сигналы, поэтому поисковый индекс, битовый индекс и кэш ответов обновляются
+здесь явно.
+"""
+import csv
+import io
+import uuid
+
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .bitmaps import bitmap_index
+from .cache import property_cache
+from .geo import cell_of
+from .metrics import registry
+from .models import Property
+from .search import get_search_backend
+
+BULK_CHUNK_SIZE = 1000
+
+# Начало временного названия строки, пока ее id не прочитан (insert_properties)
+BULK_MARKER_PREFIX = 'bulk-insert:'
+
+# Поля строки CSV со списком значений через ';'
+CSV_LIST_FIELDS = ('categories',)
+
+
+def parse_csv(upload):
+    """
+    Строки CSV-файла (первая строка — заголовок) в виде словарей для сериализатора.
+    Пустые ячейки считаются неуказанными полями.
+    """
+    text = io.TextIOWrapper(upload, encoding='utf-8-sig', newline='')
+    rows = []
+    for record in csv.DictReader(text):
+        row = {key.strip(): value.strip() for key, value in record.items() if key and value and value.strip()}
+        for field in CSV_LIST_FIELDS:
+            if field in row:
+                row[field] = [value.strip() for value in row[field].split(';') if value.strip()]
+        rows.append(row)
+    return rows
+
+
+def chunked(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def insert_properties(owner, properties):
+    if connection.features.can_return_rows_from_bulk_insert:
+        Property.objects.bulk_create(properties)
+        return
+    # MySQL не возвращает id из INSERT: строки пачки вставляются с временными
+    # названиями-метками, по меткам читаются их id, затем названия восстанавливаются.
+    # Строки, созданные параллельно (в том числе с тем же владельцем и названием), не путаются с пачкой
+    marker = f'{BULK_MARKER_PREFIX}{uuid.uuid4().hex}:'
+    titles = [prop.title for prop in properties]
+    for number, prop in enumerate(properties):
+        prop.title = f'{marker}{number}'
+    watermark = Property.objects.aggregate(last=Max('pk'))['last'] or 0
+    Property.objects.bulk_create(properties)
+    inserted = dict(Property.objects.filter(pk__gt=watermark, title__startswith=marker).values_list('title', 'pk'))
+    for prop, title in zip(properties, titles):
+        prop.pk = inserted[prop.title]
+        prop.title = title
+    Property.objects.bulk_update(properties, ['title'])
+
+
+def save_properties(owner, rows, chunk_size=BULK_CHUNK_SIZE):
+    """
+    Создает и обновляет объекты владельца по проверенным строкам.
+    Возвращает (созданные, обновленные) объекты.
+    """
+    created, updated, links = [], [], {}
+    new_rows = [row for row in rows if 'id' not in row]
+    changed_rows = {row['id']: row for row in rows if 'id' in row}
+
+    with transaction.atomic():
+        for chunk in chunked(new_rows, chunk_size):
+            properties = [
+                Property(owner=owner, **{key: value for key, value in row.items() if key != 'categories'})
+                for row in chunk
+            ]
+            for prop in properties:
+                prop.geo_cell = cell_of(prop.latitude, prop.longitude)
+            insert_properties(owner, properties)
+            for prop, row in zip(properties, chunk):
+                if 'categories' in row:
+                    links[prop.pk] = row['categories']
+            created.extend(properties)
+
+        fields = sorted({key for row in changed_rows.values() for key in row} - {'id', 'categories'})
+        if 'latitude' in fields:
+            # bulk_update не вызывает Property.save: ячейку сетки пересчитываем сами
+            fields.append('geo_cell')
+        # bulk_update не заполняет auto_now, а по updated_at другие процессы дочитывают
+        # битовый индекс (listing.bitmaps); связи с категориями тоже считаются изменением
+        fields.append('updated_at')
+        now = timezone.now()
+        for chunk in chunked(list(changed_rows), chunk_size):
+            properties = list(Property.objects.filter(pk__in=chunk).only('id', 'title', 'description', *fields))
+            for prop in properties:
+                row = changed_rows[prop.pk]
+                for field in fields:
+                    if field in row:
+                        setattr(prop, field, row[field])
+                prop.updated_at = now
+                if 'geo_cell' in fields:
+                    prop.geo_cell = cell_of(prop.latitude, prop.longitude)
+                if 'categories' in row:
+                    links[prop.pk] = row['categories']
+            Property.objects.bulk_update(properties, fields)
+            updated.extend(properties)
+
+        through = Property.categories.through
+        replaced = [pk for pk in links if pk in changed_rows]
+        for chunk in chunked(replaced, chunk_size):
+            through.objects.filter(property_id__in=chunk).delete()
+        through.objects.bulk_create([
+            through(property_id=pk, category_id=category_id)
+            for pk, category_ids in links.items()
+            for category_id in set(category_ids)
+        ], batch_size=chunk_size)
+
+        reindexed = updated if {'title', 'description'} & set(fields) else []
+        for chunk in chunked(created + reindexed, chunk_size):
+            get_search_backend().index_properties(chunk)
+        bitmap_index.properties_changed()
+
+    # Новые объекты меняют только списки; у обновленных сбрасываем и кэш просмотра
+    property_cache.invalidate_properties([prop.pk for prop in updated])
+    registry.incr('properties.bulk_created', len(created))
+    registry.incr('properties.bulk_updated', len(updated))
+    return created, updated
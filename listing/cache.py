@@ -0,0 +1,218 @@
+import hashlib
+import json
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.http import parse_etags, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+from .metrics import registry
+
+
+class ResponseCache:
+    """
+    Кэш ответов анонимных GET-запросов к объектам жилья.
+
+    Ключ ответа включает версии данных, от которых он зависит, поэтому
+    инвалидация — это увеличение версии (`bump`), а не удаление ключей:
+    старые записи просто перестают читаться и вытесняются по TTL.
+
+    - версия списка меняется при любом изменении объектов, категорий и отзывов;
+    - версия объекта — при изменении самого объекта, его категорий и отзывов;
+    - версия бронирований учитывается только запросами с фильтром свободных дат.
+
+    Хранилище — кэш Django с алиасом settings.API_CACHE['ALIAS']
+    (LocMemCache в разработке и тестах, Redis в production).
+    """
+    LIST_VERSION = 'property:list:version'
+    BOOKINGS_VERSION = 'property:bookings:version'
+    DATE_PARAMS = ('available_from', 'available_to')
+
+    def __init__(self, name):
+        self.name = name
+        registry.gauge(f'{name}.hit_ratio', self.hit_ratio)
+
+    @property
+    def cache(self):
+        return caches[settings.API_CACHE['ALIAS']]
+
+    @property
+    def timeout(self):
+        return settings.API_CACHE['TIMEOUT']
+
+    @staticmethod
+    def property_version_key(pk):
+        return f'property:{pk}:version'
+
+    def versions(self, keys):
+        found = self.cache.get_many(keys)
+        for key in keys:
+            if key not in found:
+                # Начальная версия от текущего времени не совпадет с версиями вытесненного ключа
+                self.cache.add(key, int(time.time() * 1000), timeout=None)
+                found[key] = self.cache.get(key)
+        return [str(found[key]) for key in keys]
+
+    async def aversions(self, keys):
+        found = await self.cache.aget_many(keys)
+        for key in keys:
+            if key not in found:
+                await self.cache.aadd(key, int(time.time() * 1000), timeout=None)
+                found[key] = await self.cache.aget(key)
+        return [str(found[key]) for key in keys]
+
+    def bump(self, *keys):
+        """
+        Повышает версии после коммита текущей транзакции: если повысить их раньше,
+        параллельный запрос успеет прочитать старые данные и закэшировать их под
+        новой версией. Вне транзакции версии повышаются сразу.
+        """
+        transaction.on_commit(lambda: self._bump(keys))
+
+    def _bump(self, keys):
+        for key in keys:
+            try:
+                self.cache.incr(key)
+            except ValueError:
+                self.cache.set(key, int(time.time() * 1000), timeout=None)
+        registry.incr(f'{self.name}.invalidations', len(keys))
+
+    def invalidate_properties(self, pks):
+        self.bump(self.LIST_VERSION, *(self.property_version_key(pk) for pk in pks))
+
+    def invalidate_bookings(self):
+        self.bump(self.BOOKINGS_VERSION)
+
+    def list_version_keys(self, request):
+        keys = [self.LIST_VERSION]
+        if any(param in request.query_params for param in self.DATE_PARAMS):
+            keys.append(self.BOOKINGS_VERSION)
+        return keys
+
+    @staticmethod
+    def build_list_key(request, versions, kind='list'):
+        query = urlencode(sorted(request.query_params.lists()), doseq=True)
+        signature = hashlib.sha1(query.encode('utf-8')).hexdigest()
+        return f'property:{kind}:{":".join(versions)}:{signature}'
+
+    def list_key(self, request, kind='list'):
+        # kind отделяет ответы других представлений списка с теми же параметрами (facets)
+        return self.build_list_key(request, self.versions(self.list_version_keys(request)), kind)
+
+    async def alist_key(self, request):
+        return self.build_list_key(request, await self.aversions(self.list_version_keys(request)))
+
+    @staticmethod
+    def normalize_pk(pk):
+        try:
+            return int(pk)
+        except (TypeError, ValueError):
+            return None
+
+    def detail_key(self, pk):
+        pk = self.normalize_pk(pk)
+        if pk is None:
+            return None
+        version, = self.versions([self.property_version_key(pk)])
+        return f'property:detail:{pk}:{version}'
+
+    async def adetail_key(self, pk):
+        pk = self.normalize_pk(pk)
+        if pk is None:
+            return None
+        version, = await self.aversions([self.property_version_key(pk)])
+        return f'property:detail:{pk}:{version}'
+
+    def hit_ratio(self):
+        hits = registry.value(f'{self.name}.hits')
+        total = hits + registry.value(f'{self.name}.misses')
+        return hits / total if total else 0.0
+
+    def respond(self, request, get_key, compute):
+        """
+        Возвращает ответ из кэша или вычисляет его через compute().
+        Поддерживает ETag / If-None-Match (304 Not Modified).
+        """
+        if request.method != 'GET' or request.user.is_authenticated:
+            return compute()
+        key = get_key()
+        if key is None:
+            return compute()
+
+        cached = self.cache.get(key)
+        if cached is not None:
+            return self.hit(request, cached)
+        registry.incr(f'{self.name}.misses')
+        response = compute()
+        if response.status_code != status.HTTP_200_OK:
+            return response
+        cached = self.encode(response)
+        self.cache.set(key, cached, self.timeout)
+        return self.conditional(request, response, cached[0])
+
+    async def arespond(self, request, get_key, compute):
+        """
+        То же, что respond(), для асинхронных представлений: get_key и compute — корутины.
+        """
+        if request.method != 'GET' or request.user.is_authenticated:
+            return await compute()
+        key = await get_key()
+        if key is None:
+            return await compute()
+
+        cached = await self.cache.aget(key)
+        if cached is not None:
+            return self.hit(request, cached)
+        registry.incr(f'{self.name}.misses')
+        response = await compute()
+        if response.status_code != status.HTTP_200_OK:
+            return response
+        cached = self.encode(response)
+        await self.cache.aset(key, cached, self.timeout)
+        return self.conditional(request, response, cached[0])
+
+    @staticmethod
+    def encode(response):
+        payload = json.dumps(response.data, cls=JSONEncoder)
+        return quote_etag(hashlib.sha1(payload.encode('utf-8')).hexdigest()), payload
+
+    def hit(self, request, cached):
+        registry.incr(f'{self.name}.hits')
+        etag, payload = cached
+        return self.conditional(request, Response(json.loads(payload)), etag)
+
+    @staticmethod
+    def conditional(request, response, etag):
+        if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        response['ETag'] = etag
+        return response
+
+
+property_cache = ResponseCache('property_cache')
+
+
+class CachedReadMixin:
+    """
+    Кэширует ответы list и retrieve для анонимных пользователей (см. ResponseCache).
+    """
+
+    def list(self, request, *args, **kwargs):
+        return property_cache.respond(
+            request,
+            lambda: property_cache.list_key(request),
+            lambda: super(CachedReadMixin, self).list(request, *args, **kwargs),
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup = kwargs.get(self.lookup_url_kwarg or self.lookup_field)
+        return property_cache.respond(
+            request,
+            lambda: property_cache.detail_key(lookup),
+            lambda: super(CachedReadMixin, self).retrieve(request, *args, **kwargs),
+        )
@@ -0,0 +1,108 @@
+import itertools
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db.models import F
+
+from .background import BackgroundFlusher
+from .metrics import registry
+from .models import Property
+
+logger = logging.getLogger(__name__)
+
+
+class ShardedCounter(BackgroundFlusher):
+    """
+    Счетчик в памяти процесса с периодическим сбросом в БД.
+
+    Приращения раскладываются по шардам (у каждого потока свой шард
+    со своей блокировкой), поэтому потоки не конкурируют за одну
+    блокировку. При сбросе накопленные значения группируются по величине
+    приращения и записываются запросами вида
+    `UPDATE ... SET views = views + n WHERE id IN (...)`: без чтения
+    строки и без потерянных обновлений, в том числе когда в БД
+    одновременно пишут несколько процессов.
+    """
+
+    def __init__(self, model, field, name, shards=None, flush_interval=None):
+        super().__init__()
+        self.model = model
+        self.field = field
+        self.name = name
+        self._flush_interval = flush_interval
+        shards = shards or settings.VIEW_COUNTER['SHARDS']
+        self._shards = [[threading.Lock(), defaultdict(int)] for _ in range(shards)]
+        self._shard_numbers = itertools.count()
+        self._local = threading.local()
+        registry.gauge(f'{name}.pending', self.pending)
+
+    @property
+    def flush_interval(self):
+        if self._flush_interval is not None:
+            return self._flush_interval
+        return settings.VIEW_COUNTER['FLUSH_INTERVAL']
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = self._shards[next(self._shard_numbers) % len(self._shards)]
+        return shard
+
+    def incr(self, pk, value=1):
+        shard = self._shard()
+        with shard[0]:
+            shard[1][pk] += value
+        self.ensure_started()
+
+    def pending(self):
+        total = 0
+        for lock, counts in self._shards:
+            # Без блокировки шарда словарь может измениться во время обхода
+            with lock:
+                total += sum(counts.values())
+        return total
+
+    def drain(self):
+        """
+        Забирает накопленные приращения из всех шардов: {pk: n}.
+        """
+        totals = defaultdict(int)
+        for shard in self._shards:
+            with shard[0]:
+                counts, shard[1] = shard[1], defaultdict(int)
+            for pk, value in counts.items():
+                totals[pk] += value
+        return totals
+
+    def flush(self):
+        totals = self.drain()
+        if not totals:
+            return 0
+
+        by_value = defaultdict(list)
+        for pk, value in totals.items():
+            by_value[value].append(pk)
+
+        flushed = 0
+        started = time.perf_counter()
+        for value, pks in by_value.items():
+            for offset in range(0, len(pks), 500):
+                chunk = pks[offset:offset + 500]
+                try:
+                    self.model.objects.filter(pk__in=chunk).update(**{self.field: F(self.field) + value})
+                    flushed += value * len(chunk)
+                except Exception:
+                    # Возвращаем приращения в счетчик, чтобы не потерять их
+                    for pk in chunk:
+                        self.incr(pk, value)
+                    logger.exception('Failed to flush %s for %d rows', self.name, len(chunk))
+
+        registry.observe(f'{self.name}.flush_latency', time.perf_counter() - started)
+        registry.incr(f'{self.name}.flushed', flushed)
+        return flushed
+
+
+view_counter = ShardedCounter(Property, 'views', 'view_counter')
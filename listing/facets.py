@@ -0,0 +1,196 @@
+"""
+Счетчики фасетов для GET /api/properties/facets/: тип, город, число комнат,
+диапазон цены и категории.
+
+Счетчики фасета учитывают все активные фильтры, кроме фильтров самого фасета:
+при выбранном ?property_type=house остальные типы тоже показываются со своими
+числами. Для этого объекты с нефасетными фильтрами (цена, поиск, даты,
+координаты, рейтинг) группируются одним GROUP BY по сочетанию (тип, город,
+комнаты, диапазон цены, набор категорий объекта). Фасетные фильтры
+(FACET_PARAMS) применяются к этим группам в Python.
+
+Группы кэшируются по версии списка (как ответы списка, см. listing.cache)
+и нефасетным параметрам, поэтому переключение фасетов не обращается к базе.
+Группировка читает покрывающий индекс property_facet_idx, а набор категорий —
+уникальный индекс промежуточной таблицы (property_id, category_id). Групп не
+больше произведения числа различных значений полей и наборов категорий,
+поэтому фасеты подходят для полей с небольшим числом значений.
+"""
+import hashlib
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.db.models import Aggregate, Case, CharField, Count, IntegerField, OuterRef, Subquery, Value, When
+
+from .bitmaps import text_key
+from .cache import property_cache
+from .metrics import registry
+from .models import Category, Property
+
+# Фасетные фильтры PropertyFilter: не сужают счетчики своего фасета
+FACET_PARAMS = ('property_type', 'location', 'room_count__gte', 'room_count__lte', 'categories')
+
+# Параметры, не влияющие на набор объектов
+IGNORED_PARAMS = ('ordering', 'cursor', 'page_size')
+
+GROUP_FIELDS = ('property_type', 'location', 'room_count', 'price_bucket')
+
+
+def price_bucket(edges):
+    """
+    Номер диапазона цены: 0 — ниже edges[0], i — [edges[i-1], edges[i]), len(edges) — от edges[-1].
+    """
+    return Case(
+        *(When(price__lt=edge, then=Value(index)) for index, edge in enumerate(edges)),
+        default=Value(len(edges)),
+        output_field=IntegerField(),
+    )
+
+
+class GroupConcat(Aggregate):
+    """
+    Значения группы через запятую в произвольном порядке.
+    """
+    function = 'GROUP_CONCAT'
+    output_field = CharField()
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler, connection, function='STRING_AGG', template="%(function)s(%(expressions)s::text, ',')",
+            **extra_context
+        )
+
+
+def category_ids():
+    """
+    id категорий объекта одной строкой ('3,1') или NULL, если категорий нет.
+    """
+    links = Property.categories.through.objects.filter(property=OuterRef('pk')).order_by()
+    return Subquery(links.values('property').annotate(ids=GroupConcat('category')).values('ids'))
+
+
+def load_groups(queryset):
+    """
+    ([(*GROUP_FIELDS, отсортированные id категорий, число объектов)], {id категории: название}).
+    """
+    queryset = queryset.order_by().annotate(
+        price_bucket=price_bucket(settings.FACETS['PRICE_EDGES']),
+        category_ids=category_ids(),
+    )
+    rows = (
+        queryset.values(*GROUP_FIELDS, 'category_ids')
+        .annotate(total=Count('pk'))
+        .values_list(*GROUP_FIELDS, 'category_ids', 'total')
+    )
+    totals = {}
+    for *fields, ids, total in rows:
+        # Порядок в GROUP_CONCAT не задан: одинаковые наборы в разном порядке склеиваются
+        key = (*fields, tuple(sorted(int(pk) for pk in ids.split(','))) if ids else ())
+        totals[key] = totals.get(key, 0) + total
+    used = {pk for key in totals for pk in key[-1]}
+    names = dict(Category.objects.filter(pk__in=used).values_list('pk', 'name'))
+    return [[*key, total] for key, total in totals.items()], names
+
+
+def groups_key(request):
+    params = [
+        (name, values) for name, values in sorted(request.query_params.lists())
+        if name not in FACET_PARAMS and name not in IGNORED_PARAMS
+    ]
+    signature = hashlib.sha1(urlencode(params, doseq=True).encode('utf-8')).hexdigest()
+    versions = property_cache.versions(property_cache.list_version_keys(request))
+    return f'property:facet-groups:{":".join(versions)}:{signature}'
+
+
+def cached_groups(request, queryset):
+    """
+    Группы объектов queryset (с нефасетными фильтрами запроса) из кэша или из базы.
+    """
+    key = groups_key(request)
+    groups = property_cache.cache.get(key)
+    if groups is None:
+        registry.incr('facets.misses')
+        groups = load_groups(queryset)
+        property_cache.cache.set(key, groups, property_cache.timeout)
+    else:
+        registry.incr('facets.hits')
+    return groups
+
+
+def group_filters(selected):
+    """
+    {фасет: проверка группы} для выбранных значений фасетных фильтров.
+    """
+    checks = {}
+    if selected.get('property_type'):
+        checks['property_type'] = lambda group: group[0] == selected['property_type']
+    if selected.get('location'):
+        # Как location=... в базе: без учета регистра, диакритики и пробелов в конце
+        location = text_key(selected['location'])
+        checks['location'] = lambda group: text_key(group[1]) == location
+    low, high = selected.get('room_count__gte'), selected.get('room_count__lte')
+    if low is not None or high is not None:
+        checks['room_count'] = lambda group: (low is None or group[2] >= low) and (high is None or group[2] <= high)
+    if selected.get('categories'):
+        # Объекты хотя бы одной из выбранных категорий
+        wanted = {int(pk) for pk in selected['categories']}
+        checks['categories'] = lambda group: not wanted.isdisjoint(group[4])
+    return checks
+
+
+def count_facets(groups, selected):
+    """
+    Ответ эндпоинта по группам и выбранным значениям фасетных фильтров.
+    """
+    config = settings.FACETS
+    counts, category_names = groups
+    checks = group_filters(selected)
+
+    types, locations, rooms, prices, categories = {}, {}, {}, {}, {}
+    total = 0
+    for group in counts:
+        property_type, location, room_count, bucket, category_ids, count = group
+        # Группа входит в счетчики фасета, если не прошла не больше одной проверки — его собственной
+        failed = [name for name, check in checks.items() if not check(group)]
+        if len(failed) > 1:
+            continue
+        skip = failed[0] if failed else None
+        if skip in (None, 'property_type'):
+            types[property_type] = types.get(property_type, 0) + count
+        if skip in (None, 'location'):
+            locations[location] = locations.get(location, 0) + count
+        if skip in (None, 'room_count'):
+            # Все значения от ROOMS_MAX и выше — одна корзина «ROOMS_MAX+»
+            room = min(room_count, config['ROOMS_MAX'])
+            rooms[room] = rooms.get(room, 0) + count
+        if skip in (None, 'categories'):
+            for category_id in category_ids:
+                categories[category_id] = categories.get(category_id, 0) + count
+        if skip is None:
+            prices[bucket] = prices.get(bucket, 0) + count
+            total += count
+
+    edges = config['PRICE_EDGES']
+    bounds = [None, *edges, None]
+    return {
+        'count': total,
+        'property_type': [
+            {'value': value, 'count': types.get(value, 0)} for value, _ in Property.PROPERTY_TYPES
+        ],
+        'location': [
+            {'value': value, 'count': count}
+            for value, count in sorted(locations.items(), key=lambda item: (-item[1], item[0]))[:config['LOCATIONS_LIMIT']]
+        ],
+        'room_count': [
+            {'value': f'{room}+' if room == config['ROOMS_MAX'] else str(room), 'count': count}
+            for room, count in sorted(rooms.items())
+        ],
+        'price': [
+            {'min': bounds[bucket], 'max': bounds[bucket + 1], 'count': prices.get(bucket, 0)}
+            for bucket in range(len(edges) + 1)
+        ],
+        'categories': [
+            {'id': category_id, 'name': category_names[category_id], 'count': count}
+            for category_id, count in sorted(categories.items(), key=lambda item: (-item[1], item[0]))
+        ],
+    }
@@ -0,0 +1,165 @@
+import django_filters
+from django import forms
+from django.conf import settings
+from rest_framework import filters
+
+from .availability import MAX_AVAILABILITY_WINDOW, available_between
+from .bitmaps import INDEXED_FILTERS, RECHECKED_FILTERS, bitmap_index
+from .geo import BoundingBox, within_bbox, within_radius
+from .models import Property
+from .popularity import with_trending
+from .search import get_search_backend
+
+
+def parse_coordinates(value, count):
+    """
+    Список из count чисел через запятую или None при неверном формате.
+    """
+    try:
+        numbers = [float(part) for part in value.split(',')]
+    except ValueError:
+        return None
+    return numbers if len(numbers) == count else None
+
+
+def valid_point(latitude, longitude):
+    return -90 <= latitude <= 90 and -180 <= longitude <= 180
+
+
+class PropertyFilterForm(forms.Form):
+    def clean(self):
+        cleaned_data = super().clean()
+        self.clean_geo(cleaned_data)
+        available_from = cleaned_data.get('available_from')
+        available_to = cleaned_data.get('available_to')
+        if (available_from is None) != (available_to is None):
+            raise forms.ValidationError('Параметры available_from и available_to указываются вместе.')
+        if available_from and (available_from >= available_to or available_to - available_from > MAX_AVAILABILITY_WINDOW):
+            raise forms.ValidationError('Некорректный диапазон дат.')
+        return cleaned_data
+
+    def clean_geo(self, cleaned_data):
+        # near=lat,lng -> (lat, lng); bbox=south,west,north,east -> BoundingBox
+        near, radius_km, bbox = cleaned_data.get('near'), cleaned_data.get('radius_km'), cleaned_data.get('bbox')
+        if near:
+            point = parse_coordinates(near, 2)
+            if point is None or not valid_point(*point):
+                raise forms.ValidationError('Параметр near: широта и долгота через запятую.')
+            if radius_km is None:
+                raise forms.ValidationError('Параметр near указывается вместе с radius_km.')
+            if not 0 < radius_km <= settings.GEO['MAX_RADIUS_KM']:
+                raise forms.ValidationError(f'radius_km: от 0 до {settings.GEO["MAX_RADIUS_KM"]}.')
+            cleaned_data['near'] = point
+        elif radius_km is not None:
+            raise forms.ValidationError('Параметр radius_km указывается вместе с near.')
+        if bbox:
+            box = parse_coordinates(bbox, 4)
+            # west > east допустимо: прямоугольник пересекает 180-й меридиан
+            if box is None or not valid_point(box[0], box[1]) or not valid_point(box[2], box[3]) or box[0] > box[2]:
+                raise forms.ValidationError('Параметр bbox: south,west,north,east.')
+            cleaned_data['bbox'] = BoundingBox(*box)
+
+
+class NumberInFilter(django_filters.BaseInFilter, django_filters.NumberFilter):
+    pass
+
+
+class PropertyFilter(django_filters.FilterSet):
+    # Свободные даты: исключаем объекты с активным бронированием в [available_from, available_to)
+    available_from = django_filters.DateFilter(method='filter_available')
+    available_to = django_filters.DateFilter(method='filter_available')
+    # Средняя оценка не ниже заданной (по колонке rating_avg, см. listing.ratings)
+    min_rating = django_filters.NumberFilter(field_name='rating_avg', lookup_expr='gte')
+    # Объекты в радиусе от точки (?near=lat,lng&radius_km=) и в прямоугольнике
+    # (?bbox=south,west,north,east), см. listing.geo
+    near = django_filters.CharFilter(method='filter_geo')
+    radius_km = django_filters.NumberFilter(method='filter_geo')
+    bbox = django_filters.CharFilter(method='filter_geo')
+    # Объекты хотя бы одной из категорий: ?categories=1,2
+    categories = NumberInFilter(field_name='categories', distinct=True)
+
+    class Meta:
+        model = Property
+        form = PropertyFilterForm
+        fields = {
+            'price': ['gte', 'lte'],  # Фильтрация по минимальной и максимальной цене
+            'location': ['exact'],  # Фильтрация по местоположению
+            'room_count': ['gte', 'lte'],  # Фильтрация по диапазону количества комнат
+            'property_type': ['exact'],  # Фильтрация по типу жилья
+            'status': ['exact'],  # Фильтрация по статусу публикации
+        }
+
+    def filter_available(self, queryset, name, value):
+        # Оба параметра применяются вместе в filter_queryset
+        return queryset
+
+    def filter_geo(self, queryset, name, value):
+        # Параметры разбираются вместе в форме и применяются в filter_queryset
+        return queryset
+
+    def filter_queryset(self, queryset):
+        # Сочетание фильтров с небольшим числом значений может вычислить битовый индекс
+        # (listing.bitmaps): тогда они заменяются одним условием `pk IN (...)`
+        ids = bitmap_index.resolve(self.form.cleaned_data)
+        if ids is None:
+            queryset = super().filter_queryset(queryset)
+        else:
+            queryset = queryset.filter(pk__in=ids)
+            for name, value in self.form.cleaned_data.items():
+                if name not in INDEXED_FILTERS or name in RECHECKED_FILTERS:
+                    queryset = self.filters[name].filter(queryset, value)
+        available_from = self.form.cleaned_data.get('available_from')
+        available_to = self.form.cleaned_data.get('available_to')
+        if available_from and available_to:
+            queryset = available_between(queryset, available_from, available_to)
+        near, bbox = self.form.cleaned_data.get('near'), self.form.cleaned_data.get('bbox')
+        if bbox:
+            queryset = within_bbox(queryset, bbox)
+        if near:
+            queryset = within_radius(queryset, *near, float(self.form.cleaned_data['radius_km']))
+        return queryset
+
+
+class PropertySearchFilter(filters.SearchFilter):
+    """
+    Поиск по параметру `?search=` через настраиваемый бэкенд
+    (settings.PROPERTY_SEARCH_BACKEND) вместо LIKE '%...%' по полям модели.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms:
+            return queryset
+        return get_search_backend().search(queryset, ' '.join(terms))
+
+
+class RankedOrderingFilter(filters.OrderingFilter):
+    """
+    OrderingFilter, который без явного `?ordering=` сортирует результаты
+    поиска по расстоянию (при `?near=`) или по релевантности, а для
+    `?ordering=-trending` берет популярность из PropertyPopularity
+    (см. listing.popularity).
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        ordering = self.get_ordering(request, queryset, view) or []
+        if any(term.lstrip('-') == 'trending' for term in ordering):
+            queryset = with_trending(queryset)
+        return super().filter_queryset(request, queryset, view)
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        if request.query_params.get(self.ordering_param):
+            return ordering
+        if 'distance' in queryset.query.annotations:
+            return ['distance', *(ordering or [])]
+        if 'search_rank' in queryset.query.annotations:
+            return ['-search_rank', *(ordering or [])]
+        return ordering
+
+    def remove_invalid_fields(self, queryset, fields, view, request):
+        # Расстояние есть только при ?near=
+        valid = super().remove_invalid_fields(queryset, fields, view, request)
+        if 'distance' not in queryset.query.annotations:
+            valid = [term for term in valid if term.lstrip('-') != 'distance']
+        return valid
@@ -0,0 +1,154 @@
+"""
+Поиск объектов по координатам: ?near=lat,lng&radius_km= и ?bbox=.
+
+Земной шар разбит на сетку ячеек CELL_DEGREES x CELL_DEGREES градусов,
+номер ячейки объекта хранится в индексированной колонке Property.geo_cell
+и пересчитывается при каждом сохранении (Property.save, listing.bulk).
+Номера идут по строкам сетки (широтам), поэтому ячейки прямоугольника
+в одной строке — это один диапазон номеров, и запрос читает из индекса
+только несколько диапазонов вместо всей таблицы. Затем оставшиеся
+кандидаты отсекаются по координатам и расстоянию (формула гаверсинусов
+на обычных математических функциях, без GIS-расширений).
+
+При изменении CELL_DEGREES ячейки нужно пересчитать:
+`python manage.py rebuild_geo_index`.
+"""
+import math
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, FloatField, Q, Value
+from django.db.models.functions import ASin, Cos, Least, Power, Radians, Sin, Sqrt
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def grid():
+    """
+    (размер ячейки в градусах, число ячеек в строке, число строк).
+    """
+    size = settings.GEO['CELL_DEGREES']
+    return size, math.ceil(360 / size), math.ceil(180 / size)
+
+
+def cell_of(latitude, longitude):
+    """
+    Номер ячейки сетки для точки или None, если координат нет.
+    """
+    if latitude is None or longitude is None:
+        return None
+    size, columns, rows = grid()
+    row = min(int((latitude + 90) // size), rows - 1)
+    column = int((longitude + 180) // size) % columns
+    return row * columns + column
+
+
+class BoundingBox:
+    """
+    Прямоугольник координат. west > east означает, что он пересекает 180-й меридиан.
+    """
+
+    def __init__(self, south, west, north, east):
+        self.south, self.west, self.north, self.east = south, west, north, east
+
+    @classmethod
+    def around(cls, latitude, longitude, radius_km):
+        """
+        Наименьший прямоугольник, содержащий круг радиуса radius_km.
+        """
+        angle = radius_km / EARTH_RADIUS_KM
+        south = latitude - math.degrees(angle)
+        north = latitude + math.degrees(angle)
+        if south <= -90 or north >= 90:
+            # Круг накрывает полюс: подходят все долготы
+            return cls(max(south, -90), -180, min(north, 90), 180)
+        spread = math.degrees(math.asin(min(1, math.sin(angle) / math.cos(math.radians(latitude)))))
+        west, east = longitude - spread, longitude + spread
+        if east - west >= 360:
+            return cls(south, -180, north, 180)
+        return cls(south, west + 360 if west < -180 else west, north, east - 360 if east > 180 else east)
+
+    def longitude_spans(self):
+        if self.west <= self.east:
+            return [(self.west, self.east)]
+        return [(self.west, 180), (-180, self.east)]
+
+    def cell_ranges(self):
+        """
+        Диапазоны номеров ячеек, покрывающих прямоугольник: по одному на строку
+        сетки и участок долгот. Если строк больше MAX_CELL_ROWS, вся полоса широт
+        берется одним диапазоном.
+        """
+        size, columns, rows = grid()
+        first = cell_of(self.south, 0) // columns
+        last = cell_of(self.north, 0) // columns
+        if last - first + 1 > settings.GEO['MAX_CELL_ROWS']:
+            return [(first * columns, last * columns + columns - 1)]
+        ranges = []
+        for west, east in self.longitude_spans():
+            low = cell_of(0, west) % columns
+            high = cell_of(0, east) % columns if east < 180 else columns - 1
+            ranges.extend((row * columns + low, row * columns + high) for row in range(first, last + 1))
+        return ranges
+
+    def condition(self):
+        cells = Q()
+        for low, high in self.cell_ranges():
+            cells |= Q(geo_cell__range=(low, high))
+        longitudes = Q()
+        for west, east in self.longitude_spans():
+            longitudes |= Q(longitude__range=(west, east))
+        return cells & Q(latitude__range=(self.south, self.north)) & longitudes
+
+
+def distance_km(latitude, longitude):
+    """
+    Выражение: расстояние от точки до объекта по дуге большого круга, км.
+    """
+    lat = math.radians(latitude)
+    haversine = (
+        Power(Sin((Radians(F('latitude')) - Value(lat)) / 2), 2)
+        + Value(math.cos(lat)) * Cos(Radians(F('latitude')))
+        * Power(Sin((Radians(F('longitude')) - Value(math.radians(longitude))) / 2), 2)
+    )
+    # Least: погрешность округления не должна выводить аргумент asin за 1
+    return Value(2 * EARTH_RADIUS_KM) * ASin(Sqrt(Least(haversine, Value(1.0), output_field=FloatField())))
+
+
+def within_radius(queryset, latitude, longitude, radius_km):
+    """
+    Объекты не дальше radius_km от точки с аннотацией `distance` (км).
+    """
+    box = BoundingBox.around(latitude, longitude, radius_km)
+    return (
+        queryset.filter(box.condition())
+        .annotate(distance=distance_km(latitude, longitude))
+        .filter(distance__lte=radius_km)
+    )
+
+
+def within_bbox(queryset, box):
+    return queryset.filter(box.condition())
+
+
+def rebuild(chunk_size=5000):
+    """
+    Пересчитывает geo_cell всех объектов с координатами. Возвращает число объектов.
+    """
+    from .models import Property
+
+    updated = 0
+    last_id = 0
+    while True:
+        properties = list(
+            Property.objects.filter(pk__gt=last_id, latitude__isnull=False, longitude__isnull=False)
+            .order_by('pk').only('id', 'latitude', 'longitude', 'geo_cell')[:chunk_size]
+        )
+        if not properties:
+            return updated
+        for prop in properties:
+            prop.geo_cell = cell_of(prop.latitude, prop.longitude)
+        with transaction.atomic():
+            Property.objects.bulk_update(properties, ['geo_cell'])
+        updated += len(properties)
+        last_id = properties[-1].pk
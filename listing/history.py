@@ -0,0 +1,102 @@
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import IntegrityError
+
+from .background import BackgroundFlusher
+from .metrics import registry
+from .models import SearchHistory, ViewHistory
+
+logger = logging.getLogger(__name__)
+
+
+class HistoryBuffer(BackgroundFlusher):
+    """
+    Буфер отложенной записи истории (write-behind).
+
+    Запросы только добавляют объекты в память, а в БД они попадают
+    одним bulk_create при накоплении MAX_SIZE записей или раз в
+    FLUSH_INTERVAL секунд. Поле created_at получает время сброса,
+    то есть может отставать от события не больше чем на FLUSH_INTERVAL.
+    """
+
+    def __init__(self, model, name, max_size=None, flush_interval=None):
+        super().__init__()
+        self.model = model
+        self.name = name
+        self._max_size = max_size
+        self._flush_interval = flush_interval
+        self._items = []
+        self._lock = threading.Lock()
+        registry.gauge(f'{name}.buffer_depth', self.depth)
+
+    @property
+    def max_size(self):
+        if self._max_size is not None:
+            return self._max_size
+        return settings.HISTORY_BUFFER['MAX_SIZE']
+
+    @property
+    def flush_interval(self):
+        if self._flush_interval is not None:
+            return self._flush_interval
+        return settings.HISTORY_BUFFER['FLUSH_INTERVAL']
+
+    def depth(self):
+        return len(self._items)
+
+    def add(self, **fields):
+        with self._lock:
+            self._items.append(self.model(**fields))
+            full = len(self._items) >= self.max_size
+
+        self.ensure_started()
+        if full:
+            if self.is_running():
+                self.wakeup()
+            else:
+                self.flush()
+
+    def flush(self):
+        with self._lock:
+            items, self._items = self._items, []
+        if not items:
+            return 0
+
+        started = time.perf_counter()
+        try:
+            try:
+                self.model.objects.bulk_create(items, batch_size=1000)
+            except IntegrityError:
+                # Объект или пользователь удален до сброса: записываем остальные
+                valid = self.existing_references(items)
+                registry.incr(f'{self.name}.dropped', len(items) - len(valid))
+                logger.warning('Dropped %d %s records with deleted references', len(items) - len(valid), self.name)
+                items = valid
+                self.model.objects.bulk_create(items, batch_size=1000)
+        except Exception:
+            registry.incr(f'{self.name}.dropped', len(items))
+            logger.exception('Failed to flush %d %s records', len(items), self.name)
+            return 0
+
+        registry.observe(f'{self.name}.flush_latency', time.perf_counter() - started)
+        registry.incr(f'{self.name}.flushed', len(items))
+        return len(items)
+
+    def existing_references(self, items):
+        """
+        Записи, все внешние ключи которых указывают на существующие строки.
+        """
+        for field in self.model._meta.concrete_fields:
+            if not field.many_to_one:
+                continue
+            ids = {getattr(item, field.attname) for item in items}
+            existing = set(field.related_model._default_manager.filter(pk__in=ids).values_list('pk', flat=True))
+            items = [item for item in items if getattr(item, field.attname) in existing]
+        return items
+
+
+search_history_buffer = HistoryBuffer(SearchHistory, 'search_history')
+view_history_buffer = HistoryBuffer(ViewHistory, 'view_history')
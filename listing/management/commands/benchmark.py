@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from listing.benchmarks import SCENARIOS, run
+
+
+class Command(BaseCommand):
+    help = 'Запуск бенчмарка подсистемы. Тестовые данные создаются в транзакции и откатываются'
+
+    def add_arguments(self, parser):
+        parser.add_argument('scenario', choices=sorted(SCENARIOS), help='Название сценария')
+        parser.add_argument('--scale', type=int, default=None, help='Объем тестовых данных (по умолчанию свой для сценария)')
+        parser.add_argument('--repeat', type=int, default=100, help='Число повторов измеряемой операции')
+        parser.add_argument('--seed', type=int, default=0, help='Seed генератора тестовых данных')
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.WARNING(f'Сценарий: {options["scenario"]}'))
+        run(options['scenario'], self.stdout, scale=options['scale'], repeat=options['repeat'], seed=options['seed'])
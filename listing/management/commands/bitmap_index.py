@@ -0,0 +1,36 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from listing.bitmaps import build, memory_report, total_bytes, write_snapshot
+
+
+class Command(BaseCommand):
+    help = (
+        'Построение битового индекса фильтров объектов и отчет о его размере по полям. '
+        'С --snapshot сохраняет снимок, с которого процессы API загружают индекс при старте'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--snapshot', nargs='?', const='', default=None,
+            help='Файл снимка (по умолчанию BITMAP_INDEX["SNAPSHOT_PATH"])',
+        )
+
+    def handle(self, *args, **options):
+        path = options['snapshot']
+        if path is not None:
+            path = path or settings.BITMAP_INDEX['SNAPSHOT_PATH']
+            if not path:
+                raise CommandError('Укажите файл снимка или BITMAP_INDEX_SNAPSHOT')
+
+        bitmaps, watermark = build(settings.BITMAP_INDEX['CHUNK_SIZE'])
+        for field, values, ids, size in memory_report(bitmaps):
+            self.stdout.write(f'{field:<15} значений: {values:>6}  id: {ids:>9}  {size / 2 ** 20:8.2f} МиБ')
+
+        size, budget = total_bytes(bitmaps), settings.BITMAP_INDEX['MEMORY_BUDGET_MB'] * 2 ** 20
+        summary = f'Всего {size / 2 ** 20:.2f} МиБ из {budget / 2 ** 20:.0f} МиБ бюджета'
+        self.stdout.write(self.style.SUCCESS(summary) if size <= budget else self.style.WARNING(f'{summary}: индекс не будет использоваться'))
+
+        if path:
+            write_snapshot(path, bitmaps, watermark)
+            self.stdout.write(self.style.SUCCESS(f'Снимок сохранен: {path}'))
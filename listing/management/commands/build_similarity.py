@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from listing.recommendations import build_similarity
+
+
+class Command(BaseCommand):
+    help = (
+        'Построение соседей объектов по совместным просмотрам для /api/properties/recommended/. '
+        'Запускается периодически, например из cron; требует numpy и scipy'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=None, help='Соседей, хранимых для каждого объекта')
+
+    def handle(self, *args, **options):
+        views, pairs = build_similarity(top_k=options['top_k'])
+        self.stdout.write(self.style.SUCCESS(f'Просмотров: {views}, сохранено пар: {pairs}'))
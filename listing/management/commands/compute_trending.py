@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from listing.popularity import rebuild_popularity, update_popularity
+
+
+class Command(BaseCommand):
+    help = (
+        'Обновление популярности объектов (?ordering=-trending) по новым записям истории '
+        'просмотров, поиска и бронирований. Запускается периодически, например из cron'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true', help='Пересчитать популярность по всей истории')
+        parser.add_argument('--chunk-size', type=int, default=None, help='Записей истории в одной пачке')
+
+    def handle(self, *args, **options):
+        update = rebuild_popularity if options['rebuild'] else update_popularity
+        processed = update(chunk_size=options['chunk_size'])
+        for source, count in processed.items():
+            self.stdout.write(f'{source}: {count}')
+        self.stdout.write(self.style.SUCCESS('Популярность обновлена.'))
@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from listing.profiling import SORT_KEYS, perf_buffer, summarize
+
+
+class Command(BaseCommand):
+    help = (
+        'Самые медленные обработчики API по записям профилирования (PERF_PROFILING), '
+        'опубликованным процессами сервера в общий кэш'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sort', choices=SORT_KEYS, default='p95_ms', help='Поле сортировки')
+        parser.add_argument('--limit', type=int, default=20, help='Число обработчиков в отчете')
+        parser.add_argument('--minutes', type=float, default=None, help='Только запросы за последние N минут')
+
+    def handle(self, *args, **options):
+        records = perf_buffer.published()
+        if options['minutes']:
+            since = time.time() - options['minutes'] * 60
+            records = [record for record in records if record[0] >= since]
+        if not records:
+            self.stdout.write(self.style.WARNING(
+                'Записей нет: профилирование выключено или процессы сервера не используют общий кэш'
+            ))
+            return
+
+        self.stdout.write(f'Запросов: {len(records)}')
+        self.stdout.write(
+            f'{"обработчик":<45} {"число":>6} {"p50 ms":>8} {"p95 ms":>8} {"БД ms":>8} '
+            f'{"SQL":>6} {"повт.":>6} {"сер. ms":>8} {"5xx":>4}'
+        )
+        for row in summarize(records, options['sort'], options['limit']):
+            self.stdout.write(
+                f'{row["view"][:45]:<45} {row["count"]:>6} {row["p50_ms"]:>8.1f} {row["p95_ms"]:>8.1f} '
+                f'{row["db_ms"]:>8.1f} {row["queries"]:>6.1f} {row["duplicates"]:>6.1f} '
+                f'{row["serializer_ms"]:>8.1f} {row["errors"]:>4}'
+            )
+            for signature in row['n_plus_one']:
+                self.stdout.write(self.style.WARNING(
+                    f'    N+1: до {signature["max_repeats"]} раз за запрос в {signature["requests"]} запросах: '
+                    f'{signature["query"]}'
+                ))
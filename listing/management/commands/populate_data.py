@@ -1,269 +1,208 @@
 import random
-from django.core.management.base import BaseCommand
-from django.utils import timezone
-from listing.models import User, Property, Category, Booking, Review, SearchHistory, ViewHistory, Notification
-
-
-class Command(BaseCommand):
-    help = 'Очистка старых данных и создание новых тестовых данных для пользователей и объектов жилья'
-
-    def handle(self, *args, **kwargs):
-        # Очистка данных
-        self.stdout.write(self.style.WARNING('Удаление старых данных...'))
-        Notification.objects.all().delete()
-        ViewHistory.objects.all().delete()
-        SearchHistory.objects.all().delete()
-        Review.objects.all().delete()
-        Booking.objects.all().delete()
-        Property.objects.all().delete()
-        Category.objects.all().delete()
-        User.objects.filter(is_superuser=False).delete()  # Удаляет всех пользователей, кроме суперпользователей
-        self.stdout.write(self.style.SUCCESS('Все данные успешно очищены.'))
-
-        # Создание тестовых пользователей (собственников и арендаторов)
-        landlords = []
-        tenants = []
-
-        # Создание собственников
-        for i in range(7):  # Создаст 7 собственников
-            username = f'landlord{i + 1}'
-            email = f'landlord{i + 1}@example.com'
-            user = User.objects.create_user(
-                username=username,
-                email=email,
-                password='password123',
-                role='landlord'
-            )
-            landlords.append(user)
-            self.stdout.write(self.style.SUCCESS(f'Создан пользователь-собственник: {username}'))
-
-        # Создание арендаторов
-        for i in range(10):  # Создаст 10 арендаторов
-            username = f'tenant{i + 1}'
-            email = f'tenant{i + 1}@example.com'
-            user = User.objects.create_user(
-                username=username,
-                email=email,
-                password='password123',
-                role='tenant'
-            )
-            tenants.append(user)
-            self.stdout.write(self.style.SUCCESS(f'Создан пользователь-арендатор: {username}'))
-
-        # Создание категорий
-        categories = ['Эконом', 'Бизнес', 'Люкс']
-        category_objects = [Category.objects.create(name=cat) for cat in categories]
-
-        # Создание тестовых объектов жилья
-        property_types = ['apartment', 'house', 'studio']
-        locations = ['Berlin', 'Munich', 'Hamburg', 'Cologne', 'Frankfurt']
-
-        properties = []
-        for i in range(100):  # Создаст 100 объектов жилья
-            prop = Property.objects.create(
-                title=f'Объект {i + 1}',
-                description=f'Описание объекта {i + 1} с уникальными характеристиками.',
-                location=random.choice(locations),
-                price=random.randint(500, 3000),
-                room_count=random.randint(1, 5),
-                property_type=random.choice(property_types),
-                status='active',
-                views=random.randint(0, 100),
-                owner=random.choice(landlords)
-            )
-            prop.categories.add(*random.sample(category_objects, random.randint(1, 3)))
-            prop.save()
-            properties.append(prop)
-            self.stdout.write(self.style.SUCCESS(f'Создан объект жилья: {prop.title}'))
-
-        # Создание бронирований для арендаторов
-        for tenant in tenants:
-            prop = random.choice(properties)
-            booking = Booking.objects.create(
-                property=prop,
-                user=tenant,
-                start_date=timezone.now().date(),
-                end_date=(timezone.now() + timezone.timedelta(days=random.randint(1, 14))).date(),
-                status=random.choice(['pending', 'confirmed', 'canceled'])
-            )
-            self.stdout.write(self.style.SUCCESS(f'Создано бронирование для {tenant.username} на объект {prop.title}'))
-
-        # Создание отзывов
-        for tenant in tenants:
-            prop = random.choice(properties)
-            review = Review.objects.create(
-                property=prop,
-                user=tenant,
-                rating=random.randint(1, 5),
-                comment=f'Отзыв от {tenant.username} на объект {prop.title}.',
-                created_at=timezone.now()
-            )
-            self.stdout.write(self.style.SUCCESS(f'Создан отзыв от {tenant.username} для объекта {prop.title}'))
-
-        # Создание истории поиска
-        for tenant in tenants:
-            search_keywords = ['Berlin', 'house', 'apartment', 'cheap', 'luxury']
-            search = SearchHistory.objects.create(
-                user=tenant,
-                keyword=random.choice(search_keywords),
-                created_at=timezone.now()
-            )
-            self.stdout.write(self.style.SUCCESS(
-                f'Создана запись истории поиска для {tenant.username} по ключевому слову "{search.keyword}"'))
+from datetime import date, timedelta
+from itertools import islice
 
-        # Создание истории просмотров
-        for tenant in tenants:
-            prop = random.choice(properties)
-            view = ViewHistory.objects.create(
-                user=tenant,
-                property=prop,
-                created_at=timezone.now()
-            )
-            self.stdout.write(
-                self.style.SUCCESS(f'Создана запись истории просмотра для {tenant.username} на объект {prop.title}'))
-
-        # Создание уведомлений
-        for landlord in landlords:
-            notification = Notification.objects.create(
-                recipient=landlord,
-                message='У вас новое бронирование!',
-                event_type='booking_created',
-                created_at=timezone.now()
-            )
-            self.stdout.write(
-                self.style.SUCCESS(f'Создано уведомление для {landlord.username}: "{notification.message}"'))
-
-
-import random
+from django.contrib.auth.hashers import make_password
 from django.core.management.base import BaseCommand
-from django.utils import timezone
-from listing.models import User, Property, Category, Booking, Review, SearchHistory, ViewHistory, Notification
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from listing.cache import property_cache
+from listing.models import (
+    User, Property, PropertySearchTerm, Category, Booking, Review, SearchHistory, ViewHistory, Notification,
+    NotificationCounter, PropertyPopularity, PopularityWatermark, PropertySimilarity,
+)
+from listing.geo import cell_of
+from listing.notifications import add_unread
+from listing.ratings import recompute
+from listing.search import get_search_backend
+
+CATEGORIES = ['Эконом', 'Бизнес', 'Люкс']
+PROPERTY_TYPES = ['apartment', 'house', 'studio']
+LOCATIONS = ['Berlin', 'Munich', 'Hamburg', 'Cologne', 'Frankfurt']
+# Центры городов: координаты объектов разбрасываются вокруг них
+CITY_CENTERS = {
+    'Berlin': (52.5200, 13.4050),
+    'Munich': (48.1351, 11.5820),
+    'Hamburg': (53.5511, 9.9937),
+    'Cologne': (50.9375, 6.9603),
+    'Frankfurt': (50.1109, 8.6821),
+}
+SEARCH_KEYWORDS = ['Berlin', 'house', 'apartment', 'cheap', 'luxury']
+PASSWORD = 'password123'
 
 
 class Command(BaseCommand):
-    help = 'Очистка старых данных и создание новых тестовых данных для пользователей и объектов жилья'
+    help = (
+        'Очистка старых данных и создание тестовых данных заданного объема. '
+        'Записи вставляются пачками через bulk_create, при одинаковом --seed данные совпадают'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=17, help='Число пользователей (40%% — собственники)')
+        parser.add_argument('--properties', type=int, default=100, help='Число объектов жилья')
+        parser.add_argument('--bookings', type=int, default=10, help='Число бронирований')
+        parser.add_argument('--reviews', type=int, default=10, help='Число отзывов')
+        parser.add_argument('--seed', type=int, default=0, help='Seed генератора данных')
+        parser.add_argument('--start-date', type=date.fromisoformat, default=None,
+                            help='Опорная дата бронирований (YYYY-MM-DD), по умолчанию сегодня')
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Размер пачки bulk_create')
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.chunk_size = options['chunk_size']
+        start_date = options['start_date'] or date.today()
 
-    def handle(self, *args, **kwargs):
-        # Очистка данных
         self.stdout.write(self.style.WARNING('Удаление старых данных...'))
-        Notification.objects.all().delete()
-        ViewHistory.objects.all().delete()
-        SearchHistory.objects.all().delete()
-        Review.objects.all().delete()
-        Booking.objects.all().delete()
-        Property.objects.all().delete()
-        Category.objects.all().delete()
-        User.objects.filter(is_superuser=False).delete()  # Удаляет всех пользователей, кроме суперпользователей
+        self.clear()
         self.stdout.write(self.style.SUCCESS('Все данные успешно очищены.'))
 
-        # Создание тестовых пользователей (собственников и арендаторов)
-        landlords = []
-        tenants = []
-
-        # Создание собственников
-        for i in range(7):  # Создаст 7 собственников
-            username = f'landlord{i + 1}'
-            email = f'landlord{i + 1}@example.com'
-            user = User.objects.create_user(
-                username=username,
-                email=email,
-                password='password123',
-                role='landlord'
-            )
-            landlords.append(user)
-            self.stdout.write(self.style.SUCCESS(f'Создан пользователь-собственник: {username}'))
-
-        # Создание арендаторов
-        for i in range(10):  # Создаст 10 арендаторов
-            username = f'tenant{i + 1}'
-            email = f'tenant{i + 1}@example.com'
-            user = User.objects.create_user(
-                username=username,
-                email=email,
-                password='password123',
-                role='tenant'
-            )
-            tenants.append(user)
-            self.stdout.write(self.style.SUCCESS(f'Создан пользователь-арендатор: {username}'))
-
-        # Создание категорий
-        categories = ['Эконом', 'Бизнес', 'Люкс']
-        category_objects = [Category.objects.create(name=cat) for cat in categories]
-
-        # Создание тестовых объектов жилья
-        property_types = ['apartment', 'house', 'studio']
-        locations = ['Berlin', 'Munich', 'Hamburg', 'Cologne', 'Frankfurt']
+        landlord_count = max(1, options['users'] * 2 // 5)
+        tenant_count = max(1, options['users'] - landlord_count)
+        landlords = self.create_users('landlord', landlord_count)
+        tenants = self.create_users('tenant', tenant_count)
+
+        categories = [Category.objects.create(name=name).pk for name in CATEGORIES]
+        properties = self.create_properties(options['properties'], landlords, categories)
+        if properties:
+            self.create_bookings(options['bookings'], properties, tenants, start_date)
+            self.create_reviews(options['reviews'], properties, tenants)
+            self.create_history(properties, tenants, landlords)
+
+        # Явные первичные ключи не сдвигают последовательности PostgreSQL
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), [User, Property, Booking, Review]):
+                cursor.execute(sql)
+
+        # bulk_create не отправляет сигналы: индекс, агрегаты отзывов и кэш обновляем явно
+        self.stdout.write('Перестройка поискового индекса...')
+        get_search_backend().rebuild(chunk_size=self.chunk_size)
+        recompute(chunk_size=self.chunk_size)
+        property_cache.cache.clear()
+        self.stdout.write(self.style.SUCCESS('Тестовые данные созданы.'))
+
+    def clear(self):
+        # Удаляем без загрузки объектов в память и без сигналов (их работу
+        # выполняет перестройка индекса и очистка кэша в конце)
+        for model in (
+            Notification, NotificationCounter, ViewHistory, SearchHistory, Review, Booking,
+            # Отметка popularity тоже удаляется: иначе compute_trending пропустит новую историю
+            PropertyPopularity, PopularityWatermark, PropertySimilarity,
+            PropertySearchTerm, Property.categories.through, Property, Category,
+        ):
+            model.objects.all()._raw_delete(model.objects.db)
+        User.objects.filter(is_superuser=False).delete()  # Удаляет всех пользователей, кроме суперпользователей
 
-        properties = []
-        for i in range(100):  # Создаст 100 объектов жилья
-            prop = Property.objects.create(
+    def next_pk(self, model):
+        # Первичные ключи назначаем сами, чтобы не перечитывать их после вставки
+        # (MySQL не возвращает ключи из bulk_create)
+        return (model.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+
+    def insert(self, model, label, objects, total=None):
+        created = 0
+        objects = iter(objects)
+        while chunk := list(islice(objects, self.chunk_size)):
+            with transaction.atomic():
+                model.objects.bulk_create(chunk)
+            created += len(chunk)
+            if self.stdout.isatty():
+                progress = f'{created}/{total}' if total else created
+                self.stdout.write(f'  {label}: {progress}', ending='\r')
+        self.stdout.write(self.style.SUCCESS(f'Создано: {label} — {created}'.ljust(60)))
+
+    def create_users(self, role, count):
+        first_pk = self.next_pk(User)
+        # Хэш одного пароля на всех: PBKDF2 для каждого пользователя занимает сотни миллисекунд
+        password = make_password(PASSWORD)
+        self.insert(User, f'пользователи {role}', (
+            User(pk=first_pk + i, username=f'{role}{i + 1}', email=f'{role}{i + 1}@example.com',
+                 password=password, role=role)
+            for i in range(count)
+        ), count)
+        return range(first_pk, first_pk + count)
+
+    def place(self):
+        # Город и точка в пределах ~10 км от его центра
+        location = self.rng.choice(LOCATIONS)
+        latitude, longitude = CITY_CENTERS[location]
+        return location, latitude + self.rng.uniform(-0.09, 0.09), longitude + self.rng.uniform(-0.14, 0.14)
+
+    def create_properties(self, count, landlords, categories):
+        first_pk = self.next_pk(Property)
+        rng = self.rng
+        self.insert(Property, 'объекты жилья', (
+            Property(
+                pk=first_pk + i,
                 title=f'Объект {i + 1}',
                 description=f'Описание объекта {i + 1} с уникальными характеристиками.',
-                location=random.choice(locations),
-                price=random.randint(500, 3000),
-                room_count=random.randint(1, 5),
-                property_type=random.choice(property_types),
+                location=location,
+                price=rng.randint(500, 3000),
+                room_count=rng.randint(1, 5),
+                property_type=rng.choice(PROPERTY_TYPES),
                 status='active',
-                views=random.randint(0, 100),
-                owner=random.choice(landlords)
-            )
-            prop.categories.add(*random.sample(category_objects, random.randint(1, 3)))
-            prop.save()
-            properties.append(prop)
-            self.stdout.write(self.style.SUCCESS(f'Создан объект жилья: {prop.title}'))
-
-        # Создание бронирований для арендаторов
-        for tenant in tenants:
-            prop = random.choice(properties)
-            booking = Booking.objects.create(
-                property=prop,
-                user=tenant,
-                start_date=timezone.now().date(),
-                end_date=(timezone.now() + timezone.timedelta(days=random.randint(1, 14))).date(),
-                status=random.choice(['pending', 'confirmed', 'canceled'])
-            )
-            self.stdout.write(self.style.SUCCESS(f'Создано бронирование для {tenant.username} на объект {prop.title}'))
-
-        # Создание отзывов
-        for tenant in tenants:
-            prop = random.choice(properties)
-            review = Review.objects.create(
-                property=prop,
-                user=tenant,
-                rating=random.randint(1, 5),
-                comment=f'Отзыв от {tenant.username} на объект {prop.title}.',
-                created_at=timezone.now()
-            )
-            self.stdout.write(self.style.SUCCESS(f'Создан отзыв от {tenant.username} для объекта {prop.title}'))
-
-        # Создание истории поиска
-        for tenant in tenants:
-            search_keywords = ['Berlin', 'house', 'apartment', 'cheap', 'luxury']
-            search = SearchHistory.objects.create(
-                user=tenant,
-                keyword=random.choice(search_keywords),
-                created_at=timezone.now()
-            )
-            self.stdout.write(self.style.SUCCESS(
-                f'Создана запись истории поиска для {tenant.username} по ключевому слову "{search.keyword}"'))
-
-        # Создание истории просмотров
-        for tenant in tenants:
-            prop = random.choice(properties)
-            view = ViewHistory.objects.create(
-                user=tenant,
-                property=prop,
-                created_at=timezone.now()
-            )
-            self.stdout.write(
-                self.style.SUCCESS(f'Создана запись истории просмотра для {tenant.username} на объект {prop.title}'))
-
-        # Создание уведомлений
-        for landlord in landlords:
-            notification = Notification.objects.create(
-                recipient=landlord,
-                event_type='booking_created',
-                created_at=timezone.now()
-            )
-            self.stdout.write(self.style.SUCCESS(f'Создано уведомление для {landlord.username}'))
-
+                views=rng.randint(0, 100),
+                owner_id=rng.choice(landlords),
+                latitude=latitude,
+                longitude=longitude,
+                geo_cell=cell_of(latitude, longitude),
+            )
+            for i in range(count)
+            for location, latitude, longitude in [self.place()]
+        ), count)
+        properties = range(first_pk, first_pk + count)
+
+        # Связи с категориями пишем напрямую в промежуточную таблицу
+        through = Property.categories.through
+        self.insert(through, 'категории объектов', (
+            through(property_id=property_id, category_id=category_id)
+            for property_id in properties
+            for category_id in rng.sample(categories, rng.randint(1, len(categories)))
+        ))
+        return properties
+
+    def create_bookings(self, count, properties, tenants, start_date):
+        rng = self.rng
+        # Бронирования одного объекта не пересекаются: храним ближайший свободный день
+        next_day = {}
+
+        def bookings():
+            for _ in range(count):
+                property_id = rng.choice(properties)
+                day = next_day.get(property_id) or start_date - timedelta(days=rng.randint(0, 180))
+                end = day + timedelta(days=rng.randint(1, 14))
+                next_day[property_id] = end + timedelta(days=rng.randint(0, 30))
+                yield Booking(
+                    property_id=property_id,
+                    user_id=rng.choice(tenants),
+                    start_date=day,
+                    end_date=end,
+                    status=rng.choice(['pending', 'confirmed', 'canceled']),
+                )
+
+        self.insert(Booking, 'бронирования', bookings(), count)
+
+    def create_reviews(self, count, properties, tenants):
+        rng = self.rng
+        self.insert(Review, 'отзывы', (
+            Review(
+                property_id=rng.choice(properties),
+                user_id=rng.choice(tenants),
+                rating=rng.randint(1, 5),
+                comment=f'Отзыв {i + 1}.',
+            )
+            for i in range(count)
+        ), count)
+
+    def create_history(self, properties, tenants, landlords):
+        rng = self.rng
+        self.insert(SearchHistory, 'история поиска', (
+            SearchHistory(user_id=tenant, keyword=rng.choice(SEARCH_KEYWORDS)) for tenant in tenants
+        ), len(tenants))
+        self.insert(ViewHistory, 'история просмотров', (
+            ViewHistory(user_id=tenant, property_id=rng.choice(properties)) for tenant in tenants
+        ), len(tenants))
+        self.insert(Notification, 'уведомления', (
+            Notification(recipient_id=landlord, event_type='booking_created', content='У вас новое бронирование!')
+            for landlord in landlords
+        ), len(landlords))
+        add_unread({landlord: 1 for landlord in landlords})
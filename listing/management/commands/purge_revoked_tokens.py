@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from listing.models import RevokedToken
+
+
+class Command(BaseCommand):
+    help = 'Удаление записей об отозванных токенах, срок действия которых истек'
+
+    def handle(self, *args, **options):
+        deleted, _ = RevokedToken.objects.filter(expires_at__lte=timezone.now()).delete()
+        self.stdout.write(self.style.SUCCESS(f'Удалено записей: {deleted}'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from listing.geo import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Пересчет ячеек сетки (geo_cell) объектов жилья после изменения GEO["CELL_DEGREES"]'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Число объектов в одной пачке')
+
+    def handle(self, *args, **options):
+        updated = rebuild(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Обновлено объектов: {updated}'))
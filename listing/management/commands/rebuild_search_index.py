@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from listing.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Полная перестройка поискового индекса объектов жилья'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Размер пачки объектов при индексации')
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        self.stdout.write(f'Перестройка индекса: {backend.__class__.__name__}')
+        backend.rebuild(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS('Поисковый индекс перестроен.'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from listing.ratings import recompute
+
+
+class Command(BaseCommand):
+    help = 'Пересчет агрегатов отзывов (rating_count, rating_sum, rating_avg) у объектов жилья'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Число объектов в одной пачке')
+
+    def handle(self, *args, **options):
+        repaired = recompute(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Исправлено объектов: {repaired}'))
@@ -0,0 +1,56 @@
+import threading
+from collections import defaultdict
+
+
+class MetricsRegistry:
+    """
+    Простой реестр метрик процесса: счетчики, таймеры и gauges.
+
+    Gauges задаются функцией и вычисляются в момент снимка,
+    поэтому не требуют обновления на горячем пути.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = defaultdict(int)
+        self._timers = {}
+        self._gauges = {}
+
+    def incr(self, name, value=1):
+        with self._lock:
+            self._counters[name] += value
+
+    def observe(self, name, seconds):
+        with self._lock:
+            timer = self._timers.setdefault(name, {'count': 0, 'total': 0.0, 'max': 0.0, 'last': 0.0})
+            timer['count'] += 1
+            timer['total'] += seconds
+            timer['max'] = max(timer['max'], seconds)
+            timer['last'] = seconds
+
+    def value(self, name):
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def gauge(self, name, func):
+        with self._lock:
+            self._gauges[name] = func
+
+    def snapshot(self):
+        with self._lock:
+            counters = dict(self._counters)
+            timers = {name: dict(timer) for name, timer in self._timers.items()}
+            gauges = dict(self._gauges)
+        return {
+            'counters': counters,
+            'timers': timers,
+            'gauges': {name: func() for name, func in gauges.items()},
+        }
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._timers.clear()
+
+
+registry = MetricsRegistry()
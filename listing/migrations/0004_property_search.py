@@ -0,0 +1,79 @@
+# Generated by Django 5.1.3 on 2026-10-18 14:38
+
+import re
+from collections import Counter
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Копия токенизатора listing.search на момент миграции: изменения в поиске
+# не должны менять уже примененную миграцию
+TOKEN_RE = re.compile(r'\w+')
+MAX_TERM_LENGTH = 64
+TITLE_WEIGHT = 3
+DESCRIPTION_WEIGHT = 1
+
+
+def tokenize(text):
+    return [token[:MAX_TERM_LENGTH] for token in TOKEN_RE.findall((text or '').casefold())]
+
+
+def build_terms(title, description):
+    weights = Counter()
+    for token in tokenize(title):
+        weights[token] += TITLE_WEIGHT
+    for token in tokenize(description):
+        weights[token] += DESCRIPTION_WEIGHT
+    return weights
+
+
+def index_existing_properties(apps, schema_editor):
+    Property = apps.get_model('listing', 'Property')
+    PropertySearchTerm = apps.get_model('listing', 'PropertySearchTerm')
+    terms = []
+    for prop in Property.objects.only('id', 'title', 'description').iterator(chunk_size=2000):
+        terms.extend(
+            PropertySearchTerm(property_id=prop.pk, term=term, weight=weight)
+            for term, weight in build_terms(prop.title, prop.description).items()
+        )
+        if len(terms) >= 5000:
+            PropertySearchTerm.objects.bulk_create(terms)
+            terms = []
+    PropertySearchTerm.objects.bulk_create(terms)
+
+
+def add_fulltext_index(apps, schema_editor):
+    # FULLTEXT-индекс для MySQLFulltextSearchBackend, на других базах не нужен
+    if schema_editor.connection.vendor == 'mysql':
+        schema_editor.execute(
+            'ALTER TABLE `listing_property` ADD FULLTEXT INDEX `property_fulltext_idx` (`title`, `description`)'
+        )
+
+
+def drop_fulltext_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'mysql':
+        schema_editor.execute('ALTER TABLE `listing_property` DROP INDEX `property_fulltext_idx`')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listing', '0003_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PropertySearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+                ('weight', models.PositiveIntegerField(default=1)),
+                ('property', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='listing.property')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['term', 'property'], name='searchterm_term_property_idx')],
+            },
+        ),
+        migrations.RunPython(index_existing_properties, migrations.RunPython.noop),
+        migrations.RunPython(add_fulltext_index, drop_fulltext_index),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.3 on 2026-10-18 14:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listing', '0004_property_search'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['property', 'start_date'], name='booking_property_start_idx'),
+        ),
+    ]
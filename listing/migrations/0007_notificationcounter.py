@@ -0,0 +1,37 @@
+# Generated by Django 5.1.3 on 2026-10-18 14:59
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def count_unread_notifications(apps, schema_editor):
+    Notification = apps.get_model('listing', 'Notification')
+    NotificationCounter = apps.get_model('listing', 'NotificationCounter')
+    unread = (
+        Notification.objects.filter(is_read=False).order_by()
+        .values('recipient_id').annotate(total=Count('*')).values_list('recipient_id', 'total')
+    )
+    NotificationCounter.objects.bulk_create(
+        (NotificationCounter(user_id=user_id, unread=total) for user_id, total in unread.iterator()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listing', '0006_revokedtoken'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationCounter',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='notification_counter', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('unread', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(count_unread_notifications, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.1.3 on 2026-10-18 15:17
+
+from django.db import migrations, models
+from django.db.models import Count, F, FloatField, OuterRef, Subquery, Sum
+from django.db.models.functions import Cast, Coalesce
+
+
+def fill_ratings(apps, schema_editor):
+    Property = apps.get_model('listing', 'Property')
+    Review = apps.get_model('listing', 'Review')
+    reviews = Review.objects.filter(property=OuterRef('pk')).order_by().values('property')
+    Property.objects.update(
+        rating_count=Coalesce(Subquery(reviews.annotate(total=Count('*')).values('total')), 0),
+        rating_sum=Coalesce(Subquery(reviews.annotate(total=Sum('rating')).values('total')), 0),
+    )
+    Property.objects.filter(rating_count__gt=0).update(
+        rating_avg=Cast(F('rating_sum'), FloatField()) / F('rating_count'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listing', '0007_notificationcounter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='property',
+            name='rating_avg',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='property',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='property',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='property',
+            index=models.Index(fields=['rating_avg', 'id'], name='property_rating_id_idx'),
+        ),
+        migrations.RunPython(fill_ratings, migrations.RunPython.noop),
+    ]
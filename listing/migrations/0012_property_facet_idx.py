@@ -0,0 +1,17 @@
+# Generated by Django 5.1.3 on 2026-10-18 15:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listing', '0011_property_coordinates'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='property',
+            index=models.Index(fields=['property_type', 'location', 'room_count', 'price'], name='property_facet_idx'),
+        ),
+    ]
@@ -1,6 +1,9 @@
-from django.db import models
+from django.core.validators import MaxValueValidator, MinValueValidator
+from django.db import models, transaction
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 
+from .geo import cell_of
+
 class UserManager(BaseUserManager):
     def create_user(self, username, email, password=None, role=None, **extra_fields):
         if not email:
@@ -42,6 +45,15 @@ class User(AbstractUser):
 class Category(models.Model):
     name = models.CharField(max_length=100)
 
+class PropertyQuerySet(models.QuerySet):
+    def with_summary(self):
+        """
+        Подгружает владельца и категории фиксированным числом запросов
+        независимо от размера выборки. Агрегаты отзывов хранятся в самом
+        объекте (rating_count, rating_sum, rating_avg, см. listing.ratings).
+        """
+        return self.select_related('owner').prefetch_related('categories')
+
 class Property(models.Model):
     PROPERTY_TYPES = (('apartment', 'Apartment'), ('house', 'House'), ('studio', 'Studio'))
     STATUS_CHOICES = (('active', 'Active'), ('inactive', 'Inactive'))
@@ -57,6 +69,63 @@ class Property(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     views = models.PositiveIntegerField(default=0)
     owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='properties')
+    # Агрегаты отзывов, обновляются при каждой записи Review (listing.ratings)
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_avg = models.FloatField(default=0)  # 0, пока нет отзывов
+    # Координаты и ячейка сетки для поиска по расстоянию (listing.geo)
+    latitude = models.FloatField(null=True, blank=True, validators=[MinValueValidator(-90), MaxValueValidator(90)])
+    longitude = models.FloatField(null=True, blank=True, validators=[MinValueValidator(-180), MaxValueValidator(180)])
+    geo_cell = models.BigIntegerField(null=True, editable=False)
+    # Время последнего изменения: по нему другие процессы дочитывают битовый индекс (listing.bitmaps)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    objects = PropertyQuerySet.as_manager()
+
+    class Meta:
+        # Индексы под фильтры и сортировки PropertyViewSet
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='property_created_id_idx'),
+            models.Index(fields=['location', '-created_at'], name='property_location_created_idx'),
+            models.Index(fields=['property_type', 'price'], name='property_type_price_idx'),
+            models.Index(fields=['price', 'id'], name='property_price_id_idx'),
+            models.Index(fields=['rating_avg', 'id'], name='property_rating_id_idx'),
+            models.Index(fields=['geo_cell'], name='property_geo_cell_idx'),
+            # Покрывающий индекс для группировки фасетов (listing.facets)
+            models.Index(fields=['property_type', 'location', 'room_count', 'price'], name='property_facet_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        # Ячейка сетки всегда соответствует координатам, в том числе при save(update_fields=[...])
+        self.geo_cell = cell_of(self.latitude, self.longitude)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            extra = {'updated_at', 'geo_cell'} if {'latitude', 'longitude'} & set(update_fields) else {'updated_at'}
+            kwargs['update_fields'] = {*update_fields, *extra}
+        super().save(*args, **kwargs)
+
+class PropertySearchTerm(models.Model):
+    """
+    Инвертированный индекс для полнотекстового поиска: токен -> объект жилья.
+    Заполняется из title и description при сохранении Property (см. listing.search).
+    """
+    property = models.ForeignKey(Property, on_delete=models.CASCADE, related_name='search_terms')
+    term = models.CharField(max_length=64)
+    weight = models.PositiveIntegerField(default=1)  # Вес токена с учетом числа вхождений и поля
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['term', 'property'], name='searchterm_term_property_idx'),
+        ]
+
+class RevokedToken(models.Model):
+    """
+    Отозванные JWT (по jti). Проверяется только при срабатывании
+    bloom-фильтра в памяти процесса (см. listing.revocation).
+    """
+    jti = models.CharField(max_length=255, unique=True)
+    expires_at = models.DateTimeField(db_index=True)  # После истечения токена запись можно удалить
+    revoked_at = models.DateTimeField(auto_now_add=True, db_index=True)  # Дочитывание новых отзывов
 
 class Booking(models.Model):
     STATUS_CHOICES = (('pending', 'Pending'), ('confirmed', 'Confirmed'), ('canceled', 'Canceled'))
@@ -68,6 +137,13 @@ class Booking(models.Model):
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        # Поиск ближайшего бронирования объекта по дате заезда (см. listing.availability)
+        indexes = [
+            models.Index(fields=['property', 'start_date'], name='booking_property_start_idx'),
+            models.Index(fields=['created_at', 'id'], name='booking_created_id_idx'),
+        ]
+
 class Review(models.Model):
     property = models.ForeignKey(Property, on_delete=models.CASCADE, related_name='reviews')
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='reviews')
@@ -75,11 +151,23 @@ class Review(models.Model):
     comment = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
 
+    def save(self, *args, **kwargs):
+        # Отзыв и агрегаты его объекта (см. listing.ratings) меняются в одной транзакции;
+        # удаление и так выполняется в транзакции
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
 class SearchHistory(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='search_history')
     keyword = models.CharField(max_length=255)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='searchhistory_user_created_idx'),
+            models.Index(fields=['created_at', 'id'], name='searchhistory_created_id_idx'),
+        ]
+
     def __str__(self):
         return f'{self.user.username} searched for {self.keyword}'
 
@@ -88,6 +176,13 @@ class ViewHistory(models.Model):
     property = models.ForeignKey(Property, on_delete=models.CASCADE, related_name='view_history')
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='viewhistory_user_created_idx'),
+            # Чтение новых записей по отметке времени (listing.popularity)
+            models.Index(fields=['created_at', 'id'], name='viewhistory_created_id_idx'),
+        ]
+
     def __str__(self):
         return f'{self.user.username} viewed {self.property.title}'
 
@@ -105,5 +200,54 @@ class Notification(models.Model):
     is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['recipient', '-created_at'], name='notification_recipient_idx'),
+        ]
+
     def __str__(self):
         return f'Notification for {self.recipient.username} - {self.event_type}'
+
+class NotificationCounter(models.Model):
+    """
+    Число непрочитанных уведомлений пользователя. Поддерживается атомарными
+    UPDATE ... SET unread = unread +/- n при создании, удалении и прочтении
+    уведомлений (см. listing.notifications), чтобы не считать COUNT(*).
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='notification_counter')
+    unread = models.PositiveIntegerField(default=0)
+
+
+class PropertyPopularity(models.Model):
+    """
+    Популярность объекта с затуханием по времени (см. listing.popularity).
+    Строки есть только у объектов с просмотрами, поиском или бронированиями.
+    """
+    property = models.OneToOneField(Property, on_delete=models.CASCADE, primary_key=True, related_name='popularity')
+    score = models.FloatField(db_index=True)  # log2 суммы весов событий, приведенных к общей эпохе
+    updated_at = models.DateTimeField()
+
+
+class PopularityWatermark(models.Model):
+    """
+    Последняя учтенная в популярности запись источника: (created_at, id).
+    """
+    source = models.CharField(max_length=32, primary_key=True)
+    created_at = models.DateTimeField(null=True)
+    last_id = models.BigIntegerField(default=0)
+
+
+class PropertySimilarity(models.Model):
+    """
+    Ближайшие соседи объекта по совместным просмотрам: TOP_K строк на объект
+    с косинусной близостью. Перестраивается командой build_similarity
+    (см. listing.recommendations).
+    """
+    property = models.ForeignKey(Property, on_delete=models.CASCADE, related_name='similar')
+    neighbor = models.ForeignKey(Property, on_delete=models.CASCADE, related_name='+')
+    score = models.FloatField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['property', '-score'], name='similarity_property_score_idx'),
+        ]
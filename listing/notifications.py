@@ -0,0 +1,244 @@
+"""
+Конвейер уведомлений.
+
+Запрос только публикует событие (тип, id объекта, контекст) в очередь
+после фиксации транзакции. Доставка идет пачками в три этапа:
+
+1. загрузка объектов события одним запросом на тип события (select_related);
+2. формирование текста уведомлений;
+3. запись всех уведомлений пачки одним bulk_create.
+
+Время ожидания в очереди и каждого этапа пишется в метрики (listing.metrics).
+Очередь задается settings.NOTIFICATION_QUEUE['QUEUE']: по умолчанию это
+фоновый поток процесса (`thread_queue`), `immediate_queue` доставляет сразу.
+Внешний брокер подключается объектом с методом `publish(events)`, который
+на стороне обработчика вызывает `deliver(events)`.
+"""
+import logging
+import threading
+import time
+from collections import Counter, defaultdict, namedtuple
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils.module_loading import import_string
+
+from .background import BackgroundFlusher
+from .metrics import registry
+from .models import Booking, Notification, NotificationCounter, Review
+from .streaming import notification_hub
+
+logger = logging.getLogger(__name__)
+
+# Сколько счетчиков обновляется одним UPDATE ... WHERE user_id IN (...)
+COUNTER_CHUNK_SIZE = 500
+
+NotificationEvent = namedtuple('NotificationEvent', ['event_type', 'object_id', 'context', 'enqueued_at'])
+
+
+def booking_created(booking, context):
+    return (
+        booking.property.owner_id,
+        f'New booking created by {booking.user.username} for property {booking.property.title}.',
+    )
+
+
+def booking_status_changed(booking, context):
+    return (
+        booking.user_id,
+        f'Booking status changed to {context["status"]} for property {booking.property.title}.',
+    )
+
+
+def new_review(review, context):
+    return (
+        review.property.owner_id,
+        f'New review from {review.user.username} on property {review.property.title}.',
+    )
+
+
+# Тип события -> (queryset объектов события, функция получателя и текста)
+RENDERERS = {
+    'booking_created': (lambda: Booking.objects.select_related('user', 'property'), booking_created),
+    'booking_status_changed': (lambda: Booking.objects.select_related('property'), booking_status_changed),
+    'new_review': (lambda: Review.objects.select_related('user', 'property'), new_review),
+}
+
+
+def deliver(events):
+    """
+    Создает уведомления для пачки событий. Возвращает число созданных уведомлений.
+    """
+    if not events:
+        return 0
+    started = time.perf_counter()
+    registry.observe('notifications.queue_wait', time.monotonic() - min(event.enqueued_at for event in events))
+
+    ids_by_type = defaultdict(set)
+    for event in events:
+        ids_by_type[event.event_type].add(event.object_id)
+    objects = {
+        event_type: RENDERERS[event_type][0]().in_bulk(ids)
+        for event_type, ids in ids_by_type.items()
+    }
+    loaded = time.perf_counter()
+    registry.observe('notifications.load', loaded - started)
+
+    notifications = []
+    for event in events:
+        obj = objects[event.event_type].get(event.object_id)
+        if obj is None:  # Объект удален до доставки
+            continue
+        recipient_id, content = RENDERERS[event.event_type][1](obj, event.context)
+        notifications.append(Notification(
+            recipient_id=recipient_id,
+            event_type=event.event_type,
+            content=content,
+            related_object_id=event.object_id,
+        ))
+    rendered = time.perf_counter()
+    registry.observe('notifications.render', rendered - loaded)
+
+    with transaction.atomic():
+        Notification.objects.bulk_create(notifications, batch_size=1000)
+        add_unread(Counter(notification.recipient_id for notification in notifications))
+    registry.observe('notifications.store', time.perf_counter() - rendered)
+    registry.incr('notifications.delivered', len(notifications))
+    return len(notifications)
+
+
+def add_unread(counts):
+    """
+    Изменяет счетчики непрочитанных: {user_id: приращение}.
+    Пользователи с одинаковым приращением обновляются одним UPDATE.
+    """
+    counts = {user_id: delta for user_id, delta in counts.items() if delta}
+    if not counts:
+        return
+    # Строка счетчика создается при первом уведомлении пользователя
+    NotificationCounter.objects.bulk_create(
+        [NotificationCounter(user_id=user_id) for user_id, delta in counts.items() if delta > 0],
+        ignore_conflicts=True,
+        batch_size=COUNTER_CHUNK_SIZE,
+    )
+    # Подключения потока уведомлений узнают о новых строках после фиксации транзакции
+    recipients = [user_id for user_id, delta in counts.items() if delta > 0]
+    if recipients:
+        transaction.on_commit(lambda: notification_hub.publish(recipients))
+
+    by_delta = defaultdict(list)
+    for user_id, delta in counts.items():
+        by_delta[delta].append(user_id)
+    for delta, user_ids in by_delta.items():
+        for start in range(0, len(user_ids), COUNTER_CHUNK_SIZE):
+            chunk = user_ids[start:start + COUNTER_CHUNK_SIZE]
+            NotificationCounter.objects.filter(user_id__in=chunk).update(unread=F('unread') + delta)
+
+
+def unread_count(user):
+    return NotificationCounter.objects.filter(user=user).values_list('unread', flat=True).first() or 0
+
+
+def mark_read(user, ids=None, up_to_id=None):
+    """
+    Отмечает прочитанными уведомления пользователя из списка `ids`
+    или все с id <= `up_to_id` одним UPDATE. Возвращает число отмеченных.
+    """
+    notifications = Notification.objects.filter(recipient=user, is_read=False)
+    if ids is not None:
+        notifications = notifications.filter(pk__in=ids)
+    else:
+        notifications = notifications.filter(pk__lte=up_to_id)
+    with transaction.atomic():
+        # UPDATE меняет только непрочитанные строки, поэтому при конкурентных
+        # вызовах каждое уведомление вычитается из счетчика один раз
+        marked = notifications.update(is_read=True)
+        add_unread({user.pk: -marked})
+    return marked
+
+
+class ImmediateQueue:
+    """
+    Доставка в момент публикации (в том же потоке).
+    """
+
+    def publish(self, events):
+        deliver(events)
+
+
+class ThreadQueue(BackgroundFlusher):
+    """
+    Очередь в памяти процесса, которую разбирает фоновый поток
+    пачками до MAX_SIZE событий не реже раза в FLUSH_INTERVAL секунд.
+    """
+    name = 'notifications'
+
+    def __init__(self):
+        super().__init__()
+        self._events = []
+        self._lock = threading.Lock()
+        registry.gauge('notifications.queue_depth', self.depth)
+
+    @property
+    def max_size(self):
+        return settings.NOTIFICATION_QUEUE['MAX_SIZE']
+
+    @property
+    def flush_interval(self):
+        return settings.NOTIFICATION_QUEUE['FLUSH_INTERVAL']
+
+    def depth(self):
+        return len(self._events)
+
+    def publish(self, events):
+        with self._lock:
+            self._events.extend(events)
+            full = len(self._events) >= self.max_size
+
+        self.ensure_started()
+        if full:
+            if self.is_running():
+                self.wakeup()
+            else:
+                self.flush()
+
+    def flush(self):
+        with self._lock:
+            events, self._events = self._events, []
+        try:
+            return deliver(events)
+        except Exception:
+            registry.incr('notifications.dropped', len(events))
+            logger.exception('Failed to deliver %d notification events', len(events))
+            return 0
+
+
+immediate_queue = ImmediateQueue()
+thread_queue = ThreadQueue()
+
+
+def get_queue():
+    return import_string(settings.NOTIFICATION_QUEUE['QUEUE'])
+
+
+def notify(event_type, obj, **context):
+    """
+    Публикует событие после фиксации текущей транзакции.
+    """
+    object_id = obj.pk
+    transaction.on_commit(
+        lambda: get_queue().publish([NotificationEvent(event_type, object_id, context, time.monotonic())])
+    )
+
+
+def notify_booking_created(booking):
+    notify('booking_created', booking)
+
+
+def notify_booking_status_changed(booking):
+    notify('booking_status_changed', booking, status=booking.status)
+
+
+def notify_new_review(review):
+    notify('new_review', review)
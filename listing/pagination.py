@@ -0,0 +1,174 @@
+import json
+from base64 import b64decode, b64encode
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset-пагинация (по курсору) для больших списков.
+
+    Включается по запросу клиента: если в запросе нет параметров `cursor`
+    и `page_size`, список отдается целиком, как и раньше.
+    Курсор хранит значения полей сортировки последней записи страницы,
+    поэтому следующая страница выбирается условием `WHERE (поля) < (значения)`
+    по индексу, а не через OFFSET — глубокие страницы не становятся медленнее.
+    К сортировке всегда добавляется `id`, чтобы порядок был стабильным
+    при одинаковых значениях `created_at` или `price`.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    page_size = 20
+    max_page_size = 100
+
+    # Сортировка по умолчанию, если у queryset нет своей
+    ordering = ('-created_at',)
+    tiebreaker = 'id'
+
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self.get_page_queryset(queryset, request)
+        if queryset is None:
+            return None
+        return self.set_page(list(queryset))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        # Вариант для асинхронных представлений (listing.async_views)
+        queryset = self.get_page_queryset(queryset, request)
+        if queryset is None:
+            return None
+        return self.set_page([obj async for obj in queryset])
+
+    def get_page_queryset(self, queryset, request):
+        params = request.query_params
+        if self.cursor_query_param not in params and self.page_size_query_param not in params:
+            return None
+
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(queryset)
+
+        queryset = queryset.order_by(*self.ordering)
+        position = self.decode_cursor(request, queryset.model)
+        if position is not None:
+            queryset = queryset.filter(self.get_keyset_filter(position))
+
+        # Берем на одну запись больше, чтобы узнать, есть ли следующая страница
+        return queryset[:self.page_size + 1]
+
+    def set_page(self, results):
+        self.has_next = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        return self.page
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_ordering(self, queryset):
+        """
+        Возвращает сортировку queryset (например, из OrderingFilter),
+        дополненную `id` в том же направлении, что и первое поле.
+        """
+        terms = [term for term in queryset.query.order_by if isinstance(term, str)]
+        if not terms:
+            terms = list(queryset.model._meta.ordering) or list(self.ordering)
+
+        ordering = []
+        for term in terms:
+            name = term.lstrip('-')
+            if name == 'pk':
+                term = term.replace('pk', self.tiebreaker)
+                name = self.tiebreaker
+            ordering.append(term)
+            if name == self.tiebreaker:
+                return ordering
+
+        descending = ordering[0].startswith('-')
+        ordering.append(('-' if descending else '') + self.tiebreaker)
+        return ordering
+
+    def get_keyset_filter(self, position):
+        """
+        Строит условие "строго после курсора" для составного ключа:
+        (a < x) OR (a = x AND b < y) OR ...
+        """
+        condition = Q()
+        equal = Q()
+        for term, value in zip(self.ordering, position):
+            name = term.lstrip('-')
+            lookup = 'lt' if term.startswith('-') else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        last = self.page[-1]
+        position = [self.encode_value(getattr(last, term.lstrip('-'))) for term in self.ordering]
+        encoded = b64encode(json.dumps(position).encode('utf-8')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+
+        try:
+            position = json.loads(b64decode(encoded.encode('ascii')).decode('utf-8'))
+            if not isinstance(position, list) or len(position) != len(self.ordering):
+                raise ValueError
+            return [
+                self.decode_value(model, term.lstrip('-'), value)
+                for term, value in zip(self.ordering, position)
+            ]
+        except (TypeError, ValueError, UnicodeError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    @staticmethod
+    def encode_value(value):
+        if isinstance(value, (datetime, date)):
+            return value.isoformat()
+        if isinstance(value, Decimal):
+            return str(value)
+        return value
+
+    @staticmethod
+    def decode_value(model, name, value):
+        # Аннотации (не поля модели) хранятся в курсоре как есть
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return value
+        return field.to_python(value)
@@ -0,0 +1,337 @@
+"""
+Профилирование запросов API (settings.PERF_PROFILING).
+
+PerfProfilingMiddleware для каждого запроса записывает обработчик, полное
+время ответа, время и число SQL-запросов, повторы одинаковых запросов,
+шаблоны запросов, повторенные N_PLUS_ONE_THRESHOLD и более раз (признак N+1),
+и время сериализации DRF. Записи хранятся в кольцевом буфере процесса
+(BUFFER_SIZE последних запросов) и раз в PUBLISH_INTERVAL секунд
+публикуются в общий кэш, откуда их читают GET /api/_perf/ и команда
+perf_report. Без общего кэша (REDIS_URL) команда не видит записей
+процессов сервера, остается эндпоинт.
+
+Запросы к БД учитываются обработчиком, который один раз подключается
+к каждому соединению, а сериализация — обертками Serializer.data
+и ListSerializer.data. Текущий запрос передается им через contextvar,
+поэтому учитываются и запросы асинхронного ORM из sync_to_async.
+
+Выключенное профилирование ничего не стоит: middleware исключается
+из цепочки (MiddlewareNotUsed), обработчики не устанавливаются.
+"""
+import os
+import random
+import re
+import socket
+import threading
+import time
+from collections import Counter, deque
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from .background import BackgroundFlusher
+from .metrics import registry
+
+# Профиль запроса, который сейчас обрабатывается в этом контексте
+current_profile = ContextVar('perf_profile', default=None)
+
+PROCESSES_KEY = 'perf:processes'
+
+# Списки параметров IN (%s, %s, ...) разной длины — один шаблон запроса
+IN_LIST = re.compile(r'%s(?:, %s)+')
+
+SIGNATURE_LENGTH = 300
+
+
+class RequestProfile:
+    __slots__ = ('queries', 'db_time', 'serializer_time', 'serializing')
+
+    def __init__(self):
+        self.queries = []
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.serializing = False
+
+
+def record_query(execute, sql, params, many, context):
+    profile = current_profile.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile.db_time += time.perf_counter() - started
+        profile.queries.append((sql, params))
+
+
+def install_query_recorder(sender=None, connection=None, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def profiled_data(prop):
+    fget = prop.fget
+
+    def data(self):
+        profile = current_profile.get()
+        # Вложенные сериализаторы учитываются во внешнем
+        if profile is None or profile.serializing:
+            return fget(self)
+        profile.serializing = True
+        started = time.perf_counter()
+        try:
+            return fget(self)
+        finally:
+            profile.serializer_time += time.perf_counter() - started
+            profile.serializing = False
+
+    data.profiled = True
+    data.original = prop
+    return property(data)
+
+
+_installed = False
+_install_lock = threading.Lock()
+
+
+def install():
+    """
+    Подключает учет SQL-запросов ко всем соединениям и обертки сериализаторов. Выполняется один раз.
+    """
+    global _installed
+    from rest_framework import serializers
+
+    with _install_lock:
+        if _installed:
+            return
+        connection_created.connect(install_query_recorder, dispatch_uid='perf_profiling')
+        for connection in connections.all():
+            install_query_recorder(connection=connection)
+        for cls in (serializers.Serializer, serializers.ListSerializer):
+            if not getattr(cls.data.fget, 'profiled', False):
+                cls.data = profiled_data(cls.data)
+        _installed = True
+
+
+def uninstall():
+    """
+    Отключает то, что подключил install(): нужно для сравнения с процессом без профилирования.
+    """
+    global _installed
+    from rest_framework import serializers
+
+    with _install_lock:
+        if not _installed:
+            return
+        connection_created.disconnect(dispatch_uid='perf_profiling')
+        for connection in connections.all():
+            if record_query in connection.execute_wrappers:
+                connection.execute_wrappers.remove(record_query)
+        for cls in (serializers.Serializer, serializers.ListSerializer):
+            if getattr(cls.data.fget, 'profiled', False):
+                cls.data = cls.data.fget.original
+        _installed = False
+
+
+def params_key(params):
+    try:
+        return hash(tuple(params)) if isinstance(params, (list, tuple)) else hash(params)
+    except TypeError:
+        return repr(params)
+
+
+def query_stats(queries, threshold):
+    """
+    (число повторов одинаковых запросов, [(шаблон, число выполнений), ...] для шаблонов
+    с threshold и более выполнениями — обычно запрос в цикле по объектам).
+    """
+    duplicates = len(queries) - len({(sql, params_key(params)) for sql, params in queries})
+    templates = Counter(IN_LIST.sub('%s, ...', sql) for sql, _ in queries)
+    repeated = [
+        (template[:SIGNATURE_LENGTH], count)
+        for template, count in templates.most_common(3) if count >= threshold
+    ]
+    return duplicates, repeated
+
+
+class PerfBuffer(BackgroundFlusher):
+    """
+    Кольцевой буфер записей процесса и их публикация в общий кэш.
+    """
+    name = 'perf-profiling'
+
+    def __init__(self):
+        super().__init__()
+        self._records = None
+        self._lock = threading.Lock()
+        registry.gauge('perf.buffer_depth', lambda: len(self._records) if self._records is not None else 0)
+
+    @property
+    def config(self):
+        return settings.PERF_PROFILING
+
+    @property
+    def flush_interval(self):
+        return self.config['PUBLISH_INTERVAL']
+
+    @property
+    def cache(self):
+        return caches[self.config['CACHE_ALIAS']]
+
+    @property
+    def key(self):
+        return f'perf:records:{socket.gethostname()}:{os.getpid()}'
+
+    def add(self, record):
+        records = self._records
+        if records is None or records.maxlen != self.config['BUFFER_SIZE']:
+            with self._lock:
+                if self._records is None or self._records.maxlen != self.config['BUFFER_SIZE']:
+                    self._records = deque(self._records or (), maxlen=self.config['BUFFER_SIZE'])
+                records = self._records
+        # deque.append с maxlen потокобезопасен и вытесняет самую старую запись
+        records.append(record)
+        self.ensure_started()
+
+    def records(self):
+        return list(self._records or ())
+
+    def flush(self):
+        records = self.records()
+        if not records:
+            return
+        timeout = self.config['RETENTION']
+        self.cache.set(self.key, records, timeout)
+        processes = set(self.cache.get(PROCESSES_KEY) or ())
+        if self.key not in processes:
+            self.cache.set(PROCESSES_KEY, sorted(processes | {self.key}), timeout)
+
+    def published(self):
+        """
+        Записи всех процессов из общего кэша; записи этого процесса — из буфера.
+        """
+        processes = [key for key in self.cache.get(PROCESSES_KEY) or () if key != self.key]
+        records = [record for chunk in self.cache.get_many(processes).values() for record in chunk]
+        return records + self.records()
+
+    def clear(self):
+        with self._lock:
+            self._records = None
+
+
+perf_buffer = PerfBuffer()
+
+
+class PerfProfilingMiddleware:
+    """
+    Записывает профиль запроса в perf_buffer. Доля профилируемых запросов — SAMPLE_RATE.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        config = settings.PERF_PROFILING
+        if not config['ENABLED']:
+            raise MiddlewareNotUsed
+        install()
+        self.get_response = get_response
+        self.config = config
+        self.excluded = tuple(config['EXCLUDE_PATHS'])
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.sampled(request):
+            return self.get_response(request)
+        profile, token, started = self.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_profile.reset(token)
+        self.finish(request, response, profile, started)
+        return response
+
+    async def __acall__(self, request):
+        if not self.sampled(request):
+            return await self.get_response(request)
+        profile, token, started = self.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_profile.reset(token)
+        self.finish(request, response, profile, started)
+        return response
+
+    def sampled(self, request):
+        if request.path.startswith(self.excluded):
+            return False
+        rate = self.config['SAMPLE_RATE']
+        return rate >= 1 or random.random() < rate
+
+    def start(self):
+        profile = RequestProfile()
+        return profile, current_profile.set(profile), time.perf_counter()
+
+    def finish(self, request, response, profile, started):
+        wall = time.perf_counter() - started
+        match = request.resolver_match
+        view = (match.view_name or match._func_path) if match else '<unresolved>'
+        duplicates, repeated = query_stats(profile.queries, self.config['N_PLUS_ONE_THRESHOLD'])
+        perf_buffer.add((
+            time.time(), f'{request.method} {view}', response.status_code, wall, profile.db_time,
+            len(profile.queries), duplicates, profile.serializer_time, repeated,
+        ))
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+SORT_KEYS = ('p95_ms', 'total_ms', 'db_ms', 'queries', 'duplicates', 'count')
+
+
+def summarize(records, sort='p95_ms', limit=20):
+    """
+    Сводка по обработчикам, худшие первыми: времена в миллисекундах, средние на запрос.
+    """
+    by_view = {}
+    for record in records:
+        by_view.setdefault(record[1], []).append(record)
+
+    rows = []
+    for view, items in by_view.items():
+        count = len(items)
+        walls = sorted(item[3] for item in items)
+        signatures = {}
+        for item in items:
+            for template, repeats in item[8]:
+                requests, worst = signatures.get(template, (0, 0))
+                signatures[template] = (requests + 1, max(worst, repeats))
+        rows.append({
+            'view': view,
+            'count': count,
+            'errors': sum(item[2] >= 500 for item in items),
+            'p50_ms': percentile(walls, 0.5) * 1000,
+            'p95_ms': percentile(walls, 0.95) * 1000,
+            'max_ms': walls[-1] * 1000,
+            'total_ms': sum(walls) * 1000,
+            'db_ms': sum(item[4] for item in items) / count * 1000,
+            'queries': sum(item[5] for item in items) / count,
+            'max_queries': max(item[5] for item in items),
+            'duplicates': sum(item[6] for item in items) / count,
+            'serializer_ms': sum(item[7] for item in items) / count * 1000,
+            'n_plus_one': [
+                {'query': template, 'requests': requests, 'max_repeats': worst}
+                for template, (requests, worst) in sorted(signatures.items(), key=lambda item: -item[1][0])
+            ],
+        })
+    rows.sort(key=lambda row: -row[sort])
+    return rows[:limit]
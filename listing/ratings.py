@@ -0,0 +1,81 @@
+"""
+Агрегаты отзывов в Property: rating_count, rating_sum и rating_avg.
+
+Обновляются инкрементально одним UPDATE с F-выражениями при создании,
+изменении и удалении отзыва (см. listing.signals), поэтому сортировка
+и фильтр по рейтингу работают по индексированной колонке без агрегации
+Review на каждом чтении. Записи в обход сигналов (bulk_create,
+QuerySet.update) исправляет команда `recompute_ratings`.
+"""
+from django.db import transaction
+from django.db.models import Count, F, FloatField, Sum, Value
+from django.db.models.functions import Cast, Coalesce, NullIf
+
+from .models import Property, Review
+
+
+def apply_rating(property_id, count_delta, sum_delta):
+    """
+    Добавляет к агрегатам объекта count_delta отзывов с суммой оценок sum_delta.
+    """
+    # rating_avg стоит первым в SET: MySQL подставляет в следующие присваивания уже
+    # новые значения колонок, поэтому среднее считается от старых значений и дельт
+    Property.objects.filter(pk=property_id).update(
+        rating_avg=Coalesce(
+            (Cast(F('rating_sum'), FloatField()) + sum_delta) / NullIf(F('rating_count') + count_delta, 0),
+            Value(0.0),
+        ),
+        rating_count=F('rating_count') + count_delta,
+        rating_sum=F('rating_sum') + sum_delta,
+    )
+
+
+def review_saved(review, previous):
+    """
+    previous — (property_id, rating) отзыва до изменения или None для нового.
+    """
+    if previous is None:
+        apply_rating(review.property_id, 1, review.rating)
+        return
+    property_id, rating = previous
+    if property_id != review.property_id:
+        apply_rating(property_id, -1, -rating)
+        apply_rating(review.property_id, 1, review.rating)
+    elif rating != review.rating:
+        apply_rating(property_id, 0, review.rating - rating)
+
+
+def review_deleted(review):
+    apply_rating(review.property_id, -1, -review.rating)
+
+
+def recompute(chunk_size=2000):
+    """
+    Пересчитывает агрегаты по таблице отзывов пачками объектов по id
+    и исправляет расхождения. Возвращает число исправленных объектов.
+    """
+    repaired = 0
+    last_id = 0
+    while True:
+        with transaction.atomic():
+            properties = list(
+                Property.objects.select_for_update().filter(pk__gt=last_id).order_by('pk')
+                .only('id', 'rating_count', 'rating_sum', 'rating_avg')[:chunk_size]
+            )
+            if not properties:
+                return repaired
+            totals = {
+                row['property']: (row['count'], row['total'])
+                for row in Review.objects.filter(property__in=[prop.pk for prop in properties])
+                .order_by().values('property').annotate(count=Count('*'), total=Sum('rating'))
+            }
+            changed = []
+            for prop in properties:
+                count, total = totals.get(prop.pk, (0, 0))
+                average = total / count if count else 0.0
+                if (prop.rating_count, prop.rating_sum, prop.rating_avg) != (count, total, average):
+                    prop.rating_count, prop.rating_sum, prop.rating_avg = count, total, average
+                    changed.append(prop)
+            Property.objects.bulk_update(changed, ['rating_count', 'rating_sum', 'rating_avg'])
+        repaired += len(changed)
+        last_id = properties[-1].pk
@@ -0,0 +1,165 @@
+"""
+Персональные рекомендации: GET /api/properties/recommended/.
+
+Офлайн (команда build_similarity) по ViewHistory строится разреженная матрица
+пользователь x объект, из нее — число совместных просмотров для каждой пары
+объектов и косинусная близость count(i, j) / sqrt(count(i) * count(j)).
+Для каждого объекта в PropertySimilarity сохраняются TOP_K лучших соседей.
+Матрица близости считается блоками по BLOCK_SIZE строк, поэтому в памяти
+не бывает больше одного блока.
+
+На запрос берутся последние просмотры пользователя, их списки соседей
+складываются с весом, убывающим к более старым просмотрам, и отдаются лучшие
+непросмотренные объекты. Если соседей не хватает, список дополняется самыми
+популярными объектами (listing.popularity).
+
+NumPy и SciPy нужны только для построения и импортируются внутри него.
+"""
+import heapq
+import time
+from array import array
+from datetime import timedelta
+from operator import itemgetter
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .metrics import registry
+from .models import Property, PropertySimilarity, ViewHistory
+
+
+def load_views(since, chunk_size):
+    """
+    Пары (user_id, property_id) просмотров новее since в виде двух массивов.
+    """
+    import numpy as np
+
+    users, properties = array('q'), array('q')
+    rows = ViewHistory.objects.filter(created_at__gte=since).order_by().values_list('id', 'user_id', 'property_id')
+    last_id = 0
+    while True:
+        chunk = list(rows.filter(pk__gt=last_id).order_by('pk')[:chunk_size])
+        for _, user_id, property_id in chunk:
+            users.append(user_id)
+            properties.append(property_id)
+        if len(chunk) < chunk_size:
+            return np.frombuffer(users, dtype=np.int64), np.frombuffer(properties, dtype=np.int64)
+        last_id = chunk[-1][0]
+
+
+def similar_blocks(user_ids, property_ids, top_k, min_coviews, max_user_items, block_size):
+    """
+    Лучшие соседи объектов блоками: [(property_id, neighbor_id, score), ...].
+    """
+    import numpy as np
+    from scipy import sparse
+
+    users, user_index = np.unique(user_ids, return_inverse=True)
+    items, item_index = np.unique(property_ids, return_inverse=True)
+    views = sparse.csr_matrix(
+        (np.ones(len(item_index), dtype=np.float32), (user_index, item_index)), shape=(len(users), len(items))
+    )
+    # Повторные просмотры одного объекта считаются одним
+    views.sum_duplicates()
+    views.data[:] = 1
+    per_user = np.diff(views.indptr)
+    views = views[(per_user >= 2) & (per_user <= max_user_items)]
+    norms = np.sqrt(np.asarray(views.sum(axis=0)).ravel())
+    by_item = views.T.tocsr()
+
+    for start in range(0, len(items), block_size):
+        stop = min(start + block_size, len(items))
+        coviews = (by_item[start:stop] @ views).tocsr()
+        block = []
+        for row in range(stop - start):
+            begin, end = coviews.indptr[row], coviews.indptr[row + 1]
+            columns, counts = coviews.indices[begin:end], coviews.data[begin:end]
+            keep = (columns != start + row) & (counts >= min_coviews)
+            columns, counts = columns[keep], counts[keep]
+            if not len(columns):
+                continue
+            scores = counts / (norms[start + row] * norms[columns])
+            if len(scores) > top_k:
+                best = np.argpartition(-scores, top_k)[:top_k]
+                columns, scores = columns[best], scores[best]
+            property_id = int(items[start + row])
+            block.extend(
+                (property_id, int(items[column]), float(score))
+                for column, score in zip(columns.tolist(), scores.tolist())
+            )
+        yield block
+
+
+def build_similarity(top_k=None):
+    """
+    Перестраивает PropertySimilarity по просмотрам за HISTORY_DAYS.
+    Возвращает (число просмотров, число сохраненных пар).
+    """
+    config = settings.RECOMMENDATIONS
+    top_k = top_k or config['TOP_K']
+    started = time.perf_counter()
+    user_ids, property_ids = load_views(timezone.now() - timedelta(days=config['HISTORY_DAYS']), config['CHUNK_SIZE'])
+    saved = 0
+    # Старые соседи видны запросам, пока новые не зафиксированы
+    with transaction.atomic():
+        PropertySimilarity.objects.all().delete()
+        # Объект могли удалить, пока строилась матрица
+        alive = set(Property.objects.values_list('pk', flat=True))
+        for block in similar_blocks(
+            user_ids, property_ids, top_k, config['MIN_COVIEWS'], config['MAX_USER_ITEMS'], config['BLOCK_SIZE']
+        ):
+            rows = [
+                PropertySimilarity(property_id=property_id, neighbor_id=neighbor_id, score=score)
+                for property_id, neighbor_id, score in block
+                if property_id in alive and neighbor_id in alive
+            ]
+            PropertySimilarity.objects.bulk_create(rows, batch_size=5000)
+            saved += len(rows)
+    registry.observe('recommendations.build', time.perf_counter() - started)
+    return len(user_ids), saved
+
+
+def recent_views(user_id, count):
+    """
+    До count последних различных объектов, просмотренных пользователем, от новых к старым.
+    """
+    recent = []
+    for property_id in (
+        ViewHistory.objects.filter(user_id=user_id).order_by('-created_at')
+        .values_list('property_id', flat=True)[:count * 2]
+    ):
+        if property_id not in recent:
+            recent.append(property_id)
+    return recent[:count]
+
+
+def recommend(user_id, limit, queryset=None):
+    """
+    Объекты для рекомендации пользователю, лучшие первыми.
+    queryset задает выборку объектов (например, с select_related для сериализатора).
+    """
+    config = settings.RECOMMENDATIONS
+    queryset = (Property.objects.all() if queryset is None else queryset).filter(status='active')
+    recent = recent_views(user_id, config['RECENT_VIEWS'])
+    weights = {property_id: config['RECENCY_DECAY'] ** rank for rank, property_id in enumerate(recent)}
+    scores = {}
+    for property_id, neighbor_id, score in (
+        PropertySimilarity.objects.filter(property_id__in=recent).values_list('property_id', 'neighbor_id', 'score')
+    ):
+        scores[neighbor_id] = scores.get(neighbor_id, 0) + weights[property_id] * score
+    for property_id in recent:
+        scores.pop(property_id, None)
+
+    # С запасом на снятые с публикации объекты
+    candidates = [pk for pk, _ in heapq.nlargest(limit * 2, scores.items(), key=itemgetter(1))]
+    found = queryset.in_bulk(candidates) if candidates else {}
+    ranked = [found[pk] for pk in candidates if pk in found][:limit]
+
+    if len(ranked) < limit:
+        ranked.extend(
+            queryset.filter(popularity__isnull=False)
+            .exclude(pk__in=recent + [prop.pk for prop in ranked])
+            .order_by('-popularity__score')[:limit - len(ranked)]
+        )
+    return ranked
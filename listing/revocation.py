@@ -0,0 +1,178 @@
+import hashlib
+import math
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer, TokenVerifySerializer
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import UntypedToken
+
+from .metrics import registry
+from .models import RevokedToken
+
+
+class BloomFilter:
+    """
+    Bloom-фильтр для строк: без ложноотрицательных ответов,
+    доля ложноположительных не выше `error_rate` при `capacity` элементах.
+    """
+
+    def __init__(self, capacity, error_rate):
+        self.capacity = capacity
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        # Двойное хэширование: k позиций из двух 64-битных половин одного дайджеста
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class RevocationList:
+    """
+    Список отозванных JWT в памяти процесса.
+
+    Все jti из таблицы RevokedToken хранятся в bloom-фильтре, поэтому проверка
+    неотозванного токена (обычный случай) не обращается к базе. Только при
+    срабатывании фильтра наличие jti уточняется запросом к таблице.
+
+    Фильтр дочитывает новые записи по revoked_at не чаще, чем раз
+    в settings.TOKEN_REVOCATION['REFRESH_INTERVAL'] секунд (с перекрытием
+    LAG_SECONDS: запись, зафиксированная позже соседних, не пропускается
+    до перестройки, как было бы с отметкой по id), и полностью
+    перестраивается из неистекших записей раз в REBUILD_INTERVAL секунд
+    или при заполнении. Отзыв в другом процессе становится виден здесь
+    с задержкой до REFRESH_INTERVAL; повторное использование refresh-токена
+    при ротации отсекается сразу уникальным индексом по jti.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._bloom = None
+        self._loaded_at = None
+        self._refreshed_at = 0.0
+        self._rebuilt_at = 0.0
+        registry.gauge('revocation.bloom_size', lambda: self._bloom.count if self._bloom else 0)
+
+    @property
+    def config(self):
+        return settings.TOKEN_REVOCATION
+
+    def _is_fresh(self, now):
+        return self._bloom is not None and now - self._refreshed_at < self.config['REFRESH_INTERVAL']
+
+    def refresh(self, force=False):
+        now = time.monotonic()
+        if not force and self._is_fresh(now):
+            return
+        with self._lock:
+            if not force and self._is_fresh(now):
+                return
+            bloom = self._bloom
+            if bloom is None or bloom.count >= bloom.capacity or now - self._rebuilt_at >= self.config['REBUILD_INTERVAL']:
+                self._rebuild(now)
+            else:
+                since = self._loaded_at - timedelta(seconds=self.config['LAG_SECONDS'])
+                self._load(bloom, RevokedToken.objects.filter(revoked_at__gte=since))
+            self._refreshed_at = now
+
+    def _rebuild(self, now):
+        active = RevokedToken.objects.filter(expires_at__gt=timezone.now())
+        bloom = BloomFilter(max(self.config['CAPACITY'], active.count() * 2), self.config['ERROR_RATE'])
+        self._load(bloom, active)
+        self._bloom = bloom
+        self._rebuilt_at = now
+
+    def _load(self, bloom, queryset):
+        loaded_at = timezone.now()
+        for jti in queryset.values_list('jti', flat=True).iterator(chunk_size=10000):
+            # Записи из окна перекрытия уже в фильтре: не увеличиваем count повторно
+            if jti not in bloom:
+                bloom.add(jti)
+        self._loaded_at = loaded_at
+
+    def is_revoked(self, jti):
+        self.refresh()
+        if jti not in self._bloom:
+            return False
+        registry.incr('revocation.bloom_hits')
+        if RevokedToken.objects.filter(jti=jti).exists():
+            return True
+        registry.incr('revocation.false_positives')
+        return False
+
+    def revoke(self, jti, expires_at):
+        """
+        Отзывает токен. Возвращает False, если он уже был отозван.
+        """
+        self.refresh()
+        try:
+            with transaction.atomic():
+                RevokedToken.objects.create(jti=jti, expires_at=expires_at)
+        except IntegrityError:
+            return False
+        with self._lock:
+            self._bloom.add(jti)
+        registry.incr('revocation.revoked')
+        return True
+
+    def revoke_token(self, token):
+        expires_at = datetime.fromtimestamp(token['exp'], tz=dt_timezone.utc)
+        return self.revoke(token[jwt_settings.JTI_CLAIM], expires_at)
+
+
+revocation_list = RevocationList()
+
+
+def check_not_revoked(token):
+    if revocation_list.is_revoked(token.get(jwt_settings.JTI_CLAIM, '')):
+        raise InvalidToken('Token is revoked')
+
+
+class RevocationTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    Обновление токенов с проверкой отзыва. При ротации старый refresh-токен
+    отзывается; повторная попытка использовать его отклоняется.
+    """
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        check_not_revoked(refresh)
+
+        data = {'access': str(refresh.access_token)}
+
+        if jwt_settings.ROTATE_REFRESH_TOKENS:
+            # Из двух одновременных ротаций одного токена проходит только одна
+            if jwt_settings.BLACKLIST_AFTER_ROTATION and not revocation_list.revoke_token(refresh):
+                raise InvalidToken('Token is revoked')
+
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+
+            data['refresh'] = str(refresh)
+
+        return data
+
+
+class RevocationTokenVerifySerializer(TokenVerifySerializer):
+    def validate(self, attrs):
+        check_not_revoked(UntypedToken(attrs['token']))
+        return {}
@@ -0,0 +1,155 @@
+import re
+from collections import Counter
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import OuterRef, Q, Subquery, Sum, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Coalesce
+from django.utils.module_loading import import_string
+
+from .models import Property, PropertySearchTerm
+
+TOKEN_RE = re.compile(r'\w+')
+MAX_TERM_LENGTH = 64
+
+# Совпадение в заголовке важнее совпадения в описании
+TITLE_WEIGHT = 3
+DESCRIPTION_WEIGHT = 1
+
+# Верхняя граница для поиска по префиксу: term >= 'abc' AND term < 'abc\uffff'
+PREFIX_UPPER_BOUND = '\uffff'
+
+
+def tokenize(text):
+    """
+    Разбивает текст на токены без учета регистра.
+    """
+    return [token[:MAX_TERM_LENGTH] for token in TOKEN_RE.findall((text or '').casefold())]
+
+
+def build_terms(title, description):
+    """
+    Возвращает веса токенов объекта жилья: {token: weight}.
+    """
+    weights = Counter()
+    for token in tokenize(title):
+        weights[token] += TITLE_WEIGHT
+    for token in tokenize(description):
+        weights[token] += DESCRIPTION_WEIGHT
+    return weights
+
+
+class BaseSearchBackend:
+    """
+    Интерфейс бэкенда поиска по объектам жилья.
+
+    `search` фильтрует queryset по поисковой строке и добавляет аннотацию
+    `search_rank` (чем больше, тем релевантнее). Методы индексации
+    вызываются из сигналов Property и могут ничего не делать, если индекс
+    поддерживает сама база данных.
+    """
+
+    def search(self, queryset, query):
+        raise NotImplementedError
+
+    def index_properties(self, properties):
+        pass
+
+    def remove_properties(self, property_ids):
+        pass
+
+    def rebuild(self, chunk_size=2000):
+        pass
+
+
+class InvertedIndexSearchBackend(BaseSearchBackend):
+    """
+    Поиск по собственному инвертированному индексу (таблица PropertySearchTerm).
+
+    Работает на любой базе данных, включая SQLite. Каждое слово запроса
+    ищется как префикс токена диапазонным запросом по индексу (term, property),
+    объект должен содержать все слова запроса. Ранг — сумма весов совпавших токенов.
+    """
+
+    def search(self, queryset, query):
+        tokens = tokenize(query)
+        if not tokens:
+            return queryset
+
+        matches = Q()
+        for token in tokens:
+            prefix = Q(term__gte=token, term__lt=token + PREFIX_UPPER_BOUND)
+            queryset = queryset.filter(
+                pk__in=PropertySearchTerm.objects.filter(prefix).values('property_id')
+            )
+            matches |= prefix
+
+        rank = (
+            PropertySearchTerm.objects
+            .filter(matches, property=OuterRef('pk'))
+            .values('property')
+            .annotate(total=Sum('weight'))
+            .values('total')
+        )
+        return queryset.annotate(search_rank=Coalesce(Subquery(rank), Value(0)))
+
+    def index_properties(self, properties):
+        properties = list(properties)
+        if not properties:
+            return
+        PropertySearchTerm.objects.filter(property__in=properties).delete()
+        PropertySearchTerm.objects.bulk_create([
+            PropertySearchTerm(property_id=prop.pk, term=term, weight=weight)
+            for prop in properties
+            for term, weight in build_terms(prop.title, prop.description).items()
+        ], batch_size=1000)
+
+    def remove_properties(self, property_ids):
+        PropertySearchTerm.objects.filter(property_id__in=property_ids).delete()
+
+    def rebuild(self, chunk_size=2000):
+        PropertySearchTerm.objects.all().delete()
+        chunk = []
+        for prop in Property.objects.only('id', 'title', 'description').iterator(chunk_size=chunk_size):
+            chunk.append(prop)
+            if len(chunk) >= chunk_size:
+                self.index_properties(chunk)
+                chunk = []
+        self.index_properties(chunk)
+
+
+class MySQLFulltextSearchBackend(BaseSearchBackend):
+    """
+    Поиск через FULLTEXT-индекс MySQL по (title, description).
+
+    Индекс создается миграцией и поддерживается самой базой данных,
+    поэтому методы индексации ничего не делают. Запрос выполняется
+    в BOOLEAN MODE: каждое слово обязательно и ищется как префикс.
+    """
+
+    def search(self, queryset, query):
+        boolean_query = self.build_boolean_query(query)
+        if not boolean_query:
+            return queryset
+
+        table = connection.ops.quote_name(Property._meta.db_table)
+        match = RawSQL(
+            f'MATCH ({table}.`title`, {table}.`description`) AGAINST (%s IN BOOLEAN MODE)',
+            [boolean_query],
+        )
+        return queryset.annotate(search_rank=match).filter(search_rank__gt=0)
+
+    @staticmethod
+    def build_boolean_query(query):
+        return ' '.join(f'+{token}*' for token in tokenize(query))
+
+
+@lru_cache(maxsize=None)
+def _load_backend(path):
+    return import_string(path)()
+
+
+def get_search_backend():
+    return _load_backend(settings.PROPERTY_SEARCH_BACKEND)
@@ -1,4 +1,7 @@
+from decimal import Decimal
+
 from rest_framework import serializers
+from .availability import MAX_BOOKING_LENGTH
 from .models import (
     User,
     Property,
@@ -10,15 +13,54 @@ from .models import (
     Notification,
 )
 
+class OwnerSummarySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = User
+        fields = ['id', 'username']
+
 class PropertySerializer(serializers.ModelSerializer):
+    owner_summary = OwnerSummarySerializer(source='owner', read_only=True)
+    review_count = serializers.SerializerMethodField()
+    average_rating = serializers.SerializerMethodField()
+    # Расстояние в км до точки из ?near= (только в результатах такого поиска)
+    distance = serializers.FloatField(read_only=True)
+
     class Meta:
         model = Property
-        fields = '__all__'
+        # Ячейка сетки — служебное поле поиска по координатам (listing.geo)
+        exclude = ['geo_cell']
+        # Агрегаты отзывов обновляются только из Review (listing.ratings)
+        read_only_fields = ['rating_count', 'rating_sum', 'rating_avg']
+
+    def get_review_count(self, obj):
+        return obj.rating_count
+
+    def get_average_rating(self, obj):
+        return obj.rating_avg if obj.rating_count else None
+
+    def validate(self, attrs):
+        latitude = attrs.get('latitude', getattr(self.instance, 'latitude', None))
+        longitude = attrs.get('longitude', getattr(self.instance, 'longitude', None))
+        if (latitude is None) != (longitude is None):
+            raise serializers.ValidationError({'latitude': 'Широта и долгота указываются вместе.'})
+        return attrs
 
 class BookingSerializer(serializers.ModelSerializer):
     class Meta:
         model = Booking
         fields = '__all__'
+        read_only_fields = ['user']  # Арендатор берется из запроса
+
+    def validate(self, attrs):
+        start_date = attrs.get('start_date', getattr(self.instance, 'start_date', None))
+        end_date = attrs.get('end_date', getattr(self.instance, 'end_date', None))
+        if start_date and end_date and start_date >= end_date:
+            raise serializers.ValidationError({'end_date': 'Дата выезда должна быть позже даты заезда.'})
+        if start_date and end_date and end_date - start_date > MAX_BOOKING_LENGTH:
+            raise serializers.ValidationError({
+                'end_date': f'Бронирование не может быть длиннее {MAX_BOOKING_LENGTH.days} дней.'
+            })
+        return attrs
 
 class ReviewSerializer(serializers.ModelSerializer):
     class Meta:
@@ -44,4 +86,94 @@ class ViewHistorySerializer(serializers.ModelSerializer):
 class NotificationSerializer(serializers.ModelSerializer):
     class Meta:
         model = Notification
-        fields = ['id', 'event_type', 'content', 'is_read', 'created_at']
\ No newline at end of file
+        fields = ['id', 'event_type', 'content', 'is_read', 'created_at']
+
+
+class MarkReadSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(), required=False, max_length=1000)
+    up_to_id = serializers.IntegerField(required=False)
+
+    def validate(self, attrs):
+        if ('ids' in attrs) == ('up_to_id' in attrs):
+            raise serializers.ValidationError('Укажите либо ids, либо up_to_id.')
+        return attrs
+
+
+class BulkPropertyListSerializer(serializers.ListSerializer):
+    """
+    Проверка строк массовой загрузки (listing.bulk). Строки с `id` обновляют
+    существующие объекты владельца и могут содержать только изменяемые поля.
+    Категории и id всех строк проверяются двумя запросами на весь список.
+    Как и у ListSerializer, ошибки — список по строкам ({} у корректных).
+    """
+    max_rows = 10000
+
+    def to_internal_value(self, data):
+        if not isinstance(data, list):
+            raise serializers.ValidationError({'non_field_errors': ['Ожидается список объектов.']})
+        if not data:
+            raise serializers.ValidationError({'non_field_errors': ['Список пуст.']})
+        if len(data) > self.max_rows:
+            raise serializers.ValidationError({'non_field_errors': [f'Не больше {self.max_rows} строк за запрос.']})
+
+        rows, errors = [], {}
+        for index, item in enumerate(data):
+            # Обязательность полей DRF проверяет по partial корневого сериализатора
+            self.partial = isinstance(item, dict) and item.get('id') not in (None, '')
+            try:
+                rows.append((index, self.child.run_validation(item)))
+            except serializers.ValidationError as exc:
+                errors[index] = exc.detail
+        self.partial = False
+
+        category_ids = {pk for _, row in rows for pk in row.get('categories', ())}
+        known_categories = set(Category.objects.filter(pk__in=category_ids).values_list('pk', flat=True))
+        ids = [row['id'] for _, row in rows if 'id' in row]
+        owned = set(
+            Property.objects.filter(owner=self.context['request'].user, pk__in=ids).values_list('pk', flat=True)
+        )
+        seen = set()
+        for index, row in rows:
+            row_errors = {}
+            unknown = sorted(set(row.get('categories', ())) - known_categories)
+            if unknown:
+                row_errors['categories'] = [f'Неизвестные категории: {unknown}.']
+            if 'id' in row:
+                if row['id'] not in owned:
+                    row_errors['id'] = ['Объект не найден.']
+                elif row['id'] in seen:
+                    row_errors['id'] = ['Объект указан в нескольких строках.']
+                seen.add(row['id'])
+            if row_errors:
+                errors[index] = row_errors
+
+        if errors:
+            raise serializers.ValidationError([errors.get(index, {}) for index in range(len(data))])
+        return [row for _, row in rows]
+
+
+class BulkPropertySerializer(serializers.Serializer):
+    """
+    Строка массовой загрузки объектов без ModelSerializer: никаких запросов
+    к базе на строку (связи и владельца проверяет BulkPropertyListSerializer).
+    """
+    id = serializers.IntegerField(required=False)
+    title = serializers.CharField(max_length=255)
+    description = serializers.CharField()
+    location = serializers.CharField(max_length=255)
+    price = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=Decimal('0'))
+    room_count = serializers.IntegerField(min_value=0)
+    property_type = serializers.ChoiceField(choices=Property.PROPERTY_TYPES)
+    status = serializers.ChoiceField(choices=Property.STATUS_CHOICES, required=False)
+    latitude = serializers.FloatField(min_value=-90, max_value=90, required=False)
+    longitude = serializers.FloatField(min_value=-180, max_value=180, required=False)
+    categories = serializers.ListField(child=serializers.IntegerField(), required=False)
+
+    class Meta:
+        list_serializer_class = BulkPropertyListSerializer
+
+    def validate(self, attrs):
+        # Для обновляемых объектов пара проверяется по обоим переданным полям
+        if ('latitude' in attrs) != ('longitude' in attrs):
+            raise serializers.ValidationError({'latitude': 'Широта и долгота указываются вместе.'})
+        return attrs
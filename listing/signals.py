@@ -0,0 +1,154 @@
+from collections import Counter
+
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .authentication import invalidate_user
+from .bitmaps import SCALAR_FIELDS, bitmap_index
+from .cache import property_cache
+from .models import Booking, Notification, Property, Review, User
+from .notifications import add_unread
+from .ratings import review_deleted, review_saved
+from .search import get_search_backend
+
+# Поля Property, от которых зависит поисковый индекс
+SEARCH_FIELDS = {'title', 'description'}
+
+
+@receiver(post_save, sender=Property)
+def index_property(sender, instance, update_fields=None, **kwargs):
+    # Переиндексируем только если изменились title или description
+    if update_fields is not None and not SEARCH_FIELDS & set(update_fields):
+        return
+    get_search_backend().index_properties([instance])
+
+
+@receiver(post_delete, sender=Property)
+def unindex_property(sender, instance, **kwargs):
+    get_search_backend().remove_properties([instance.pk])
+
+
+@receiver(post_save, sender=Property)
+@receiver(post_delete, sender=Property)
+def invalidate_property(sender, instance, **kwargs):
+    property_cache.invalidate_properties([instance.pk])
+
+
+@receiver(post_save, sender=Property)
+def update_bitmap_index(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not set(SCALAR_FIELDS) & set(update_fields):
+        return
+    bitmap_index.property_saved(instance)
+
+
+@receiver(post_delete, sender=Property)
+def remove_from_bitmap_index(sender, instance, **kwargs):
+    bitmap_index.property_deleted(instance.pk)
+
+
+@receiver(m2m_changed, sender=Property.categories.through)
+def invalidate_property_categories(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        changed = [instance.pk] if action.startswith('post_') else []
+    elif action == 'pre_clear':
+        # category.property_set.clear(): после очистки затронутые объекты уже неизвестны
+        changed = list(instance.property_set.values_list('pk', flat=True))
+    elif action in ('post_add', 'post_remove'):
+        changed = list(pk_set)
+    else:
+        changed = []
+    if changed:
+        property_cache.invalidate_properties(changed)
+        bitmap_index.categories_changed(changed)
+
+
+@receiver(pre_save, sender=Review)
+def remember_review_rating(sender, instance, raw=False, **kwargs):
+    # Прежние объект и оценка нужны, чтобы перенести отзыв в агрегатах
+    instance._previous_rating = None
+    if not raw and instance.pk is not None:
+        instance._previous_rating = Review.objects.filter(pk=instance.pk).values_list('property_id', 'rating').first()
+
+
+@receiver(post_save, sender=Review)
+def update_rating_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        review_saved(instance, None)
+    elif instance._previous_rating is not None:
+        review_saved(instance, instance._previous_rating)
+
+
+@receiver(post_delete, sender=Review)
+def update_rating_on_delete(sender, instance, **kwargs):
+    review_deleted(instance)
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def invalidate_property_reviews(sender, instance, **kwargs):
+    # Количество и средняя оценка отзывов входят в ответ объекта
+    property_cache.invalidate_properties([instance.property_id])
+
+
+@receiver(post_save, sender=Booking)
+@receiver(post_delete, sender=Booking)
+def invalidate_availability(sender, instance, **kwargs):
+    property_cache.invalidate_bookings()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    # Смена пароля, деактивация и права пользователя должны сразу действовать на аутентификацию
+    invalidate_user(instance)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+def invalidate_cached_user_permissions(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        invalidate_user(instance)
+    elif pk_set:
+        for user in User.objects.filter(pk__in=pk_set):
+            invalidate_user(user)
+
+
+# Поля Notification, от которых зависит счетчик непрочитанных
+UNREAD_FIELDS = {'recipient', 'is_read'}
+
+
+@receiver(pre_save, sender=Notification)
+def remember_notification_state(sender, instance, raw=False, update_fields=None, **kwargs):
+    # Прежние получатель и is_read нужны, чтобы перенести уведомление в счетчиках
+    instance._previous_unread = None
+    if raw or instance.pk is None:
+        return
+    if update_fields is not None and not UNREAD_FIELDS & set(update_fields):
+        return
+    instance._previous_unread = (
+        Notification.objects.filter(pk=instance.pk).values_list('recipient_id', 'is_read').first()
+    )
+
+
+@receiver(post_save, sender=Notification)
+def count_saved_notification(sender, instance, created, **kwargs):
+    # Пачки из конвейера уведомлений учитываются в listing.notifications.deliver
+    previous = None if created else instance._previous_unread
+    if not created and previous is None:
+        return
+    deltas = Counter()
+    if previous is not None and not previous[1]:
+        deltas[previous[0]] -= 1
+    if not instance.is_read:
+        deltas[instance.recipient_id] += 1
+    add_unread(deltas)
+
+
+@receiver(post_delete, sender=Notification)
+def count_deleted_notification(sender, instance, **kwargs):
+    if not instance.is_read:
+        add_unread({instance.recipient_id: -1})
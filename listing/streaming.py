@@ -0,0 +1,253 @@
+"""
+Поток уведомлений через server-sent events: GET /api/notifications/stream/.
+
+Каждое подключение — корутина и asyncio.Event в хабе, поэтому простаивающие
+соединения не занимают поток и не опрашивают базу: запрос к БД делается
+только после сигнала о новых уведомлениях пользователя (и при подключении).
+Сигнал публикуется после фиксации транзакции, создавшей уведомления
+(см. listing.notifications.add_unread).
+
+Хаб рассылает сигналы подписчикам своего процесса. Между процессами
+сигналы передает бэкенд из settings.NOTIFICATION_HUB['BACKEND']:
+LocalHubBackend для одного процесса, RedisHubBackend — через Redis pub/sub.
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.module_loading import import_string
+from rest_framework import exceptions
+from rest_framework.settings import api_settings
+
+from .metrics import registry
+from .models import Notification
+from .serializers import NotificationSerializer
+
+logger = logging.getLogger(__name__)
+
+
+class NotificationHub:
+    """
+    Подписки подключений на сигналы о новых уведомлениях пользователя.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+        self._backend = None
+        registry.gauge('notification_stream.connections', self.connections)
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            with self._lock:
+                if self._backend is None:
+                    self._backend = import_string(settings.NOTIFICATION_HUB['BACKEND'])(self)
+        return self._backend
+
+    def connections(self):
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    def subscribe(self, user_id):
+        subscription = (asyncio.get_running_loop(), asyncio.Event())
+        self.backend.start()
+        with self._lock:
+            self._subscribers[user_id].add(subscription)
+        return subscription[1]
+
+    def unsubscribe(self, user_id, event):
+        with self._lock:
+            subscribers = self._subscribers.get(user_id, set())
+            subscribers.difference_update({item for item in subscribers if item[1] is event})
+            if not subscribers:
+                self._subscribers.pop(user_id, None)
+
+    def publish(self, user_ids):
+        """
+        Сообщает подключениям пользователей о новых уведомлениях во всех процессах.
+
+        Доставка сигнала не обязательна: уведомления уже сохранены, а подключения
+        прочитают их при следующем сигнале или переподключении. Поэтому ошибки
+        бэкенда (например, недоступный Redis) только логируются.
+        """
+        try:
+            self.backend.publish(list(user_ids))
+        except Exception:
+            registry.incr('notification_stream.publish_errors')
+            logger.exception('Failed to publish notification signal')
+
+    def notify_all(self):
+        with self._lock:
+            user_ids = list(self._subscribers)
+        self.notify_local(user_ids)
+
+    def notify_local(self, user_ids):
+        with self._lock:
+            subscriptions = [item for user_id in user_ids for item in self._subscribers.get(user_id, ())]
+        for loop, event in subscriptions:
+            # Публикация приходит из потоков запросов и фоновых потоков
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:  # Цикл событий уже закрыт
+                pass
+        registry.incr('notification_stream.wakeups', len(subscriptions))
+
+
+class LocalHubBackend:
+    """
+    Сигналы только внутри текущего процесса.
+    """
+
+    def __init__(self, hub):
+        self.hub = hub
+
+    def start(self):
+        pass
+
+    def publish(self, user_ids):
+        self.hub.notify_local(user_ids)
+
+
+# Первая задержка переподключения к Redis, секунды; дальше удваивается
+RECONNECT_INITIAL_DELAY = 0.5
+
+
+class RedisHubBackend:
+    """
+    Сигналы через канал Redis pub/sub (settings.NOTIFICATION_HUB['REDIS_URL']),
+    чтобы подключения в любом процессе узнавали об уведомлениях из других.
+    """
+    channel = 'listing:notifications'
+
+    def __init__(self, hub):
+        import redis
+
+        self.hub = hub
+        self.client = redis.Redis.from_url(settings.NOTIFICATION_HUB['REDIS_URL'])
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        # Слушатель канала запускается при первой подписке в процессе
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._listen, name='notification-hub', daemon=True)
+                self._thread.start()
+
+    def publish(self, user_ids):
+        self.client.publish(self.channel, json.dumps(user_ids))
+
+    def _listen(self):
+        delay = RECONNECT_INITIAL_DELAY
+        try:
+            while True:
+                pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+                try:
+                    pubsub.subscribe(self.channel)
+                    if delay > RECONNECT_INITIAL_DELAY:
+                        # Сигналы за время разрыва потеряны: подключения перечитают уведомления сами
+                        self.hub.notify_all()
+                    delay = RECONNECT_INITIAL_DELAY
+                    for message in pubsub.listen():
+                        try:
+                            self.hub.notify_local(json.loads(message['data']))
+                        except Exception:
+                            logger.exception('Bad notification hub message')
+                except Exception:
+                    registry.incr('notification_stream.reconnects')
+                    logger.warning('Notification hub connection lost, reconnecting in %.1f s', delay, exc_info=True)
+                    time.sleep(delay)
+                    delay = min(delay * 2, settings.NOTIFICATION_HUB['RECONNECT_MAX_DELAY'])
+                finally:
+                    pubsub.close()
+        finally:
+            # Следующая подписка запустит слушателя заново
+            with self._lock:
+                self._thread = None
+
+
+notification_hub = NotificationHub()
+
+
+def format_event(notification):
+    data = json.dumps(NotificationSerializer(notification).data, ensure_ascii=False)
+    return f'id: {notification.pk}\nevent: notification\ndata: {data}\n\n'
+
+
+def fetch_after(user_id, last_id, limit=100):
+    return list(Notification.objects.filter(recipient_id=user_id, pk__gt=last_id).order_by('pk')[:limit])
+
+
+def latest_id(user_id):
+    return Notification.objects.filter(recipient_id=user_id).order_by('-pk').values_list('pk', flat=True).first() or 0
+
+
+async def event_stream(user_id, last_id, fetch=None, heartbeat=None):
+    """
+    Асинхронный генератор SSE-сообщений: уведомления с id > last_id,
+    затем новые по мере поступления; при простое — комментарий-heartbeat.
+    """
+    fetch = fetch or sync_to_async(fetch_after)
+    heartbeat = heartbeat or settings.NOTIFICATION_HUB['HEARTBEAT']
+    event = notification_hub.subscribe(user_id)
+    try:
+        yield f'retry: {settings.NOTIFICATION_HUB["RETRY_MS"]}\n\n'
+        while True:
+            # Сбрасываем сигнал до запроса: уведомление, созданное после
+            # запроса, снова взведет его и не потеряется
+            event.clear()
+            notifications = await fetch(user_id, last_id)
+            for notification in notifications:
+                yield format_event(notification)
+                last_id = notification.pk
+            if notifications:
+                continue
+            try:
+                await asyncio.wait_for(event.wait(), heartbeat)
+            except asyncio.TimeoutError:
+                yield ': heartbeat\n\n'
+    finally:
+        notification_hub.unsubscribe(user_id, event)
+
+
+def authenticate(request):
+    # Те же классы аутентификации, что и у DRF (JWT / Basic) — им достаточно request.META
+    for authentication_class in api_settings.DEFAULT_AUTHENTICATION_CLASSES:
+        result = authentication_class().authenticate(request)
+        if result is not None:
+            return result[0]
+    return None
+
+
+async def notification_stream(request):
+    """
+    SSE-поток уведомлений текущего пользователя. Поддерживает возобновление
+    по заголовку Last-Event-ID (или параметру ?last_event_id=).
+    """
+    if request.method != 'GET':
+        return HttpResponse(status=405, headers={'Allow': 'GET'})
+    try:
+        user = await sync_to_async(authenticate)(request)
+    except exceptions.AuthenticationFailed:
+        user = None
+    if user is None:
+        return HttpResponse(status=401)
+
+    last_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+    try:
+        last_id = int(last_id)
+    except (TypeError, ValueError):
+        # Новое подключение получает только уведомления, созданные после него
+        last_id = await sync_to_async(latest_id)(user.pk)
+
+    response = StreamingHttpResponse(event_stream(user.pk, last_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Отключаем буферизацию в nginx
+    return response
@@ -2,11 +2,30 @@ from datetime import datetime
 import pytest
 from rest_framework.test import APIClient
 from django.contrib.auth import get_user_model
+from django.core.cache import caches
 from listing.models import Property, Booking, Review, Notification, Category
 from listing.models import User
+from listing.counters import view_counter
 
 User = get_user_model()
 
+@pytest.fixture(autouse=True)
+def background_writes(settings):
+    # В тестах история и уведомления пишутся в БД сразу, а счетчик просмотров
+    # сбрасывается только явно — без фоновых потоков
+    settings.HISTORY_BUFFER = {'MAX_SIZE': 1, 'FLUSH_INTERVAL': 0}
+    settings.NOTIFICATION_QUEUE = {**settings.NOTIFICATION_QUEUE, 'MAX_SIZE': 1, 'FLUSH_INTERVAL': 0}
+    settings.VIEW_COUNTER = {**settings.VIEW_COUNTER, 'FLUSH_INTERVAL': 0}
+    yield
+    view_counter.drain()
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    # Кэш ответов живет в памяти процесса и не откатывается вместе с БД
+    yield
+    for cache in caches.all():
+        cache.clear()
+
 @pytest.fixture
 def api_client():
     return APIClient()
@@ -44,6 +63,19 @@ def sample_property(db):
 
     return property_instance
 
+
+@pytest.fixture
+def landlord_property(db, landlord_user):
+    return Property.objects.create(
+        title='Sample Property',
+        description='Description',
+        location='Berlin',
+        price=1000,
+        room_count=2,
+        property_type='apartment',
+        owner=landlord_user
+    )
+
 @pytest.fixture
 def booking(db, tenant_user, sample_property):
     return Booking.objects.create(
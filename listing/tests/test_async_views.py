@@ -0,0 +1,88 @@
+import pytest
+from asgiref.sync import async_to_sync
+from django.test import AsyncClient
+from django.urls import reverse
+from rest_framework import status
+from rest_framework_simplejwt.tokens import AccessToken
+from listing.counters import view_counter
+from listing.models import Category, Property, SearchHistory
+
+
+@pytest.fixture
+def properties(db, landlord_user):
+    category = Category.objects.create(name='Эконом')
+    created = []
+    for i, (location, price) in enumerate([('Berlin', 900), ('Munich', 1500), ('Berlin', 2100), ('Hamburg', 700)]):
+        prop = Property.objects.create(
+            title=f'Квартира {i}', description='Светлая квартира у парка' if i % 2 else 'Дом',
+            location=location, price=price, room_count=2, property_type='apartment', owner=landlord_user
+        )
+        prop.categories.add(category)
+        created.append(prop)
+    return created
+
+
+def async_get(url, params=None, **headers):
+    return async_to_sync(AsyncClient().get)(url, params, headers=headers)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('params', [
+    {},
+    {'location': 'Berlin'},
+    {'price__gte': 1000, 'ordering': 'price'},
+    {'search': 'квартира парк'},
+    {'page_size': 2},
+    {'available_from': '2025-03-01', 'available_to': '2025-03-05', 'ordering': '-price'},
+])
+def test_async_list_matches_sync_list(api_client, properties, params):
+    expected = api_client.get(reverse('api:properties-list'), params)
+    response = async_get(reverse('api:async-properties-list'), params)
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == expected.json()
+
+
+@pytest.mark.django_db
+def test_async_list_follows_cursor(api_client, properties):
+    url = reverse('api:async-properties-list')
+    first = async_get(url, {'page_size': 3}).json()
+    second = async_get(first['next']).json()
+
+    titles = [item['title'] for item in first['results'] + second['results']]
+    assert sorted(titles) == sorted(prop.title for prop in properties)
+    assert second['next'] is None
+
+
+@pytest.mark.django_db
+def test_async_list_rejects_invalid_filters(properties):
+    response = async_get(reverse('api:async-properties-list'), {'available_from': '2025-03-01'})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db
+def test_async_retrieve(api_client, properties):
+    prop = properties[0]
+    url = reverse('api:async-properties-detail', kwargs={'pk': prop.pk})
+
+    response = async_get(url)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == api_client.get(reverse('api:properties-detail', kwargs={'pk': prop.pk})).json()
+    assert async_get(url, **{'If-None-Match': response['ETag']}).status_code == status.HTTP_304_NOT_MODIFIED
+
+    view_counter.flush()
+    prop.refresh_from_db()
+    assert prop.views == 3
+
+    missing = reverse('api:async-properties-detail', kwargs={'pk': 999999})
+    assert async_get(missing).status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.django_db
+def test_async_list_records_authenticated_search(properties, tenant_user):
+    token = AccessToken.for_user(tenant_user)
+    response = async_get(reverse('api:async-properties-list'), {'search': 'парк'}, Authorization=f'Bearer {token}')
+
+    assert response.status_code == status.HTTP_200_OK
+    assert len(response.json()) == 2
+    assert SearchHistory.objects.filter(user=tenant_user, keyword='парк').exists()
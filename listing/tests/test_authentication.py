@@ -0,0 +1,85 @@
+import base64
+from unittest import mock
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework_simplejwt.tokens import AccessToken
+from listing.authentication import auth_cache, get_cached_user, user_cache_key
+from listing.models import User
+
+
+def basic(username, password):
+    return 'Basic ' + base64.b64encode(f'{username}:{password}'.encode()).decode()
+
+
+@pytest.fixture
+def check_password():
+    with mock.patch.object(User, 'check_password', autospec=True, side_effect=User.check_password) as patched:
+        yield patched
+
+
+@pytest.mark.django_db
+def test_basic_credentials_are_verified_once(api_client, tenant_user, check_password):
+    url = reverse('api:notification-list')
+    for _ in range(3):
+        response = api_client.get(url, HTTP_AUTHORIZATION=basic('tenant', 'password123'))
+        assert response.status_code == status.HTTP_200_OK
+    assert check_password.call_count == 1
+
+    # Неверный пароль не попадает в кэш и проверяется каждый раз
+    for _ in range(2):
+        response = api_client.get(url, HTTP_AUTHORIZATION=basic('tenant', 'wrong'))
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+    assert check_password.call_count == 3
+
+
+@pytest.mark.django_db
+def test_password_change_invalidates_cached_credentials(api_client, tenant_user):
+    url = reverse('api:notification-list')
+    assert api_client.get(url, HTTP_AUTHORIZATION=basic('tenant', 'password123')).status_code == status.HTTP_200_OK
+
+    tenant_user.set_password('new-password')
+    tenant_user.save()
+    assert api_client.get(url, HTTP_AUTHORIZATION=basic('tenant', 'password123')).status_code == status.HTTP_401_UNAUTHORIZED
+    assert api_client.get(url, HTTP_AUTHORIZATION=basic('tenant', 'new-password')).status_code == status.HTTP_200_OK
+
+
+@pytest.mark.django_db
+def test_deactivation_invalidates_cached_credentials(api_client, tenant_user):
+    url = reverse('api:notification-list')
+    token = AccessToken.for_user(tenant_user)
+    assert api_client.get(url, HTTP_AUTHORIZATION=basic('tenant', 'password123')).status_code == status.HTTP_200_OK
+    assert api_client.get(url, HTTP_AUTHORIZATION=f'Bearer {token}').status_code == status.HTTP_200_OK
+
+    tenant_user.is_active = False
+    tenant_user.save()
+    assert api_client.get(url, HTTP_AUTHORIZATION=basic('tenant', 'password123')).status_code == status.HTTP_401_UNAUTHORIZED
+    assert api_client.get(url, HTTP_AUTHORIZATION=f'Bearer {token}').status_code == status.HTTP_401_UNAUTHORIZED
+
+
+@pytest.mark.django_db
+def test_jwt_user_is_not_requeried(api_client, tenant_user):
+    url = reverse('api:notification-list')
+    header = f'Bearer {AccessToken.for_user(tenant_user)}'
+    api_client.get(url, HTTP_AUTHORIZATION=header)
+
+    with CaptureQueriesContext(connection) as queries:
+        response = api_client.get(url, HTTP_AUTHORIZATION=header)
+    assert response.status_code == status.HTTP_200_OK
+    assert not any('"listing_user"' in query['sql'].split('WHERE')[0] for query in queries)
+
+
+@pytest.mark.django_db
+def test_cached_user_has_no_password_hash(api_client, tenant_user):
+    get_cached_user(tenant_user.pk)
+    assert tenant_user.password not in repr(auth_cache().get(user_cache_key(tenant_user.pk)))
+
+    user = get_cached_user(tenant_user.pk)
+    user.role = 'landlord'
+    user.save()
+    tenant_user.refresh_from_db()
+    # Отложенный пароль не затирается при сохранении пользователя из кэша
+    assert tenant_user.role == 'landlord' and tenant_user.check_password('password123')
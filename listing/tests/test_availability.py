@@ -0,0 +1,182 @@
+from datetime import date
+
+import pytest
+from django.urls import reverse
+from rest_framework import status
+from listing.availability import IntervalIndex
+from listing.models import Property, Booking
+
+
+@pytest.fixture
+def existing_booking(landlord_property, tenant_user):
+    return Booking.objects.create(
+        property=landlord_property,
+        user=tenant_user,
+        start_date='2025-03-10',
+        end_date='2025-03-15',
+        status='confirmed'
+    )
+
+
+def book(api_client, prop, start_date, end_date):
+    return api_client.post(reverse('api:booking-detail-list'), {
+        'property': prop.id, 'start_date': start_date, 'end_date': end_date
+    })
+
+
+def test_interval_index_free_ranges():
+    index = IntervalIndex([(date(2025, 1, 10), date(2025, 1, 15)), (date(2025, 1, 20), date(2025, 1, 25))])
+
+    assert index.free_ranges(date(2025, 1, 1), date(2025, 1, 31)) == [
+        (date(2025, 1, 1), date(2025, 1, 10)),
+        (date(2025, 1, 15), date(2025, 1, 20)),
+        (date(2025, 1, 25), date(2025, 1, 31)),
+    ]
+    assert index.free_ranges(date(2025, 1, 12), date(2025, 1, 22)) == [(date(2025, 1, 15), date(2025, 1, 20))]
+
+
+@pytest.mark.django_db
+def test_overlapping_booking_is_rejected(api_client, tenant_user, landlord_property, existing_booking):
+    api_client.force_authenticate(user=tenant_user)
+
+    response = book(api_client, landlord_property, '2025-03-14', '2025-03-18')
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    # День выезда свободен для следующего заезда
+    response = book(api_client, landlord_property, '2025-03-15', '2025-03-18')
+    assert response.status_code == status.HTTP_201_CREATED
+
+
+@pytest.mark.django_db
+def test_canceled_bookings_do_not_block(api_client, tenant_user, landlord_property, existing_booking):
+    existing_booking.status = 'canceled'
+    existing_booking.save()
+    api_client.force_authenticate(user=tenant_user)
+
+    response = book(api_client, landlord_property, '2025-03-11', '2025-03-13')
+    assert response.status_code == status.HTTP_201_CREATED
+
+
+@pytest.mark.django_db
+def test_update_into_overlap_is_rejected(api_client, tenant_user, landlord_property, existing_booking):
+    api_client.force_authenticate(user=tenant_user)
+    other = book(api_client, landlord_property, '2025-04-01', '2025-04-05').data
+
+    url = reverse('api:booking-detail-detail', kwargs={'pk': other['id']})
+    response = api_client.patch(url, {'start_date': '2025-03-12'})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    # Изменение своего же бронирования не считается пересечением
+    response = api_client.patch(url, {'end_date': '2025-04-07'})
+    assert response.status_code == status.HTTP_200_OK
+
+
+@pytest.mark.django_db
+def test_end_date_must_follow_start_date(api_client, tenant_user, landlord_property):
+    api_client.force_authenticate(user=tenant_user)
+    response = book(api_client, landlord_property, '2025-03-15', '2025-03-15')
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db
+def test_booking_longer_than_limit_is_rejected(api_client, tenant_user, landlord_property):
+    api_client.force_authenticate(user=tenant_user)
+    response = book(api_client, landlord_property, '2025-01-01', '2026-06-01')
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert 'end_date' in response.json()
+
+
+@pytest.fixture
+def double_booking(landlord_property, tenant_user):
+    # Пересекающиеся активные бронирования, сохраненные до проверки пересечений
+    return Booking.objects.bulk_create([
+        Booking(property=landlord_property, user=tenant_user, start_date='2025-04-01', end_date='2025-04-20', status='confirmed'),
+        Booking(property=landlord_property, user=tenant_user, start_date='2025-04-05', end_date='2025-04-08', status='confirmed'),
+    ])
+
+
+@pytest.mark.django_db
+def test_overlap_with_older_double_booking_is_rejected(api_client, tenant_user, landlord_property, double_booking):
+    api_client.force_authenticate(user=tenant_user)
+
+    response = book(api_client, landlord_property, '2025-04-10', '2025-04-12')
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    response = book(api_client, landlord_property, '2025-04-20', '2025-04-22')
+    assert response.status_code == status.HTTP_201_CREATED
+
+    url = reverse('api:properties-availability', kwargs={'pk': landlord_property.pk})
+    response = api_client.get(url, {'from': '2025-04-10', 'to': '2025-04-25'})
+    assert response.json()['free'] == [{'start': '2025-04-22', 'end': '2025-04-25'}]
+
+
+@pytest.mark.django_db
+def test_availability_endpoint_returns_free_ranges(api_client, landlord_property, existing_booking, tenant_user):
+    Booking.objects.create(
+        property=landlord_property, user=tenant_user,
+        start_date='2025-03-01', end_date='2025-03-05', status='pending'
+    )
+    Booking.objects.create(
+        property=landlord_property, user=tenant_user,
+        start_date='2025-03-05', end_date='2025-03-09', status='canceled'
+    )
+    url = reverse('api:properties-availability', kwargs={'pk': landlord_property.pk})
+
+    response = api_client.get(url, {'from': '2025-03-03', 'to': '2025-03-20'})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()['free'] == [
+        {'start': '2025-03-05', 'end': '2025-03-10'},
+        {'start': '2025-03-15', 'end': '2025-03-20'},
+    ]
+
+    response = api_client.get(url, {'from': '2025-03-20', 'to': '2025-03-03'})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    response = api_client.get(url, {'from': '2025-02-30', 'to': '2025-03-03'})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.fixture
+def second_property(db, landlord_user):
+    return Property.objects.create(
+        title='Second Property',
+        description='Description',
+        location='Munich',
+        price=2000,
+        room_count=3,
+        property_type='house',
+        owner=landlord_user
+    )
+
+
+def available_titles(api_client, **params):
+    response = api_client.get(reverse('api:properties-list'), params)
+    assert response.status_code == status.HTTP_200_OK
+    return sorted(item['title'] for item in response.data)
+
+
+@pytest.mark.django_db
+def test_list_filters_by_available_dates(api_client, landlord_property, second_property, existing_booking):
+    # existing_booking занимает landlord_property с 2025-03-10 по 2025-03-15
+    both = sorted([landlord_property.title, second_property.title])
+
+    assert available_titles(api_client, available_from='2025-03-12', available_to='2025-03-20') == [second_property.title]
+    assert available_titles(api_client, available_from='2025-03-01', available_to='2025-03-11') == [second_property.title]
+    assert available_titles(api_client, available_from='2025-03-15', available_to='2025-03-20') == both
+    assert available_titles(api_client, available_from='2025-03-01', available_to='2025-03-10') == both
+
+
+@pytest.mark.django_db
+def test_list_excludes_property_with_older_double_booking(api_client, landlord_property, second_property, double_booking):
+    assert available_titles(api_client, available_from='2025-04-10', available_to='2025-04-12') == [second_property.title]
+
+
+@pytest.mark.django_db
+def test_available_dates_combine_with_other_filters(api_client, landlord_property, second_property, existing_booking):
+    params = {'available_from': '2025-03-15', 'available_to': '2025-03-20'}
+    assert available_titles(api_client, location='Berlin', **params) == [landlord_property.title]
+    assert available_titles(api_client, price__gte=1500, **params) == [second_property.title]
+
+
+@pytest.mark.django_db
+def test_available_dates_require_both_params(api_client, landlord_property):
+    response = api_client.get(reverse('api:properties-list'), {'available_from': '2025-03-15'})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
@@ -0,0 +1,203 @@
+import random
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from listing.bitmaps import BitmapIndex, RoaringBitmap, bitmap_index
+from listing.metrics import registry
+from listing.models import Category, Property
+
+
+def test_roaring_bitmap_matches_set_operations():
+    rng = random.Random(7)
+    # Разреженные и плотные контейнеры, в том числе на границе 65536
+    left = set(rng.sample(range(200000), 3000)) | set(range(65000, 72000))
+    right = set(rng.sample(range(200000), 20000)) | set(range(70000, 140000, 3))
+
+    a, b = RoaringBitmap.from_sorted(sorted(left)), RoaringBitmap.from_sorted(sorted(right))
+
+    assert list(a & b) == sorted(left & right)
+    assert list(a | b) == sorted(left | right)
+    assert len(a) == len(left)
+    assert list(RoaringBitmap.from_bytes(b.to_bytes())) == sorted(right)
+
+
+def test_roaring_bitmap_add_and_discard_switch_containers():
+    bitmap = RoaringBitmap()
+    for value in range(5000):
+        bitmap.add(value * 2)
+    # Больше ARRAY_MAX значений в контейнере — битовая карта
+    assert isinstance(bitmap.containers[0], int)
+    for value in range(0, 10000, 2):
+        if value % 20:
+            bitmap.discard(value)
+
+    assert not isinstance(bitmap.containers[0], int)
+    assert list(bitmap) == list(range(0, 10000, 20))
+    assert 20 in bitmap and 22 not in bitmap
+
+
+@pytest.fixture
+def index(settings):
+    settings.BITMAP_INDEX = {**settings.BITMAP_INDEX, 'ENABLED': True, 'SNAPSHOT_PATH': None, 'REFRESH_INTERVAL': 0, 'REBUILD_INTERVAL': 0}
+    return bitmap_index
+
+
+@pytest.fixture
+def catalog(db, landlord_user):
+    economy, business = Category.objects.create(name='Эконом'), Category.objects.create(name='Бизнес')
+    rows = [
+        # (тип, статус, город, комнаты, категории)
+        ('apartment', 'active', 'Berlin', 1, [economy]),
+        ('apartment', 'active', 'Berlin', 2, [economy, business]),
+        ('apartment', 'inactive', 'Berlin', 2, [economy]),
+        ('house', 'active', 'Berlin', 4, [business]),
+        ('house', 'active', 'Munich', 5, []),
+        ('studio', 'active', 'Munich', 1, [economy]),
+    ]
+    properties = []
+    for i, (property_type, status, location, room_count, categories) in enumerate(rows):
+        prop = Property.objects.create(
+            title=f'Объект {i}', description='Описание', location=location, price=1000, room_count=room_count,
+            property_type=property_type, status=status, owner=landlord_user,
+        )
+        prop.categories.set(categories)
+        properties.append(prop)
+    return properties, economy, business
+
+
+def list_ids(api_client, params):
+    response = api_client.get(reverse('api:properties-list'), params)
+    assert response.status_code == 200
+    return sorted(item['id'] for item in response.data)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('params', [
+    {'property_type': 'apartment', 'status': 'active', 'location': 'Berlin'},
+    {'room_count__gte': 2, 'room_count__lte': 4, 'status': 'active'},
+    {'categories': 'ECONOMY,BUSINESS', 'location': 'Berlin'},
+    {'categories': 'BUSINESS', 'price__lte': 1000},
+    {'property_type': 'house', 'location': 'Hamburg'},
+    {'location': 'berlin', 'status': 'active'},
+])
+def test_index_gives_same_results_as_orm(api_client, settings, catalog, index, params):
+    _, economy, business = catalog
+    params = {
+        name: value.replace('ECONOMY', str(economy.pk)).replace('BUSINESS', str(business.pk)) if isinstance(value, str) else value
+        for name, value in params.items()
+    }
+    # Оба запроса должны дойти до фильтров, а не до кэша ответов
+    settings.API_CACHE = {**settings.API_CACHE, 'TIMEOUT': 0}
+    settings.BITMAP_INDEX = {**settings.BITMAP_INDEX, 'ENABLED': False}
+    expected = list_ids(api_client, params)
+    settings.BITMAP_INDEX = {**settings.BITMAP_INDEX, 'ENABLED': True}
+    registry.reset()
+
+    with CaptureQueriesContext(connection) as queries:
+        assert list_ids(api_client, params) == expected
+    assert registry.value('bitmap_index.hits') == 1
+    # Индексируемые фильтры заменены на `pk IN (...)`; точное условие по городу проверяет ORM
+    # (при пустом `pk IN ()` Django не выполняет запрос списка)
+    selects = [query['sql'] for query in queries.captured_queries if 'ORDER BY "listing_property"."created_at"' in query['sql']]
+    assert selects or not expected
+    for select in selects:
+        assert '"listing_property"."property_type" =' not in select
+        assert '"listing_property"."status" =' not in select
+        assert ('"listing_property"."location" =' in select) == ('location' in params)
+
+
+@pytest.mark.django_db
+def test_index_follows_saves_and_category_changes(api_client, settings, catalog, index, django_capture_on_commit_callbacks):
+    properties, economy, business = catalog
+    bitmap_index.refresh(force=True)
+    # Дальше только изменения из сигналов, без обращений к базе
+    settings.BITMAP_INDEX = {**settings.BITMAP_INDEX, 'REFRESH_INTERVAL': 3600, 'REBUILD_INTERVAL': 3600}
+
+    with django_capture_on_commit_callbacks(execute=True):
+        properties[2].status = 'active'
+        properties[2].save(update_fields=['status'])
+        properties[3].categories.add(economy)
+        economy.property_set.remove(properties[0])
+        properties[5].delete()
+
+    with CaptureQueriesContext(connection) as queries:
+        assert sorted(bitmap_index.resolve({'status': 'active', 'categories': [economy.pk]})) == [
+            properties[1].pk, properties[2].pk, properties[3].pk,
+        ]
+    assert len(queries) == 0
+
+
+@pytest.mark.django_db
+def test_other_process_changes_are_caught_up_by_updated_at(catalog, index, settings):
+    properties, economy, _ = catalog
+    other = BitmapIndex()
+    other.refresh(force=True)
+    settings.BITMAP_INDEX = {**settings.BITMAP_INDEX, 'REBUILD_INTERVAL': 3600}
+
+    # Сигналы обновляют только bitmap_index: other видит изменения лишь через базу
+    properties[4].location, properties[4].status = 'Berlin', 'inactive'
+    properties[4].save()
+    properties[4].categories.add(economy)
+    other.refresh(force=True)
+
+    assert properties[4].pk in other.resolve({'location': 'Berlin', 'categories': [economy.pk]})
+    assert properties[4].pk in other.resolve({'status': 'inactive'})
+
+
+@pytest.mark.django_db
+def test_location_candidates_ignore_case_and_accents(catalog, index):
+    properties, _, _ = catalog
+    berlin = sorted(prop.pk for prop in properties if prop.location == 'Berlin')
+
+    assert sorted(bitmap_index.resolve({'location': 'BERLIN '})) == berlin
+    assert sorted(bitmap_index.resolve({'location': 'Münich'})) == [properties[4].pk, properties[5].pk]
+
+
+@pytest.mark.django_db
+def test_large_result_falls_back_to_orm(catalog, index, settings):
+    settings.BITMAP_INDEX = {**settings.BITMAP_INDEX, 'MAX_IDS': 2}
+
+    assert bitmap_index.resolve({'status': 'active'}) is None
+    assert len(bitmap_index.resolve({'property_type': 'house'})) == 2
+    # Без индексируемых фильтров индекс не нужен
+    assert bitmap_index.resolve({'price__lte': 1000}) is None
+
+
+@pytest.mark.django_db
+def test_index_over_memory_budget_is_not_used(catalog, index, settings, caplog):
+    settings.BITMAP_INDEX = {**settings.BITMAP_INDEX, 'MEMORY_BUDGET_MB': 0}
+
+    assert bitmap_index.resolve({'status': 'active'}) is None
+    assert 'falling back to ORM filtering' in caplog.text
+
+
+@pytest.mark.django_db
+def test_snapshot_is_loaded_and_caught_up(catalog, index, settings, tmp_path):
+    properties, economy, _ = catalog
+    path = tmp_path / 'bitmaps.bin'
+    call_command('bitmap_index', snapshot=str(path), stdout=StringIO())
+    properties[0].location = 'Munich'
+    properties[0].save()
+
+    settings.BITMAP_INDEX = {**settings.BITMAP_INDEX, 'SNAPSHOT_PATH': str(path), 'REBUILD_INTERVAL': 3600}
+    restored = BitmapIndex()
+    with CaptureQueriesContext(connection) as queries:
+        ids = restored.resolve({'location': 'Munich'})
+
+    assert registry.value('bitmap_index.snapshot_loads') >= 1
+    assert sorted(ids) == [properties[0].pk, properties[4].pk, properties[5].pk]
+    # Только дочитывание изменений, без полного чтения таблицы
+    assert all('updated_at' in query['sql'] or 'property_categories' in query['sql'] for query in queries.captured_queries)
+
+
+@pytest.mark.django_db
+def test_command_reports_memory(catalog):
+    out = StringIO()
+    call_command('bitmap_index', stdout=out)
+
+    report = out.getvalue()
+    assert 'categories' in report and 'МиБ бюджета' in report
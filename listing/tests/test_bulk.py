@@ -0,0 +1,193 @@
+import time
+
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from listing import bulk
+from listing.models import Category, Property, PropertySearchTerm
+
+
+def rows(count, **extra):
+    return [
+        {
+            'title': f'Квартира {i}', 'description': 'Светлая квартира у парка', 'location': 'Berlin',
+            'price': f'{1000 + i}.00', 'room_count': 2, 'property_type': 'apartment', **extra,
+        }
+        for i in range(count)
+    ]
+
+
+@pytest.fixture
+def landlord_client(api_client, landlord_user):
+    api_client.force_authenticate(user=landlord_user)
+    return api_client
+
+
+@pytest.fixture
+def categories(db):
+    return [Category.objects.create(name=name) for name in ('Эконом', 'Бизнес')]
+
+
+@pytest.mark.django_db
+def test_bulk_create_from_json(landlord_client, landlord_user, categories):
+    payload = rows(3, categories=[categories[0].pk, categories[1].pk])
+    response = landlord_client.post(reverse('api:properties-bulk'), payload, format='json')
+
+    assert response.status_code == status.HTTP_201_CREATED
+    assert len(response.data['created']) == 3
+    assert response.data['updated'] == []
+    created = Property.objects.filter(pk__in=response.data['created'])
+    assert all(prop.owner_id == landlord_user.pk for prop in created)
+    assert all(set(prop.categories.values_list('pk', flat=True)) == {c.pk for c in categories} for prop in created)
+    # bulk_create не вызывает сигналы: индекс заполняется явно
+    assert PropertySearchTerm.objects.filter(property__in=created, term='парка').count() == 3
+
+
+@pytest.mark.django_db
+def test_bulk_update_replaces_changed_fields_and_categories(landlord_client, landlord_user, categories):
+    created = landlord_client.post(
+        reverse('api:properties-bulk'), rows(2, categories=[categories[0].pk]), format='json'
+    ).data['created']
+
+    response = landlord_client.post(reverse('api:properties-bulk'), [
+        {'id': created[0], 'price': '500.00', 'categories': [categories[1].pk]},
+        {'id': created[1], 'title': 'Дом у озера'},
+    ], format='json')
+
+    assert response.status_code == status.HTTP_200_OK
+    assert sorted(response.data['updated']) == sorted(created)
+    first, second = Property.objects.get(pk=created[0]), Property.objects.get(pk=created[1])
+    assert str(first.price) == '500.00'
+    assert first.title == 'Квартира 0'
+    assert list(first.categories.values_list('pk', flat=True)) == [categories[1].pk]
+    assert second.title == 'Дом у озера'
+    assert list(second.categories.values_list('pk', flat=True)) == [categories[0].pk]
+    assert PropertySearchTerm.objects.filter(property=second, term='озера').exists()
+
+
+@pytest.mark.django_db
+def test_bulk_create_from_csv(landlord_client, categories):
+    content = (
+        'title,description,location,price,room_count,property_type,categories\n'
+        f'Студия,Рядом с метро,Munich,800,1,studio,{categories[0].pk};{categories[1].pk}\n'
+        'Дом,С садом,Hamburg,2500.50,5,house,\n'
+    ).encode('utf-8-sig')
+    upload = SimpleUploadedFile('properties.csv', content, content_type='text/csv')
+    response = landlord_client.post(reverse('api:properties-bulk'), {'file': upload}, format='multipart')
+
+    assert response.status_code == status.HTTP_201_CREATED
+    studio, house = Property.objects.filter(pk__in=response.data['created']).order_by('pk')
+    assert studio.categories.count() == 2
+    assert house.categories.count() == 0
+    assert str(house.price) == '2500.50'
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('content', [
+    'title,location\nСтудия,Munich\n'.encode('cp1251'),
+    'title,location\nСтудия,Munich\n'.encode('utf-16'),
+    # Поле больше csv.field_size_limit()
+    b'title,location\n"' + b'x' * 200000 + b'",Munich\n',
+])
+def test_bulk_rejects_unreadable_csv(landlord_client, content):
+    upload = SimpleUploadedFile('properties.csv', content, content_type='text/csv')
+    response = landlord_client.post(reverse('api:properties-bulk'), {'file': upload}, format='multipart')
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert 'file' in response.data
+    assert not Property.objects.exists()
+
+
+@pytest.mark.django_db
+def test_bulk_reports_row_errors_and_writes_nothing(landlord_client, tenant_user, categories):
+    foreign = Property.objects.create(
+        title='Чужой', description='Описание', location='Berlin', price=100, room_count=1,
+        property_type='house', owner=tenant_user,
+    )
+    payload = rows(4)
+    payload[1]['price'] = 'дорого'
+    payload[2]['categories'] = [999999]
+    payload.append({'id': foreign.pk, 'price': '1.00'})
+
+    response = landlord_client.post(reverse('api:properties-bulk'), payload, format='json')
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    errors = response.data['errors']
+    assert [error['row'] for error in errors] == [1, 2, 4]
+    assert 'price' in errors[0]['errors']
+    assert 'categories' in errors[1]['errors']
+    assert 'id' in errors[2]['errors']
+    assert Property.objects.count() == 1
+
+
+@pytest.mark.django_db
+def test_bulk_requires_landlord(api_client, tenant_user):
+    api_client.force_authenticate(user=tenant_user)
+    response = api_client.post(reverse('api:properties-bulk'), rows(1), format='json')
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+@pytest.mark.django_db
+def test_bulk_invalidates_cached_lists(api_client, landlord_user, django_capture_on_commit_callbacks):
+    assert api_client.get(reverse('api:properties-list')).json() == []
+    api_client.force_authenticate(user=landlord_user)
+    with django_capture_on_commit_callbacks(execute=True):
+        api_client.post(reverse('api:properties-bulk'), rows(2), format='json')
+    api_client.force_authenticate(user=None)
+
+    assert len(api_client.get(reverse('api:properties-list')).json()) == 2
+
+
+@pytest.mark.django_db
+def test_bulk_query_count_does_not_depend_on_rows(landlord_client, categories, monkeypatch):
+    monkeypatch.setattr(bulk, 'BULK_CHUNK_SIZE', 10000)
+
+    def count_queries(count):
+        with CaptureQueriesContext(connection) as queries:
+            response = landlord_client.post(
+                reverse('api:properties-bulk'), rows(count, categories=[categories[0].pk]), format='json'
+            )
+        assert response.status_code == status.HTTP_201_CREATED
+        # SQLite ограничивает число параметров запроса, поэтому INSERT разбивается на пачки
+        return sum(1 for query in queries if not query['sql'].startswith('INSERT'))
+
+    assert count_queries(5) == count_queries(500)
+
+
+@pytest.mark.django_db
+def test_bulk_throughput(landlord_client, categories):
+    payload = rows(2000, categories=[categories[0].pk])
+    started = time.perf_counter()
+    response = landlord_client.post(reverse('api:properties-bulk'), payload, format='json')
+    elapsed = time.perf_counter() - started
+
+    assert response.status_code == status.HTTP_201_CREATED
+    assert Property.objects.count() == 2000
+    assert 2000 / elapsed > 1000
+
+
+@pytest.mark.django_db
+def test_insert_without_returning_ids_reads_back_batch(landlord_user, monkeypatch):
+    monkeypatch.setattr(type(connection.features), 'can_return_rows_from_bulk_insert', False)
+    properties = [
+        Property(title=title, description='Описание', location='Berlin', price=100, room_count=1,
+                 property_type='house', owner=landlord_user)
+        for title in ('А', 'Б', 'А')
+    ]
+    bulk_create = Property.objects.bulk_create
+
+    def concurrent_post(objs, **kwargs):
+        # Обычный POST того же владельца с тем же названием между вставкой пачки и чтением id
+        Property.objects.create(title='А', description='Другой', location='Munich', price=200, room_count=2,
+                                property_type='studio', owner=landlord_user)
+        return bulk_create(objs, **kwargs)
+
+    monkeypatch.setattr(Property.objects, 'bulk_create', concurrent_post)
+    bulk.insert_properties(landlord_user, properties)
+
+    stored = {prop.pk: prop for prop in Property.objects.filter(owner=landlord_user)}
+    assert len(stored) == 4
+    assert [(stored[prop.pk].title, stored[prop.pk].location) for prop in properties] == [('А', 'Berlin'), ('Б', 'Berlin'), ('А', 'Berlin')]
@@ -0,0 +1,137 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from listing.counters import view_counter
+from listing.metrics import registry
+from listing.models import Booking, Category, Review
+
+
+def get(api_client, url, params=None, **extra):
+    with CaptureQueriesContext(connection) as queries:
+        response = api_client.get(url, params, **extra)
+    return response, len(queries)
+
+
+@pytest.mark.django_db
+def test_anonymous_list_is_served_from_cache(api_client, landlord_property):
+    registry.reset()
+    url = reverse('api:properties-list')
+
+    first, _ = get(api_client, url, {'location': 'Berlin'})
+    second, queries = get(api_client, url, {'location': 'Berlin'})
+    assert second.status_code == status.HTTP_200_OK
+    assert queries == 0
+    assert second.json() == first.json()
+    assert registry.value('property_cache.hits') == 1
+    assert registry.value('property_cache.misses') == 1
+    assert registry.snapshot()['gauges']['property_cache.hit_ratio'] == 0.5
+
+    # Другой набор параметров — другой ключ
+    other, queries = get(api_client, url, {'location': 'Munich'})
+    assert queries > 0
+    assert other.json() == []
+
+
+@pytest.mark.django_db
+def test_etag_returns_not_modified(api_client, landlord_property, django_capture_on_commit_callbacks):
+    url = reverse('api:properties-detail', kwargs={'pk': landlord_property.pk})
+    etag = api_client.get(url)['ETag']
+
+    response, queries = get(api_client, url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert queries == 0
+
+    landlord_property.title = 'Updated'
+    with django_capture_on_commit_callbacks(execute=True):
+        landlord_property.save()
+    response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == status.HTTP_200_OK
+    assert response['ETag'] != etag
+
+
+@pytest.mark.django_db
+def test_property_changes_invalidate_cache(
+    api_client, landlord_property, tenant_user, django_capture_on_commit_callbacks
+):
+    list_url = reverse('api:properties-list')
+    detail_url = reverse('api:properties-detail', kwargs={'pk': landlord_property.pk})
+    api_client.get(list_url)
+    api_client.get(detail_url)
+
+    landlord_property.title = 'Updated'
+    with django_capture_on_commit_callbacks(execute=True):
+        landlord_property.save()
+    assert api_client.get(list_url).json()[0]['title'] == 'Updated'
+
+    category = Category.objects.create(name='Garden')
+    with django_capture_on_commit_callbacks(execute=True):
+        landlord_property.categories.add(category)
+    assert api_client.get(detail_url).json()['categories'] == [category.pk]
+
+    with django_capture_on_commit_callbacks(execute=True):
+        Review.objects.create(property=landlord_property, user=tenant_user, rating=4, comment='Ok')
+    assert api_client.get(detail_url).json()['review_count'] == 1
+
+    with django_capture_on_commit_callbacks(execute=True):
+        landlord_property.delete()
+    assert api_client.get(list_url).json() == []
+    assert api_client.get(detail_url).status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.django_db
+def test_bookings_invalidate_only_date_filtered_lists(
+    api_client, landlord_property, tenant_user, django_capture_on_commit_callbacks
+):
+    url = reverse('api:properties-list')
+    dates = {'available_from': '2025-03-10', 'available_to': '2025-03-15'}
+    api_client.get(url)
+    assert len(api_client.get(url, dates).json()) == 1
+
+    with django_capture_on_commit_callbacks(execute=True):
+        Booking.objects.create(
+            property=landlord_property, user=tenant_user,
+            start_date='2025-03-11', end_date='2025-03-12', status='confirmed'
+        )
+    _, queries = get(api_client, url)
+    assert queries == 0
+    assert api_client.get(url, dates).json() == []
+
+
+@pytest.mark.django_db
+def test_versions_change_after_commit(api_client, landlord_property, django_capture_on_commit_callbacks):
+    url = reverse('api:properties-detail', kwargs={'pk': landlord_property.pk})
+    etag = api_client.get(url)['ETag']
+
+    with django_capture_on_commit_callbacks() as callbacks:
+        landlord_property.title = 'Updated'
+        landlord_property.save()
+        # До коммита версия прежняя: ответ с незакоммиченными данными не попадет в кэш под новой версией
+        assert api_client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == status.HTTP_304_NOT_MODIFIED
+
+    for callback in callbacks:
+        callback()
+    assert api_client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == status.HTTP_200_OK
+
+
+@pytest.mark.django_db
+def test_authenticated_requests_bypass_cache(api_client, landlord_property, tenant_user):
+    url = reverse('api:properties-detail', kwargs={'pk': landlord_property.pk})
+    api_client.get(url)
+    api_client.force_authenticate(user=tenant_user)
+
+    response, queries = get(api_client, url)
+    assert 'ETag' not in response
+    assert queries > 0
+
+
+@pytest.mark.django_db
+def test_cached_detail_still_counts_views(api_client, landlord_property):
+    url = reverse('api:properties-detail', kwargs={'pk': landlord_property.pk})
+    for _ in range(3):
+        api_client.get(url)
+
+    view_counter.flush()
+    landlord_property.refresh_from_db()
+    assert landlord_property.views == 3
@@ -0,0 +1,60 @@
+import threading
+
+import pytest
+from django.urls import reverse
+from listing.counters import ShardedCounter, view_counter
+from listing.models import Property
+
+THREADS = 16
+HITS_PER_THREAD = 1000
+
+
+@pytest.mark.django_db
+def test_retrieve_counts_views(api_client, landlord_property):
+    url = reverse('api:properties-detail', kwargs={'pk': landlord_property.pk})
+    for _ in range(3):
+        api_client.get(url)
+
+    assert view_counter.flush() == 3
+    landlord_property.refresh_from_db()
+    assert landlord_property.views == 3
+
+
+@pytest.mark.django_db
+def test_concurrent_increments_are_not_lost(landlord_property):
+    counter = ShardedCounter(Property, 'views', 'test_counter', shards=4, flush_interval=0)
+    start = threading.Barrier(THREADS)
+
+    def hammer():
+        start.wait()
+        for _ in range(HITS_PER_THREAD):
+            counter.incr(landlord_property.pk)
+
+    threads = [threading.Thread(target=hammer) for _ in range(THREADS)]
+    for thread in threads:
+        thread.start()
+
+    # Сбрасываем счетчик в БД, пока потоки продолжают его увеличивать
+    flushed = 0
+    while any(thread.is_alive() for thread in threads):
+        flushed += counter.flush()
+    for thread in threads:
+        thread.join()
+    flushed += counter.flush()
+
+    landlord_property.refresh_from_db()
+    assert flushed == THREADS * HITS_PER_THREAD
+    assert landlord_property.views == THREADS * HITS_PER_THREAD
+
+
+@pytest.mark.django_db
+def test_independent_counters_add_up(landlord_property):
+    # Как у воркеров с собственными счетчиками: UPDATE views = views + n не теряет чужие приращения
+    workers = [ShardedCounter(Property, 'views', f'worker_{i}', shards=2, flush_interval=0) for i in range(3)]
+    for i, counter in enumerate(workers, start=1):
+        counter.incr(landlord_property.pk, i * 10)
+    for counter in workers:
+        counter.flush()
+
+    landlord_property.refresh_from_db()
+    assert landlord_property.views == 60
@@ -0,0 +1,130 @@
+import csv
+import io
+import json
+import tracemalloc
+from datetime import date, timedelta
+
+import pytest
+from django.urls import reverse
+from rest_framework import status
+from listing import export
+from listing.models import Booking, Property
+
+
+@pytest.fixture
+def portfolio(db, landlord_user, tenant_user):
+    properties = Property.objects.bulk_create([
+        Property(
+            title=f'Объект {i}', description='Описание', location='Berlin' if i % 2 else 'Munich',
+            price=1000 + i, room_count=2, property_type='apartment', owner=landlord_user,
+        )
+        for i in range(5)
+    ])
+    start = date(2025, 1, 1)
+    Booking.objects.bulk_create([
+        Booking(property=prop, user=tenant_user, start_date=start + timedelta(days=10 * i),
+                end_date=start + timedelta(days=10 * i + 3))
+        for prop in properties
+        for i in range(3)
+    ])
+    return properties
+
+
+def content(response):
+    return b''.join(response.streaming_content).decode()
+
+
+@pytest.mark.django_db
+def test_export_bookings_ndjson(api_client, landlord_user, portfolio, settings):
+    api_client.force_authenticate(user=landlord_user)
+    response = api_client.get(reverse('api:booking-detail-export'), {'format': 'ndjson'})
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response['Content-Type'].startswith('application/x-ndjson')
+    assert response['Content-Disposition'] == 'attachment; filename="bookings.ndjson"'
+    rows = [json.loads(line) for line in content(response).splitlines()]
+    assert [row['id'] for row in rows] == sorted(Booking.objects.values_list('pk', flat=True))
+    assert rows[0]['property_title'] == 'Объект 0'
+    assert rows[0]['start_date'] == '2025-01-01'
+
+
+@pytest.mark.django_db
+def test_export_bookings_csv_in_chunks(api_client, tenant_user, portfolio, monkeypatch):
+    monkeypatch.setattr(export, 'EXPORT_CHUNK_SIZE', 4)
+    api_client.force_authenticate(user=tenant_user)
+    response = api_client.get(reverse('api:booking-detail-export'), {'format': 'csv'})
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response['Content-Type'].startswith('text/csv')
+    rows = list(csv.DictReader(io.StringIO(content(response))))
+    assert len(rows) == 15
+    assert len({row['id'] for row in rows}) == 15
+    assert rows[0]['status'] == 'pending'
+
+
+@pytest.mark.django_db
+def test_export_properties_json_with_filters(api_client, landlord_user, portfolio):
+    api_client.force_authenticate(user=landlord_user)
+    response = api_client.get(reverse('api:properties-export'), {'format': 'json', 'location': 'Berlin'})
+
+    assert response.status_code == status.HTTP_200_OK
+    rows = json.loads(content(response))
+    assert [row['title'] for row in rows] == ['Объект 1', 'Объект 3']
+    assert rows[0]['price'] == '1001.00'
+
+
+@pytest.mark.django_db
+def test_export_is_limited_to_own_rows(api_client, tenant_user, portfolio):
+    api_client.force_authenticate(user=tenant_user)
+    response = api_client.get(reverse('api:properties-export'), {'format': 'json'})
+    assert json.loads(content(response)) == []
+
+
+@pytest.mark.django_db
+def test_export_requires_authentication(api_client, portfolio):
+    response = api_client.get(reverse('api:properties-export'))
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+@pytest.mark.django_db
+def test_export_rejects_unknown_format(api_client, landlord_user, portfolio):
+    api_client.force_authenticate(user=landlord_user)
+    response = api_client.get(reverse('api:booking-detail-export'), {'format': 'xml'})
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.django_db
+def test_export_memory_does_not_grow_with_row_count(api_client, landlord_user, tenant_user, monkeypatch):
+    monkeypatch.setattr(export, 'EXPORT_CHUNK_SIZE', 500)
+    prop = Property.objects.create(
+        title='Объект', description='Описание', location='Berlin', price=1000,
+        room_count=2, property_type='apartment', owner=landlord_user,
+    )
+    api_client.force_authenticate(user=landlord_user)
+    url = reverse('api:booking-detail-export')
+
+    def measure(total):
+        existing = Booking.objects.count()
+        start = date(2000, 1, 1)
+        Booking.objects.bulk_create([
+            Booking(property=prop, user=tenant_user, start_date=start + timedelta(days=i),
+                    end_date=start + timedelta(days=i + 1))
+            for i in range(existing, total)
+        ], batch_size=1000)
+
+        tracemalloc.start()
+        try:
+            size = sum(len(chunk) for chunk in api_client.get(url, {'format': 'ndjson'}).streaming_content)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        return size, peak
+
+    measure(500)  # Прогрев
+    small_size, small_peak = measure(1000)
+    large_size, large_peak = measure(10000)
+
+    # Выгрузка в 10 раз больше, а пиковая память почти та же: в памяти одна пачка
+    assert large_size > 9 * small_size
+    assert large_peak < small_peak * 1.5
+    assert large_peak < large_size
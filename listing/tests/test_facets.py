@@ -0,0 +1,130 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from listing.models import Category, Property
+
+
+@pytest.fixture
+def catalog(db, landlord_user):
+    economy, business = Category.objects.create(name='Эконом'), Category.objects.create(name='Бизнес')
+    rows = [
+        # (тип, город, комнаты, цена, категории)
+        ('apartment', 'Berlin', 1, 400, [economy]),
+        ('apartment', 'Berlin', 2, 900, [economy, business]),
+        ('apartment', 'Munich', 3, 1200, []),
+        ('house', 'Berlin', 6, 3500, [business]),
+        ('house', 'Munich', 5, 2500, [business]),
+        ('studio', 'Berlin', 1, 700, [economy]),
+    ]
+    for i, (property_type, location, room_count, price, categories) in enumerate(rows):
+        prop = Property.objects.create(
+            title=f'Объект {i}', description='Светлая квартира' if i % 2 else 'Описание', location=location,
+            price=price, room_count=room_count, property_type=property_type, owner=landlord_user,
+        )
+        prop.categories.set(categories)
+    return economy, business
+
+
+def facet(data, name, key='value'):
+    return {item[key]: item['count'] for item in data[name]}
+
+
+@pytest.mark.django_db
+def test_facets_without_filters(api_client, catalog):
+    economy, business = catalog
+    response = api_client.get(reverse('api:properties-facets'))
+
+    assert response.status_code == status.HTTP_200_OK
+    data = response.data
+    assert data['count'] == 6
+    assert facet(data, 'property_type') == {'apartment': 3, 'house': 2, 'studio': 1}
+    assert data['location'] == [{'value': 'Berlin', 'count': 4}, {'value': 'Munich', 'count': 2}]
+    assert facet(data, 'room_count') == {'1': 2, '2': 1, '3': 1, '5+': 2}
+    assert [(item['min'], item['max'], item['count']) for item in data['price']] == [
+        (None, 500, 1), (500, 1000, 2), (1000, 1500, 1), (1500, 2000, 0), (2000, 3000, 1), (3000, None, 1),
+    ]
+    assert facet(data, 'categories', 'name') == {'Эконом': 3, 'Бизнес': 3}
+
+
+@pytest.mark.django_db
+def test_facet_ignores_only_its_own_filter(api_client, catalog):
+    data = api_client.get(reverse('api:properties-facets'), {'property_type': 'apartment', 'location': 'Berlin'}).data
+
+    assert data['count'] == 2
+    # Типы — среди объектов в Berlin, города — среди квартир
+    assert facet(data, 'property_type') == {'apartment': 2, 'house': 1, 'studio': 1}
+    assert facet(data, 'location') == {'Berlin': 2, 'Munich': 1}
+    assert facet(data, 'room_count') == {'1': 1, '2': 1}
+    assert facet(data, 'categories', 'name') == {'Эконом': 2, 'Бизнес': 1}
+
+
+@pytest.mark.django_db
+def test_location_facet_matches_like_database_collation(api_client, catalog):
+    # Как location=... на MySQL (*_ci/*_ai): без учета регистра, диакритики и пробелов в конце
+    for location in ('berlin ', 'BÉRLIN'):
+        data = api_client.get(reverse('api:properties-facets'), {'location': location}).data
+        assert data['count'] == 4
+        assert facet(data, 'location') == {'Berlin': 4, 'Munich': 2}
+
+
+@pytest.mark.django_db
+def test_category_facet_ignores_its_own_filter(api_client, landlord_user):
+    first, second = Category.objects.create(name='A'), Category.objects.create(name='B')
+    for i, categories in enumerate([[first], [second], [second]]):
+        prop = Property.objects.create(
+            title=f'Объект {i}', description='Описание', location='Berlin', price=1000,
+            room_count=2, property_type='apartment', owner=landlord_user,
+        )
+        prop.categories.set(categories)
+
+    data = api_client.get(reverse('api:properties-facets'), {'categories': first.pk}).data
+
+    assert data['count'] == 1
+    assert facet(data, 'categories', 'name') == {'A': 1, 'B': 2}
+    assert facet(data, 'location') == {'Berlin': 1}
+
+
+@pytest.mark.django_db
+def test_facets_apply_other_filters(api_client, catalog):
+    url = reverse('api:properties-facets')
+
+    data = api_client.get(url, {'price__lte': 1000, 'room_count__gte': 2}).data
+    assert data['count'] == 1
+    assert facet(data, 'room_count') == {'1': 2, '2': 1}
+    assert facet(data, 'property_type') == {'apartment': 1, 'house': 0, 'studio': 0}
+
+    data = api_client.get(url, {'search': 'светлая'}).data
+    assert data['count'] == 3
+
+
+@pytest.mark.django_db
+def test_facet_switches_reuse_groups(api_client, catalog):
+    url = reverse('api:properties-facets')
+    api_client.get(url, {'price__lte': 3000})
+
+    with CaptureQueriesContext(connection) as queries:
+        data = api_client.get(url, {'price__lte': 3000, 'property_type': 'house'}).data
+    assert data['count'] == 1
+    assert len(queries) == 0
+
+
+@pytest.mark.django_db
+def test_facets_follow_property_changes(api_client, catalog, landlord_user, django_capture_on_commit_callbacks):
+    url = reverse('api:properties-facets')
+    assert api_client.get(url).data['count'] == 6
+    with django_capture_on_commit_callbacks(execute=True):
+        Property.objects.create(
+            title='Новый', description='Описание', location='Hamburg', price=800, room_count=2,
+            property_type='studio', owner=landlord_user,
+        )
+    data = api_client.get(url).data
+    assert data['count'] == 7
+    assert facet(data, 'location')['Hamburg'] == 1
+
+
+@pytest.mark.django_db
+def test_facets_reject_invalid_filters(api_client, catalog):
+    response = api_client.get(reverse('api:properties-facets'), {'room_count__gte': 'много'})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
@@ -0,0 +1,136 @@
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework import status
+from listing import geo
+from listing.models import Property
+
+# Берлин: Александерплац, Потсдамская площадь, Шпандау; Потсдам; Гамбург
+PLACES = {
+    'Alexanderplatz': (52.5219, 13.4132),
+    'Potsdamer Platz': (52.5096, 13.3760),
+    'Spandau': (52.5356, 13.1990),
+    'Potsdam': (52.3906, 13.0645),
+    'Hamburg': (53.5511, 9.9937),
+}
+ALEXANDERPLATZ = '52.5219,13.4132'
+
+
+@pytest.fixture
+def places(db, landlord_user):
+    return {
+        title: Property.objects.create(
+            title=title, description='Описание', location='Berlin', price=1000, room_count=2,
+            property_type='apartment', owner=landlord_user, latitude=latitude, longitude=longitude,
+        )
+        for title, (latitude, longitude) in PLACES.items()
+    }
+
+
+def titles(response):
+    return [item['title'] for item in response.data]
+
+
+@pytest.mark.django_db
+def test_near_returns_properties_in_radius_by_distance(api_client, places, landlord_user):
+    # Объекты без координат в поиск по расстоянию не попадают
+    Property.objects.create(
+        title='Без координат', description='Описание', location='Berlin', price=1000, room_count=2,
+        property_type='apartment', owner=landlord_user,
+    )
+    response = api_client.get(reverse('api:properties-list'), {'near': ALEXANDERPLATZ, 'radius_km': 30})
+
+    assert response.status_code == status.HTTP_200_OK
+    assert titles(response) == ['Alexanderplatz', 'Potsdamer Platz', 'Spandau', 'Potsdam']
+    assert response.data[0]['distance'] == pytest.approx(0, abs=0.01)
+    # Потсдамская площадь примерно в 2.9 км от Александерплац
+    assert response.data[1]['distance'] == pytest.approx(2.9, abs=0.1)
+    assert 'geo_cell' not in response.data[0]
+
+
+@pytest.mark.django_db
+def test_near_with_explicit_ordering_and_cursor(api_client, places):
+    places['Spandau'].price = 500
+    places['Spandau'].save(update_fields=['price'])
+    url = reverse('api:properties-list')
+
+    response = api_client.get(url, {'near': ALEXANDERPLATZ, 'radius_km': 20, 'ordering': 'price'})
+    assert titles(response)[0] == 'Spandau'
+    assert sorted(titles(response)) == ['Alexanderplatz', 'Potsdamer Platz', 'Spandau']
+
+    first = api_client.get(url, {'near': ALEXANDERPLATZ, 'radius_km': 30, 'page_size': 2}).data
+    second = api_client.get(first['next']).data
+    assert [item['title'] for item in first['results'] + second['results']] == [
+        'Alexanderplatz', 'Potsdamer Platz', 'Spandau', 'Potsdam',
+    ]
+
+
+@pytest.mark.django_db
+def test_bbox(api_client, places):
+    response = api_client.get(reverse('api:properties-list'), {'bbox': '52.45,13.3,52.6,13.5', 'ordering': 'price'})
+    assert sorted(titles(response)) == ['Alexanderplatz', 'Potsdamer Platz']
+
+
+@pytest.mark.django_db
+def test_bbox_across_antimeridian(api_client, landlord_user):
+    for title, longitude in (('Фиджи', 179.9), ('Самоа', -179.9), ('Гринвич', 0)):
+        Property.objects.create(
+            title=title, description='Описание', location='Ocean', price=1000, room_count=2,
+            property_type='house', owner=landlord_user, latitude=-17, longitude=longitude,
+        )
+    response = api_client.get(reverse('api:properties-list'), {'bbox': '-18,179,-16,-179'})
+    assert sorted(titles(response)) == ['Самоа', 'Фиджи']
+
+    response = api_client.get(reverse('api:properties-list'), {'near': '-17,179.95', 'radius_km': 20})
+    assert titles(response) == ['Фиджи', 'Самоа']
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('params', [
+    {'near': '52.5'},
+    {'near': '52.5,13.4'},
+    {'near': '95,13.4', 'radius_km': 5},
+    {'near': '52.5,13.4', 'radius_km': 100000},
+    {'radius_km': 5},
+    {'bbox': '52.6,13.3,52.4,13.5'},
+    {'ordering': 'distance'},
+])
+def test_invalid_geo_params(api_client, places, params):
+    response = api_client.get(reverse('api:properties-list'), params)
+    if 'ordering' in params:
+        # Без ?near= сортировка по расстоянию просто игнорируется
+        assert response.status_code == status.HTTP_200_OK
+    else:
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db
+def test_cell_follows_coordinates(api_client, places, landlord_user):
+    prop = places['Hamburg']
+    prop.latitude, prop.longitude = PLACES['Potsdamer Platz']
+    prop.save(update_fields=['latitude', 'longitude'])
+    prop.refresh_from_db()
+    assert prop.geo_cell == geo.cell_of(*PLACES['Potsdamer Platz'])
+
+    api_client.force_authenticate(user=landlord_user)
+    response = api_client.post(reverse('api:properties-bulk'), [
+        {'id': places['Potsdam'].pk, 'latitude': 52.52, 'longitude': 13.41},
+        {'title': 'Новый', 'description': 'Описание', 'location': 'Berlin', 'price': '900.00',
+         'room_count': 1, 'property_type': 'studio', 'latitude': 52.51, 'longitude': 13.40},
+    ], format='json')
+    assert response.status_code == status.HTTP_201_CREATED
+    api_client.force_authenticate(user=None)
+    response = api_client.get(reverse('api:properties-list'), {'near': ALEXANDERPLATZ, 'radius_km': 5})
+    assert set(titles(response)) == {'Alexanderplatz', 'Potsdamer Platz', 'Hamburg', 'Potsdam', 'Новый'}
+
+
+@pytest.mark.django_db
+def test_rebuild_after_cell_size_change(places, settings):
+    settings.GEO = {**settings.GEO, 'CELL_DEGREES': 1.0}
+    call_command('rebuild_geo_index', stdout=StringIO())
+
+    prop = Property.objects.get(title='Hamburg')
+    assert prop.geo_cell == geo.cell_of(*PLACES['Hamburg'])
+    assert len(Property.objects.filter(geo.BoundingBox.around(52.52, 13.41, 40).condition())) == 4
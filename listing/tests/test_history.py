@@ -0,0 +1,87 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from listing.history import HistoryBuffer, search_history_buffer, view_history_buffer
+from listing.metrics import registry
+from listing.models import Property, SearchHistory, ViewHistory
+
+
+@pytest.fixture
+def deferred_history(settings):
+    settings.HISTORY_BUFFER = {'MAX_SIZE': 100, 'FLUSH_INTERVAL': 0}
+    yield
+    search_history_buffer.flush()
+    view_history_buffer.flush()
+
+
+@pytest.mark.django_db
+def test_buffer_flushes_on_size_threshold(tenant_user):
+    buffer = HistoryBuffer(SearchHistory, 'test_history', max_size=3, flush_interval=0)
+
+    buffer.add(user_id=tenant_user.pk, keyword='Berlin')
+    buffer.add(user_id=tenant_user.pk, keyword='Munich')
+    assert buffer.depth() == 2
+    assert registry.snapshot()['gauges']['test_history.buffer_depth'] == 2
+    assert not SearchHistory.objects.exists()
+
+    buffer.add(user_id=tenant_user.pk, keyword='Hamburg')
+    assert buffer.depth() == 0
+    assert SearchHistory.objects.filter(user=tenant_user).count() == 3
+    assert registry.snapshot()['timers']['test_history.flush_latency']['count'] >= 1
+
+
+@pytest.mark.django_db(transaction=True)
+def test_flush_keeps_rows_when_property_was_deleted(tenant_user, landlord_property):
+    deleted = Property.objects.create(
+        title='Deleted', description='Description', location='Berlin', price=1000,
+        room_count=1, property_type='apartment', owner=landlord_property.owner,
+    )
+    buffer = HistoryBuffer(ViewHistory, 'test_view_history', max_size=100, flush_interval=0)
+    buffer.add(user_id=tenant_user.pk, property_id=landlord_property.pk)
+    buffer.add(user_id=tenant_user.pk, property_id=deleted.pk)
+    buffer.add(user_id=tenant_user.pk, property_id=landlord_property.pk)
+    deleted.delete()
+    registry.reset()
+
+    assert buffer.flush() == 2
+    assert ViewHistory.objects.filter(property=landlord_property).count() == 2
+    assert registry.value('test_view_history.dropped') == 1
+
+
+@pytest.mark.django_db
+def test_retrieve_does_not_write_history_on_request_path(api_client, tenant_user, landlord_property, deferred_history):
+    api_client.force_authenticate(user=tenant_user)
+    url = reverse('api:properties-detail', kwargs={'pk': landlord_property.pk})
+
+    with CaptureQueriesContext(connection) as context:
+        response = api_client.get(url)
+
+    assert response.status_code == status.HTTP_200_OK
+    assert not any(query['sql'].startswith('INSERT') for query in context.captured_queries)
+    assert len(context) == 2
+
+    assert view_history_buffer.flush() == 1
+    assert ViewHistory.objects.filter(user=tenant_user, property=landlord_property).count() == 1
+
+
+@pytest.mark.django_db
+def test_search_history_is_buffered(api_client, tenant_user, deferred_history):
+    api_client.force_authenticate(user=tenant_user)
+    api_client.get(reverse('api:properties-list'), {'search': 'Berlin'})
+    assert not SearchHistory.objects.exists()
+
+    search_history_buffer.flush()
+    assert SearchHistory.objects.filter(user=tenant_user, keyword='Berlin').count() == 1
+
+
+@pytest.mark.django_db
+def test_metrics_are_staff_only(api_client, tenant_user):
+    api_client.force_authenticate(user=tenant_user)
+    assert api_client.get(reverse('api:metrics')).status_code == status.HTTP_403_FORBIDDEN
+
+    tenant_user.is_staff = True
+    response = api_client.get(reverse('api:metrics'))
+    assert response.status_code == status.HTTP_200_OK
+    assert 'view_history.buffer_depth' in response.data['gauges']
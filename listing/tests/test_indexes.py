@@ -0,0 +1,79 @@
+import pytest
+from django.db import connections
+from listing.models import Category, Notification, Property, SearchHistory, User, ViewHistory
+
+LOCATIONS = ['Berlin', 'Munich', 'Hamburg', 'Cologne', 'Frankfurt']
+PROPERTY_TYPES = ['apartment', 'house', 'studio']
+ALIAS = 'indexes'
+
+
+@pytest.fixture(scope='module')
+def seeded(django_db_blocker):
+    """
+    Отдельная SQLite-база в памяти со схемой моделей и данными: планы запросов
+    (EXPLAIN QUERY PLAN) проверяются на ней при любой базе проекта.
+    """
+    connections.settings[ALIAS] = connections.configure_settings({
+        'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'}
+    })['default']
+    with django_db_blocker.unblock():
+        connection = connections[ALIAS]
+        with connection.schema_editor() as editor:
+            for model in (User, Category, Property, Notification, SearchHistory, ViewHistory):
+                editor.create_model(model)
+
+        landlord, tenant = User.objects.using(ALIAS).bulk_create([
+            User(username='landlord', role='landlord'), User(username='tenant', role='tenant')
+        ])
+        prop, *_ = Property.objects.using(ALIAS).bulk_create([
+            Property(
+                title=f'Property {i}',
+                description='Description',
+                location=LOCATIONS[i % len(LOCATIONS)],
+                price=500 + i * 10,
+                room_count=1 + i % 5,
+                property_type=PROPERTY_TYPES[i % len(PROPERTY_TYPES)],
+                owner=landlord
+            )
+            for i in range(300)
+        ])
+        for user in (landlord, tenant):
+            Notification.objects.using(ALIAS).bulk_create([
+                Notification(recipient=user, event_type='new_review', content='...') for _ in range(50)
+            ])
+            SearchHistory.objects.using(ALIAS).bulk_create([SearchHistory(user=user, keyword='Berlin') for _ in range(50)])
+            ViewHistory.objects.using(ALIAS).bulk_create([ViewHistory(user=user, property=prop) for _ in range(50)])
+        yield connection, tenant
+        connection.close()
+    del connections[ALIAS]
+    del connections.settings[ALIAS]
+
+
+def query_plan(connection, queryset):
+    sql, params = queryset.query.get_compiler(connection=connection).as_sql()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+        return ' '.join(row[-1] for row in cursor.fetchall())
+
+
+@pytest.mark.parametrize('build_queryset, index_name', [
+    (lambda user: Property.objects.order_by('-created_at', '-id')[:20],
+     'property_created_id_idx'),
+    (lambda user: Property.objects.filter(location='Berlin').order_by('-created_at', '-id')[:20],
+     'property_location_created_idx'),
+    (lambda user: Property.objects.filter(property_type='house', price__gte=1000, price__lte=2000),
+     'property_type_price_idx'),
+    (lambda user: Property.objects.order_by('price', 'id')[:20],
+     'property_price_id_idx'),
+    (lambda user: Notification.objects.filter(recipient=user).order_by('-created_at', '-id')[:20],
+     'notification_recipient_idx'),
+    (lambda user: SearchHistory.objects.filter(user=user).order_by('-created_at', '-id')[:20],
+     'searchhistory_user_created_idx'),
+    (lambda user: ViewHistory.objects.filter(user=user).order_by('-created_at', '-id')[:20],
+     'viewhistory_user_created_idx'),
+])
+def test_query_uses_index(seeded, build_queryset, index_name):
+    connection, user = seeded
+    plan = query_plan(connection, build_queryset(user))
+    assert index_name in plan
+    assert 'USE TEMP B-TREE FOR ORDER BY' not in plan
@@ -1,8 +1,15 @@
+import threading
+import time
+
 import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
+from listing.metrics import registry
 from listing.models import Notification
-from listing.models import Property, Booking, Review, Notification
+from listing.models import Booking, Review, Notification
+from listing.notifications import NotificationEvent, deliver, mark_read, unread_count
 
 
 @pytest.mark.django_db
@@ -22,3 +29,154 @@ def test_review_notification_created(api_client, landlord_user, tenant_user, sam
     api_client.post(url, data)
     notification = Notification.objects.filter(recipient=landlord_user, event_type='new_review')
     assert notification.count() == 1
+
+
+@pytest.mark.django_db
+def test_notifications_are_delivered_after_commit(api_client, landlord_user, tenant_user, landlord_property,
+                                                  django_capture_on_commit_callbacks):
+    api_client.force_authenticate(user=tenant_user)
+    data = {'property': landlord_property.id, 'start_date': '2025-03-01', 'end_date': '2025-03-05'}
+
+    with django_capture_on_commit_callbacks() as callbacks:
+        response = api_client.post(reverse('api:booking-detail-list'), data)
+    assert response.status_code == status.HTTP_201_CREATED
+    # Запрос не создает уведомления сам
+    assert not Notification.objects.exists()
+
+    for callback in callbacks:
+        callback()
+    notification = Notification.objects.get(recipient=landlord_user)
+    assert notification.event_type == 'booking_created'
+    assert notification.content == 'New booking created by tenant for property Sample Property.'
+    assert notification.related_object_id == response.data['id']
+
+
+@pytest.mark.django_db
+def test_events_are_delivered_in_batches(landlord_user, tenant_user, landlord_property):
+    bookings = [
+        Booking.objects.create(property=landlord_property, user=tenant_user,
+                               start_date=f'2025-0{month}-01', end_date=f'2025-0{month}-05')
+        for month in range(1, 4)
+    ]
+    review = Review.objects.create(property=landlord_property, user=tenant_user, rating=5, comment='Great')
+    now = time.monotonic()
+    events = [NotificationEvent('booking_created', booking.pk, {}, now) for booking in bookings]
+    events += [
+        NotificationEvent('booking_status_changed', bookings[0].pk, {'status': 'confirmed'}, now),
+        NotificationEvent('new_review', review.pk, {}, now),
+    ]
+    registry.reset()
+
+    # Один запрос на каждый тип события и одна вставка уведомлений
+    with CaptureQueriesContext(connection) as queries:
+        assert deliver(events) == 5
+    statements = [query['sql'] for query in queries]
+    assert len([sql for sql in statements if sql.startswith('SELECT')]) == 3
+    inserts = [sql for sql in statements if sql.startswith('INSERT') and 'listing_notificationcounter' not in sql]
+    assert len(inserts) == 1
+
+    assert Notification.objects.filter(recipient=landlord_user).count() == 4
+    assert Notification.objects.get(recipient=tenant_user).content == \
+        'Booking status changed to confirmed for property Sample Property.'
+    timers = registry.snapshot()['timers']
+    assert {'notifications.queue_wait', 'notifications.load', 'notifications.render', 'notifications.store'} <= set(timers)
+
+
+def unread_of(user):
+    return Notification.objects.filter(recipient=user, is_read=False).count()
+
+
+@pytest.mark.django_db
+def test_unread_count_and_mark_read(api_client, landlord_user, tenant_user):
+    notifications = [
+        Notification.objects.create(recipient=landlord_user, event_type='new_review', content=f'Review {i}')
+        for i in range(5)
+    ]
+    other = Notification.objects.create(recipient=tenant_user, event_type='new_review', content='Other')
+    api_client.force_authenticate(user=landlord_user)
+
+    with CaptureQueriesContext(connection) as queries:
+        response = api_client.get(reverse('api:notification-unread-count'))
+    assert response.data == {'unread': 5}
+    assert not any('COUNT(' in query['sql'] for query in queries)
+
+    url = reverse('api:notification-mark-read')
+    response = api_client.post(url, {'ids': [notifications[0].pk, notifications[1].pk, other.pk]}, format='json')
+    assert response.data == {'marked': 2, 'unread': 3}
+
+    # Повторная отметка не уменьшает счетчик
+    response = api_client.post(url, {'up_to_id': notifications[3].pk}, format='json')
+    assert response.data == {'marked': 2, 'unread': 1}
+    assert unread_of(landlord_user) == 1
+    assert unread_of(tenant_user) == 1
+
+    notifications[4].delete()
+    assert api_client.get(reverse('api:notification-unread-count')).data == {'unread': 0}
+
+    response = api_client.post(url, {'ids': [1], 'up_to_id': 1}, format='json')
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db
+def test_unread_counter_follows_saved_changes(landlord_user, tenant_user):
+    notification = Notification.objects.create(recipient=landlord_user, event_type='new_review', content='Review')
+    assert unread_count(landlord_user) == 1
+
+    notification.is_read = True
+    notification.save()
+    assert unread_count(landlord_user) == 0
+    notification.save()
+    assert unread_count(landlord_user) == 0
+
+    notification.is_read = False
+    notification.save(update_fields=['is_read'])
+    assert unread_count(landlord_user) == 1
+
+    notification.recipient = tenant_user
+    notification.save()
+    assert (unread_count(landlord_user), unread_count(tenant_user)) == (0, 1)
+
+    notification.content = 'Updated'
+    notification.save(update_fields=['content'])
+    assert unread_of(tenant_user) == unread_count(tenant_user) == 1
+
+
+@pytest.mark.skipif(
+    connection.vendor == 'sqlite',
+    reason='SQLite блокирует всю базу на запись: параллельные транзакции проверяются на MySQL/PostgreSQL',
+)
+@pytest.mark.django_db(transaction=True)
+def test_unread_counter_is_consistent_under_concurrency(landlord_user, tenant_user, landlord_property):
+    booking = Booking.objects.create(property=landlord_property, user=tenant_user,
+                                     start_date='2025-03-01', end_date='2025-03-05')
+    errors = []
+
+    def insert():
+        try:
+            for _ in range(20):
+                deliver([NotificationEvent('booking_created', booking.pk, {}, time.monotonic())] * 3)
+        except Exception as exc:  # pragma: no cover - сообщение попадет в assert ниже
+            errors.append(exc)
+        finally:
+            connection.close()
+
+    def read():
+        try:
+            for _ in range(20):
+                last = Notification.objects.filter(recipient=landlord_user).order_by('-pk').values_list('pk', flat=True).first()
+                if last:
+                    mark_read(landlord_user, up_to_id=last)
+        except Exception as exc:  # pragma: no cover
+            errors.append(exc)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=insert) for _ in range(4)] + [threading.Thread(target=read) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    assert Notification.objects.filter(recipient=landlord_user).count() == 240
+    assert unread_count(landlord_user) == unread_of(landlord_user)
@@ -0,0 +1,70 @@
+import pytest
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from listing.models import Property, Notification
+
+
+@pytest.fixture
+def properties(db, landlord_user):
+    objects = [
+        Property.objects.create(
+            title=f'Property {i}',
+            description='Description',
+            location='Berlin',
+            price=1000 + (i % 3) * 100,
+            room_count=2,
+            property_type='apartment',
+            owner=landlord_user
+        )
+        for i in range(7)
+    ]
+    # Одинаковая дата создания — порядок страниц должен держаться на `id`
+    Property.objects.update(created_at=timezone.now())
+    return objects
+
+
+def collect_pages(api_client, url, params):
+    ids = []
+    response = api_client.get(url, params)
+    while True:
+        assert response.status_code == status.HTTP_200_OK
+        ids.extend(item['id'] for item in response.data['results'])
+        if not response.data['next']:
+            return ids
+        response = api_client.get(response.data['next'])
+
+
+@pytest.mark.django_db
+def test_property_list_is_not_paginated_by_default(api_client, properties):
+    response = api_client.get(reverse('api:properties-list'))
+    assert response.status_code == status.HTTP_200_OK
+    assert len(response.data) == len(properties)
+
+
+@pytest.mark.django_db
+def test_property_pages_are_stable_with_equal_created_at(api_client, properties):
+    ids = collect_pages(api_client, reverse('api:properties-list'), {'page_size': 2})
+    assert ids == sorted((p.id for p in properties), reverse=True)
+
+
+@pytest.mark.django_db
+def test_property_pages_follow_ordering_param(api_client, properties):
+    ids = collect_pages(api_client, reverse('api:properties-list'), {'page_size': 3, 'ordering': 'price'})
+    expected = sorted(properties, key=lambda p: (p.price, p.id))
+    assert ids == [p.id for p in expected]
+
+
+@pytest.mark.django_db
+def test_invalid_cursor_returns_404(api_client, properties):
+    response = api_client.get(reverse('api:properties-list'), {'cursor': 'garbage'})
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.django_db
+def test_notifications_are_paginated(api_client, tenant_user):
+    for i in range(5):
+        Notification.objects.create(recipient=tenant_user, event_type='new_review', content=f'#{i}')
+    api_client.force_authenticate(user=tenant_user)
+    ids = collect_pages(api_client, reverse('api:notification-list'), {'page_size': 2})
+    assert ids == list(Notification.objects.order_by('-created_at', '-id').values_list('id', flat=True))
@@ -0,0 +1,130 @@
+from datetime import date, timedelta
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+from listing.models import Booking, PopularityWatermark, Property, PropertyPopularity, SearchHistory, ViewHistory
+from listing.popularity import decayed, rebuild_popularity, update_popularity
+
+NOW = timezone.now()
+
+
+@pytest.fixture
+def properties(db, landlord_user):
+    return [
+        Property.objects.create(
+            title=title, description='Описание', location='Berlin', price=1000,
+            room_count=2, property_type='apartment', owner=landlord_user,
+        )
+        for title in ('Квартира у парка', 'Дом у озера', 'Студия в центре')
+    ]
+
+
+def record(model, days_ago, **fields):
+    obj = model.objects.create(**fields)
+    model.objects.filter(pk=obj.pk).update(created_at=NOW - timedelta(days=days_ago))
+    return obj
+
+
+def view(prop, user, days_ago):
+    return record(ViewHistory, days_ago, property=prop, user=user)
+
+
+def scores():
+    return {
+        popularity.property_id: decayed(popularity.score, NOW)
+        for popularity in PropertyPopularity.objects.all()
+    }
+
+
+@pytest.mark.django_db
+def test_score_decays_with_half_life(properties, tenant_user, settings):
+    settings.POPULARITY = {**settings.POPULARITY, 'HALF_LIFE_DAYS': 7.0}
+    view(properties[0], tenant_user, days_ago=0)
+    for _ in range(3):
+        view(properties[1], tenant_user, days_ago=14)
+
+    assert update_popularity(now=NOW + timedelta(hours=1))['views'] == 4
+    result = scores()
+    # Свежий просмотр весит ~1, три просмотра двухнедельной давности — 3 / 4
+    assert result[properties[0].pk] == pytest.approx(1, rel=0.01)
+    assert result[properties[1].pk] == pytest.approx(0.75, rel=0.01)
+    assert properties[2].pk not in result
+
+
+@pytest.mark.django_db
+def test_update_is_incremental_and_matches_rebuild(properties, tenant_user):
+    for days_ago in (10, 5, 1):
+        view(properties[0], tenant_user, days_ago)
+    update_popularity(chunk_size=2, now=NOW)
+
+    view(properties[0], tenant_user, days_ago=0.5)
+    view(properties[1], tenant_user, days_ago=0.5)
+    processed = update_popularity(chunk_size=2, now=NOW)
+    assert processed['views'] == 2
+    incremental = scores()
+
+    rebuild_popularity(now=NOW)
+    assert scores() == pytest.approx(incremental)
+
+
+@pytest.mark.django_db
+def test_chunks_split_rows_with_equal_timestamps(properties, tenant_user):
+    for _ in range(5):
+        view(properties[0], tenant_user, days_ago=1)
+
+    assert update_popularity(chunk_size=2, now=NOW)['views'] == 5
+    assert update_popularity(chunk_size=2, now=NOW)['views'] == 0
+    assert scores()[properties[0].pk] == pytest.approx(5 * 2 ** (-1 / 7), rel=0.01)
+
+
+@pytest.mark.django_db
+def test_recent_rows_wait_for_lag(properties, tenant_user, settings):
+    settings.POPULARITY = {**settings.POPULARITY, 'LAG_SECONDS': 3600}
+    view(properties[0], tenant_user, days_ago=0)
+
+    assert update_popularity(now=NOW)['views'] == 0
+    assert update_popularity(now=NOW + timedelta(hours=2))['views'] == 1
+    assert PopularityWatermark.objects.get(source='views').last_id == ViewHistory.objects.get().pk
+
+
+@pytest.mark.django_db
+def test_searches_and_bookings_contribute(properties, tenant_user, settings):
+    settings.POPULARITY = {**settings.POPULARITY, 'WEIGHTS': {'views': 1.0, 'searches': 0.5, 'bookings': 5.0}}
+    record(SearchHistory, 0, user=tenant_user, keyword='озера')
+    record(Booking, 0, property=properties[2], user=tenant_user,
+           start_date=date(2025, 1, 1), end_date=date(2025, 1, 5))
+
+    processed = update_popularity(now=NOW + timedelta(hours=1))
+    assert processed == {'views': 0, 'searches': 1, 'bookings': 1}
+    result = scores()
+    assert result[properties[1].pk] == pytest.approx(0.5, rel=0.01)
+    assert result[properties[2].pk] == pytest.approx(5, rel=0.01)
+
+
+@pytest.mark.django_db
+def test_ordering_by_trending(api_client, properties, tenant_user):
+    view(properties[2], tenant_user, days_ago=0.1)
+    view(properties[2], tenant_user, days_ago=0.1)
+    view(properties[0], tenant_user, days_ago=0.1)
+    call_command('compute_trending', stdout=StringIO())
+    url = reverse('api:properties-list')
+
+    response = api_client.get(url, {'ordering': '-trending'})
+    assert [item['title'] for item in response.data] == ['Студия в центре', 'Квартира у парка', 'Дом у озера']
+
+    first = api_client.get(url, {'ordering': '-trending', 'page_size': 2}).data
+    second = api_client.get(first['next']).data
+    assert [item['title'] for item in first['results'] + second['results']] == [
+        'Студия в центре', 'Квартира у парка', 'Дом у озера',
+    ]
+
+
+@pytest.mark.django_db
+def test_popularity_is_removed_with_property(properties, tenant_user):
+    view(properties[0], tenant_user, days_ago=0)
+    update_popularity(now=NOW + timedelta(hours=1))
+    properties[0].delete()
+    assert not PropertyPopularity.objects.exists()
@@ -0,0 +1,70 @@
+from datetime import date
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.utils import timezone
+from listing.models import (
+    Booking, PopularityWatermark, Property, PropertyPopularity, PropertySearchTerm, PropertySimilarity, Review, User,
+)
+
+
+def populate(seed=0):
+    call_command(
+        'populate_data', users=10, properties=50, bookings=300, reviews=40,
+        seed=seed, start_date=date(2025, 1, 1), chunk_size=16, stdout=StringIO()
+    )
+    return list(Property.objects.order_by('pk').values_list('title', 'location', 'price', 'owner__username'))
+
+
+@pytest.mark.django_db
+def test_populate_data_creates_requested_volume():
+    populate()
+
+    assert User.objects.filter(role='landlord').count() == 4
+    assert User.objects.filter(role='tenant').count() == 6
+    assert Property.objects.count() == 50
+    assert Booking.objects.count() == 300
+    assert Review.objects.count() == 40
+    assert Property.categories.through.objects.count() >= 50
+    # bulk_create не отправляет сигналы, индекс перестраивается командой
+    assert PropertySearchTerm.objects.filter(term='объект').count() == 50
+    assert sum(Property.objects.values_list('rating_count', flat=True)) == 40
+    assert User.objects.get(username='tenant1').check_password('password123')
+
+
+@pytest.mark.django_db
+def test_populate_data_is_deterministic_and_bookings_do_not_overlap():
+    first = populate(seed=7)
+    bookings = list(Booking.objects.order_by('property_id', 'start_date').values_list('property_id', 'start_date', 'end_date'))
+    for previous, current in zip(bookings, bookings[1:]):
+        if previous[0] == current[0]:
+            assert previous[2] <= current[1]
+
+    assert populate(seed=7) == first
+    assert populate(seed=8) != first
+
+
+@pytest.mark.django_db
+def test_populate_data_clears_popularity():
+    populate()
+    # Как после compute_trending: строки ссылаются на объекты, которые populate_data удалит
+    PropertyPopularity.objects.bulk_create([PropertyPopularity(property=prop, score=1.0, updated_at=timezone.now()) for prop in Property.objects.all()])
+    PopularityWatermark.objects.create(source='views', last_id=10 ** 9)
+
+    populate()
+
+    assert not PropertyPopularity.objects.exists()
+    assert not PopularityWatermark.objects.exists()
+
+
+@pytest.mark.django_db
+def test_populate_data_clears_similarity():
+    populate()
+    # Как после build_similarity
+    first, second = Property.objects.order_by('pk')[:2]
+    PropertySimilarity.objects.create(property=first, neighbor=second, score=0.5)
+
+    populate()
+
+    assert not PropertySimilarity.objects.exists()
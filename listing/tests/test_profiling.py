@@ -0,0 +1,139 @@
+from io import StringIO
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.management import call_command
+from django.test import AsyncClient
+from django.urls import reverse
+from rest_framework import status
+from listing.models import Category, Property
+from rest_framework import serializers
+from listing.profiling import PerfProfilingMiddleware, install, perf_buffer, query_stats, summarize, uninstall
+
+
+@pytest.fixture
+def profiling(settings):
+    settings.PERF_PROFILING = {**settings.PERF_PROFILING, 'ENABLED': True, 'PUBLISH_INTERVAL': 0, 'SAMPLE_RATE': 1.0}
+    settings.API_CACHE = {**settings.API_CACHE, 'TIMEOUT': 0}
+    perf_buffer.clear()
+    yield
+    perf_buffer.clear()
+
+
+@pytest.fixture
+def properties(db, landlord_user):
+    category = Category.objects.create(name='Эконом')
+    for i in range(3):
+        prop = Property.objects.create(
+            title=f'Квартира {i}', description='Описание', location='Berlin', price=1000,
+            room_count=2, property_type='apartment', owner=landlord_user,
+        )
+        prop.categories.add(category)
+
+
+def records_for(view):
+    return [record for record in perf_buffer.records() if record[1] == view]
+
+
+@pytest.mark.django_db
+def test_request_profile_is_recorded(api_client, profiling, properties):
+    response = api_client.get(reverse('api:properties-list'))
+    assert response.status_code == status.HTTP_200_OK
+
+    [(_, view, status_code, wall, db_time, queries, _, serializer_time, _)] = records_for('GET api:properties-list')
+    assert status_code == 200
+    assert queries >= 1
+    assert 0 < db_time < wall
+    assert 0 < serializer_time < wall
+
+
+@pytest.mark.django_db
+def test_async_view_queries_are_recorded(profiling, properties):
+    response = async_to_sync(AsyncClient().get)(reverse('api:async-properties-list'))
+    assert response.status_code == status.HTTP_200_OK
+
+    [record] = records_for('GET api:async-properties-list')
+    assert record[5] >= 1
+
+
+def test_query_stats_finds_repeated_templates():
+    item = 'SELECT * FROM "listing_review" WHERE "listing_review"."property_id" = %s'
+    queries = [(item, (pk,)) for pk in range(6)] + [(item, (1,))]
+    queries += [('SELECT 1 WHERE id IN (%s, %s)', (1, 2)), ('SELECT 1 WHERE id IN (%s, %s, %s)', [1, 2, 3])]
+
+    duplicates, repeated = query_stats(queries, threshold=5)
+
+    assert duplicates == 1
+    assert repeated == [(item, 7)]
+    assert query_stats(queries, threshold=10)[1] == []
+
+
+def test_summary_orders_views_by_p95():
+    records = [
+        (0, 'GET fast', 200, 0.01, 0.005, 2, 0, 0.001, []),
+        (0, 'GET slow', 200, 0.20, 0.150, 40, 30, 0.02, [('SELECT %s', 30)]),
+        (0, 'GET slow', 500, 0.30, 0.200, 41, 31, 0.02, [('SELECT %s', 31)]),
+    ]
+
+    slow, fast = summarize(records)
+
+    assert (slow['view'], slow['count'], slow['errors'], slow['queries']) == ('GET slow', 2, 1, 40.5)
+    assert slow['n_plus_one'] == [{'query': 'SELECT %s', 'requests': 2, 'max_repeats': 31}]
+    assert fast['view'] == 'GET fast'
+    assert [row['view'] for row in summarize(records, sort='count', limit=1)] == ['GET slow']
+
+
+def test_disabled_middleware_is_removed_from_chain(settings):
+    settings.PERF_PROFILING = {**settings.PERF_PROFILING, 'ENABLED': False}
+
+    with pytest.raises(MiddlewareNotUsed):
+        PerfProfilingMiddleware(lambda request: None)
+
+
+@pytest.mark.django_db
+def test_disabled_profiling_records_nothing(api_client, properties):
+    perf_buffer.clear()
+    api_client.get(reverse('api:properties-list'))
+
+    assert perf_buffer.records() == []
+
+
+@pytest.mark.django_db
+def test_perf_endpoint_is_staff_only(api_client, profiling, properties, tenant_user):
+    api_client.get(reverse('api:properties-list'))
+    api_client.force_authenticate(user=tenant_user)
+    assert api_client.get(reverse('api:perf')).status_code == status.HTTP_403_FORBIDDEN
+
+    tenant_user.is_staff = True
+    tenant_user.save()
+    response = api_client.get(reverse('api:perf'), {'sort': 'queries'})
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data['enabled'] is True
+    assert 'GET api:properties-list' in [row['view'] for row in response.data['views']]
+    # Запросы к самому эндпоинту не профилируются
+    assert not records_for('GET api:perf')
+    assert api_client.get(reverse('api:perf'), {'sort': 'name'}).status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db
+def test_perf_report_command(api_client, profiling, properties):
+    api_client.get(reverse('api:properties-list'))
+    perf_buffer.flush()
+    out = StringIO()
+
+    call_command('perf_report', '--sort', 'db_ms', stdout=out)
+
+    assert 'GET api:properties-list' in out.getvalue()
+
+
+def test_uninstall_restores_serializers():
+    uninstall()
+    original = serializers.Serializer.data, serializers.ListSerializer.data
+    install()
+    assert (serializers.Serializer.data, serializers.ListSerializer.data) != original
+
+    uninstall()
+
+    assert (serializers.Serializer.data, serializers.ListSerializer.data) == original
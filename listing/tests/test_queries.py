@@ -0,0 +1,68 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from listing.models import Property, Category, Review
+
+
+def create_properties(owner, tenant, count):
+    categories = [Category.objects.create(name=name) for name in ('Эконом', 'Бизнес')]
+    for i in range(count):
+        prop = Property.objects.create(
+            title=f'Property {i}',
+            description='Description',
+            location='Berlin',
+            price=1000,
+            room_count=2,
+            property_type='apartment',
+            owner=owner
+        )
+        prop.categories.add(*categories)
+        Review.objects.create(property=prop, user=tenant, rating=4, comment='Хорошо')
+        Review.objects.create(property=prop, user=tenant, rating=5, comment='Отлично')
+
+
+def count_queries(api_client, url, params=None):
+    with CaptureQueriesContext(connection) as context:
+        response = api_client.get(url, params)
+    assert response.status_code == status.HTTP_200_OK
+    return len(context), response
+
+
+@pytest.mark.django_db
+def test_property_list_query_count_does_not_depend_on_size(
+    api_client, landlord_user, tenant_user, django_capture_on_commit_callbacks
+):
+    url = reverse('api:properties-list')
+
+    create_properties(landlord_user, tenant_user, 2)
+    small, _ = count_queries(api_client, url)
+    with django_capture_on_commit_callbacks(execute=True):
+        create_properties(landlord_user, tenant_user, 10)
+    large, response = count_queries(api_client, url)
+
+    # Основной запрос (агрегаты отзывов — колонки объекта) + prefetch категорий
+    assert small == large == 2
+    assert len(response.data) == 12
+
+
+@pytest.mark.django_db
+def test_paginated_property_list_query_count(api_client, landlord_user, tenant_user):
+    create_properties(landlord_user, tenant_user, 10)
+    queries, response = count_queries(api_client, reverse('api:properties-list'), {'page_size': 5})
+    assert queries == 2
+    assert len(response.data['results']) == 5
+
+
+@pytest.mark.django_db
+def test_property_detail_includes_summary(api_client, landlord_user, tenant_user):
+    create_properties(landlord_user, tenant_user, 1)
+    prop = Property.objects.get()
+    queries, response = count_queries(api_client, reverse('api:properties-detail', kwargs={'pk': prop.pk}))
+
+    assert queries == 2
+    assert response.data['owner_summary'] == {'id': landlord_user.id, 'username': landlord_user.username}
+    assert response.data['review_count'] == 2
+    assert response.data['average_rating'] == 4.5
+    assert len(response.data['categories']) == 2
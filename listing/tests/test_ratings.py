@@ -0,0 +1,108 @@
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from listing.models import Property, Review
+
+
+@pytest.fixture
+def properties(db, landlord_user):
+    return [
+        Property.objects.create(
+            title=f'Квартира {i}', description='Описание', location='Berlin', price=1000 + i,
+            room_count=2, property_type='apartment', owner=landlord_user,
+        )
+        for i in range(3)
+    ]
+
+
+def ratings(prop):
+    prop.refresh_from_db()
+    return prop.rating_count, prop.rating_sum, prop.rating_avg
+
+
+@pytest.mark.django_db
+def test_rating_follows_review_create_update_and_delete(properties, tenant_user):
+    first, second = properties[:2]
+    review = Review.objects.create(property=first, user=tenant_user, rating=4, comment='Хорошо')
+    Review.objects.create(property=first, user=tenant_user, rating=5, comment='Отлично')
+    assert ratings(first) == (2, 9, 4.5)
+
+    review.rating = 1
+    review.save()
+    assert ratings(first) == (2, 6, 3.0)
+
+    review.property = second
+    review.save()
+    assert ratings(first) == (1, 5, 5.0)
+    assert ratings(second) == (1, 1, 1.0)
+
+    review.delete()
+    assert ratings(second) == (0, 0, 0.0)
+    Review.objects.filter(property=first).delete()
+    assert ratings(first) == (0, 0, 0.0)
+
+
+@pytest.mark.django_db
+def test_review_write_updates_rating_with_single_query(properties, tenant_user):
+    with CaptureQueriesContext(connection) as queries:
+        Review.objects.create(property=properties[0], user=tenant_user, rating=3, comment='Нормально')
+    updates = [query['sql'] for query in queries if query['sql'].startswith('UPDATE')]
+    assert len(updates) == 1
+
+
+@pytest.mark.django_db
+def test_recompute_ratings_repairs_drift(properties, tenant_user):
+    Review.objects.create(property=properties[0], user=tenant_user, rating=2, comment='Плохо')
+    # Записи в обход сигналов
+    Review.objects.bulk_create([
+        Review(property=properties[1], user=tenant_user, rating=rating, comment='Импорт') for rating in (3, 4)
+    ])
+    Property.objects.filter(pk=properties[2].pk).update(rating_count=7, rating_sum=30, rating_avg=4.3)
+
+    out = StringIO()
+    call_command('recompute_ratings', chunk_size=2, stdout=out)
+
+    assert 'Исправлено объектов: 2' in out.getvalue()
+    assert ratings(properties[0]) == (1, 2, 2.0)
+    assert ratings(properties[1]) == (2, 7, 3.5)
+    assert ratings(properties[2]) == (0, 0, 0.0)
+
+
+@pytest.mark.django_db
+def test_order_and_filter_by_rating(api_client, properties, tenant_user):
+    for prop, scores in zip(properties, [(5, 4), (2,), (5, 5)]):
+        for score in scores:
+            Review.objects.create(property=prop, user=tenant_user, rating=score, comment='Отзыв')
+    url = reverse('api:properties-list')
+
+    response = api_client.get(url, {'ordering': '-rating_avg'})
+    assert [item['title'] for item in response.data] == ['Квартира 2', 'Квартира 0', 'Квартира 1']
+    assert [item['average_rating'] for item in response.data] == [5.0, 4.5, 2.0]
+
+    response = api_client.get(url, {'min_rating': 4.5, 'ordering': 'rating_avg'})
+    assert [item['title'] for item in response.data] == ['Квартира 0', 'Квартира 2']
+
+
+@pytest.mark.django_db
+def test_rating_cursor_pagination(api_client, properties, tenant_user):
+    for prop, score in zip(properties, (3, 3, 4)):
+        Review.objects.create(property=prop, user=tenant_user, rating=score, comment='Отзыв')
+    url = reverse('api:properties-list')
+
+    first = api_client.get(url, {'ordering': '-rating_avg', 'page_size': 2}).data
+    second = api_client.get(first['next']).data
+    titles = [item['title'] for item in first['results'] + second['results']]
+    assert titles == ['Квартира 2', 'Квартира 1', 'Квартира 0']
+
+
+@pytest.mark.django_db
+def test_unrated_property_has_no_average(api_client, properties):
+    response = api_client.get(reverse('api:properties-detail', kwargs={'pk': properties[0].pk}))
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data['review_count'] == 0
+    assert response.data['average_rating'] is None
@@ -0,0 +1,107 @@
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework import status
+from listing.models import Property, PropertyPopularity, PropertySimilarity, User, ViewHistory
+from listing.recommendations import build_similarity, recommend
+
+
+@pytest.fixture
+def properties(db, landlord_user):
+    return [
+        Property.objects.create(
+            title=f'Объект {i}', description='Описание', location='Berlin', price=1000,
+            room_count=2, property_type='apartment', owner=landlord_user,
+        )
+        for i in range(5)
+    ]
+
+
+@pytest.fixture
+def viewers(db):
+    return [User.objects.create(username=f'viewer{i}', email=f'viewer{i}@example.com') for i in range(4)]
+
+
+def view(user, *props):
+    ViewHistory.objects.bulk_create([ViewHistory(user=user, property=prop) for prop in props])
+
+
+def neighbors(prop):
+    return dict(PropertySimilarity.objects.filter(property=prop).values_list('neighbor_id', 'score'))
+
+
+@pytest.mark.django_db
+def test_build_keeps_cosine_top_neighbors(properties, viewers, settings):
+    settings.RECOMMENDATIONS = {**settings.RECOMMENDATIONS, 'MIN_COVIEWS': 1, 'TOP_K': 2, 'BLOCK_SIZE': 2}
+    a, b, c, d, _ = properties
+    view(viewers[0], a, b, c)
+    view(viewers[1], a, b, b)
+    view(viewers[2], a, d)
+    view(viewers[3], b, c)
+
+    assert build_similarity() == (10, 7)
+    # У a и b по трое зрителей (повторный просмотр не считается), общих двое: 2 / sqrt(3 * 3).
+    # Из соседей a остаются два лучших: c (1 / sqrt(3 * 2)) отброшен
+    assert neighbors(a) == pytest.approx({b.pk: 2 / 3, d.pk: 1 / 3 ** 0.5})
+    assert neighbors(b) == pytest.approx({a.pk: 2 / 3, c.pk: 2 / 6 ** 0.5})
+    assert neighbors(d) == pytest.approx({a.pk: 1 / 3 ** 0.5})
+
+
+@pytest.mark.django_db
+def test_build_skips_rare_pairs_and_heavy_users(properties, viewers, settings):
+    settings.RECOMMENDATIONS = {**settings.RECOMMENDATIONS, 'MIN_COVIEWS': 2, 'MAX_USER_ITEMS': 3}
+    a, b, c, d, e = properties
+    view(viewers[0], a, b, c)
+    view(viewers[1], a, b)
+    view(viewers[2], a, b, c, d, e)
+
+    call_command('build_similarity', stdout=StringIO())
+    assert set(PropertySimilarity.objects.values_list('property_id', 'neighbor_id')) == {(a.pk, b.pk), (b.pk, a.pk)}
+
+
+@pytest.mark.django_db
+def test_recommend_merges_neighbors_of_recent_views(properties, viewers):
+    a, b, c, d, e = properties
+    PropertySimilarity.objects.bulk_create([
+        PropertySimilarity(property=a, neighbor=c, score=0.5),
+        PropertySimilarity(property=a, neighbor=b, score=0.9),
+        PropertySimilarity(property=b, neighbor=c, score=0.6),
+        PropertySimilarity(property=b, neighbor=d, score=0.3),
+    ])
+    view(viewers[0], a)
+    view(viewers[0], b)
+
+    # Просмотренные a и b не рекомендуются; c набирает 0.6 + 0.9 * 0.5
+    assert [prop.pk for prop in recommend(viewers[0].pk, 3)][:2] == [c.pk, d.pk]
+
+
+@pytest.mark.django_db
+def test_recommend_falls_back_to_popular(properties, viewers):
+    a, b, c, d, e = properties
+    e.status = 'inactive'
+    e.save()
+    for prop, score in ((b, 3), (e, 2), (c, 1), (a, 0)):
+        PropertyPopularity.objects.create(property=prop, score=score, updated_at=prop.created_at)
+    view(viewers[0], a)
+
+    assert [prop.pk for prop in recommend(viewers[0].pk, 3)] == [b.pk, c.pk]
+
+
+@pytest.mark.django_db
+def test_recommended_endpoint(api_client, properties, viewers):
+    a, b, c, _, _ = properties
+    PropertySimilarity.objects.bulk_create([
+        PropertySimilarity(property=a, neighbor=c, score=0.9),
+        PropertySimilarity(property=a, neighbor=b, score=0.4),
+    ])
+    view(viewers[0], a)
+    url = reverse('api:properties-recommended')
+
+    assert api_client.get(url).status_code == status.HTTP_401_UNAUTHORIZED
+    api_client.force_authenticate(user=viewers[0])
+    response = api_client.get(url, {'limit': 2})
+    assert response.status_code == status.HTTP_200_OK
+    assert [item['title'] for item in response.data] == ['Объект 2', 'Объект 1']
+    assert api_client.get(url, {'limit': 0}).status_code == status.HTTP_400_BAD_REQUEST
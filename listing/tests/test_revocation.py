@@ -0,0 +1,105 @@
+from datetime import timedelta
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+from listing.metrics import registry
+from listing.models import RevokedToken
+from listing.revocation import BloomFilter, RevocationList, revocation_list
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    items = [f'jti-{i}' for i in range(1000)]
+    for item in items:
+        bloom.add(item)
+
+    assert all(item in bloom for item in items)
+    false_positives = sum(f'other-{i}' in bloom for i in range(10000))
+    assert false_positives < 300
+
+
+@pytest.mark.django_db
+def test_valid_token_check_does_not_query_database(api_client, tenant_user):
+    revocation_list.refresh(force=True)
+    token = AccessToken.for_user(tenant_user)
+
+    with CaptureQueriesContext(connection) as queries:
+        assert not revocation_list.is_revoked(token['jti'])
+    assert len(queries) == 0
+
+
+@pytest.mark.django_db
+def test_false_positive_is_resolved_by_table(api_client, tenant_user):
+    registry.reset()
+    token = AccessToken.for_user(tenant_user)
+    revocation_list.refresh(force=True)
+    # Имитируем ложноположительное срабатывание фильтра
+    revocation_list._bloom.add(token['jti'])
+
+    response = api_client.get(reverse('api:notification-list'), HTTP_AUTHORIZATION=f'Bearer {token}')
+    assert response.status_code == status.HTTP_200_OK
+    assert registry.value('revocation.false_positives') == 1
+
+
+@pytest.mark.django_db
+def test_revoked_access_token_is_rejected(api_client, tenant_user):
+    token = AccessToken.for_user(tenant_user)
+    revocation_list.revoke_token(token)
+
+    response = api_client.get(reverse('api:notification-list'), HTTP_AUTHORIZATION=f'Bearer {token}')
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+    response = api_client.post(reverse('api:token_verify'), {'token': str(token)})
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+@pytest.mark.django_db
+def test_rotation_revokes_previous_refresh_token(api_client, tenant_user):
+    url = reverse('api:token_refresh')
+    refresh = str(RefreshToken.for_user(tenant_user))
+
+    response = api_client.post(url, {'refresh': refresh})
+    assert response.status_code == status.HTTP_200_OK
+    rotated = response.data['refresh']
+
+    # Повторное использование старого токена отклоняется, новый работает
+    assert api_client.post(url, {'refresh': refresh}).status_code == status.HTTP_401_UNAUTHORIZED
+    assert api_client.post(url, {'refresh': rotated}).status_code == status.HTTP_200_OK
+
+
+@pytest.mark.django_db
+def test_revocations_from_other_processes_are_picked_up(settings):
+    settings.TOKEN_REVOCATION = {**settings.TOKEN_REVOCATION, 'REFRESH_INTERVAL': 0}
+    local = RevocationList()
+    assert not local.is_revoked('revoked-elsewhere')
+
+    # Запись, добавленная другим процессом, видна после очередного дочитывания
+    RevokedToken.objects.create(jti='revoked-elsewhere', expires_at=timezone.now() + timedelta(hours=1))
+    assert local.is_revoked('revoked-elsewhere')
+
+    # Истекшие записи не попадают в фильтр при полной перестройке
+    RevokedToken.objects.create(jti='expired', expires_at=timezone.now() - timedelta(hours=1))
+    settings.TOKEN_REVOCATION = {**settings.TOKEN_REVOCATION, 'REBUILD_INTERVAL': 0}
+    local.refresh(force=True)
+    assert 'expired' not in local._bloom
+    assert 'revoked-elsewhere' in local._bloom
+
+
+@pytest.mark.django_db
+def test_revocation_committed_out_of_id_order_is_picked_up(settings):
+    settings.TOKEN_REVOCATION = {**settings.TOKEN_REVOCATION, 'REFRESH_INTERVAL': 0, 'REBUILD_INTERVAL': 3600}
+    expires_at = timezone.now() + timedelta(hours=1)
+    RevokedToken.objects.create(pk=100, jti='later-id', expires_at=expires_at)
+    local = RevocationList()
+    local.refresh(force=True)
+
+    # Транзакция с меньшим id зафиксирована после записи с id 100
+    RevokedToken.objects.create(pk=50, jti='earlier-id', expires_at=expires_at)
+    count = local._bloom.count
+
+    assert local.is_revoked('earlier-id')
+    assert local._bloom.count == count + 1
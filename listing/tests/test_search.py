@@ -0,0 +1,82 @@
+import pytest
+from django.urls import reverse
+from rest_framework import status
+from listing.models import Property, PropertySearchTerm
+from listing.search import MySQLFulltextSearchBackend, tokenize
+
+
+@pytest.fixture
+def flat(db, landlord_user):
+    return Property.objects.create(
+        title='Квартира в центре',
+        description='Прекрасная квартира в центре Берлина',
+        location='Berlin',
+        price=1000,
+        room_count=2,
+        property_type='apartment',
+        owner=landlord_user
+    )
+
+
+@pytest.fixture
+def house(db, landlord_user):
+    return Property.objects.create(
+        title='Уютный дом в Мюнхене',
+        description='Большой дом с садом, рядом квартира соседей',
+        location='Munich',
+        price=2000,
+        room_count=4,
+        property_type='house',
+        owner=landlord_user
+    )
+
+
+def search(api_client, query, **params):
+    response = api_client.get(reverse('api:properties-list'), {'search': query, **params})
+    assert response.status_code == status.HTTP_200_OK
+    return [item['title'] for item in response.data]
+
+
+def test_tokenize_is_case_insensitive():
+    assert tokenize('Квартира в ЦЕНТРЕ, 2 rooms!') == ['квартира', 'в', 'центре', '2', 'rooms']
+
+
+def test_mysql_boolean_query_requires_every_prefix():
+    assert MySQLFulltextSearchBackend.build_boolean_query('Дом, сад') == '+дом* +сад*'
+
+
+@pytest.mark.django_db
+def test_search_is_case_insensitive_and_matches_prefixes(api_client, flat, house):
+    assert search(api_client, 'квартира') == [flat.title, house.title]
+    assert search(api_client, 'САД') == [house.title]
+    assert search(api_client, 'мюнх') == [house.title]
+
+
+@pytest.mark.django_db
+def test_search_requires_all_terms(api_client, flat, house):
+    assert search(api_client, 'квартира берлина') == [flat.title]
+    assert search(api_client, 'квартира пляж') == []
+
+
+@pytest.mark.django_db
+def test_explicit_ordering_overrides_rank(api_client, flat, house):
+    assert search(api_client, 'квартира', ordering='-price') == [house.title, flat.title]
+
+
+@pytest.mark.django_db
+def test_index_follows_save_and_delete(api_client, flat):
+    flat.title = 'Лофт у реки'
+    flat.save()
+    assert search(api_client, 'лофт') == ['Лофт у реки']
+
+    flat.delete()
+    assert not PropertySearchTerm.objects.exists()
+
+
+@pytest.mark.django_db
+def test_search_results_can_be_paginated(api_client, flat, house):
+    response = api_client.get(reverse('api:properties-list'), {'search': 'квартира', 'page_size': 1})
+    assert [item['title'] for item in response.data['results']] == [flat.title]
+    response = api_client.get(response.data['next'])
+    assert [item['title'] for item in response.data['results']] == [house.title]
+    assert response.data['next'] is None
@@ -0,0 +1,107 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from django.test import AsyncClient
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import AccessToken
+from listing.metrics import registry
+from listing.models import Notification
+from listing.notifications import add_unread
+from listing.streaming import event_stream, notification_hub
+
+
+def read_events(url, count, **headers):
+    async def run():
+        response = await AsyncClient().get(url, headers=headers)
+        if not response.streaming:
+            return response, []
+        content = aiter(response.streaming_content)
+        chunks = [await anext(content) for _ in range(count)]
+        await content.aclose()
+        return response, [chunk.decode() if isinstance(chunk, bytes) else chunk for chunk in chunks]
+    return asyncio.run(run())
+
+
+@pytest.mark.django_db(transaction=True)
+def test_stream_resumes_after_last_event_id(tenant_user):
+    first, second, third = [
+        Notification.objects.create(recipient=tenant_user, event_type='new_review', content=f'Review {i}')
+        for i in range(3)
+    ]
+    token = AccessToken.for_user(tenant_user)
+
+    response, events = read_events(
+        reverse('api:notification-stream'), 3,
+        Authorization=f'Bearer {token}', **{'Last-Event-ID': str(first.pk)}
+    )
+    assert response['Content-Type'] == 'text/event-stream'
+    assert events[0].startswith('retry:')
+    assert events[1].startswith(f'id: {second.pk}\nevent: notification\n')
+    assert '"content": "Review 2"' in events[2]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_stream_requires_authentication():
+    response, _ = read_events(reverse('api:notification-stream'), 0)
+    assert response.status_code == 401
+
+
+class FakeNotification:
+    def __init__(self, pk):
+        self.pk = pk
+
+
+def test_stream_wakes_up_on_publish_and_sends_heartbeats(monkeypatch):
+    monkeypatch.setattr('listing.streaming.format_event', lambda notification: f'id: {notification.pk}\n\n')
+    stored = []
+
+    async def fetch(user_id, last_id):
+        return [notification for notification in stored if notification.pk > last_id]
+
+    def publish_later():
+        # Публикация из другого потока (как из фоновой доставки уведомлений)
+        time.sleep(0.05)
+        stored.append(FakeNotification(1))
+        notification_hub.publish([42])
+
+    async def run():
+        idle = event_stream(user_id=7, last_id=0, fetch=fetch, heartbeat=0.05)
+        assert (await anext(idle)).startswith('retry:')
+        assert await anext(idle) == ': heartbeat\n\n'
+        await idle.aclose()
+
+        stream = event_stream(user_id=42, last_id=0, fetch=fetch, heartbeat=30)
+        assert (await anext(stream)).startswith('retry:')
+        threading.Thread(target=publish_later).start()
+        # Сообщение приходит по сигналу хаба, задолго до heartbeat
+        assert await asyncio.wait_for(anext(stream), 1) == 'id: 1\n\n'
+        assert notification_hub.connections() == 1
+
+        await stream.aclose()
+        assert notification_hub.connections() == 0
+
+    asyncio.run(run())
+
+
+class UnavailableBackend:
+    def __init__(self, hub):
+        pass
+
+    def start(self):
+        pass
+
+    def publish(self, user_ids):
+        raise ConnectionError('Redis is down')
+
+
+@pytest.mark.django_db(transaction=True)
+def test_publish_failure_does_not_fail_the_write(monkeypatch, landlord_user, caplog):
+    monkeypatch.setattr(notification_hub, '_backend', UnavailableBackend(notification_hub))
+    registry.reset()
+
+    add_unread({landlord_user.pk: 1})
+
+    assert registry.value('notification_stream.publish_errors') == 1
+    assert 'Failed to publish notification signal' in caplog.text
@@ -1,5 +1,15 @@
+import csv
+
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework import viewsets, filters
+from django_filters.utils import translate_validation
+from django.conf import settings
+from django.utils.dateparse import parse_date
+from rest_framework import status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.generics import get_object_or_404
+from rest_framework.response import Response
+from rest_framework.views import APIView
 from .models import (
     Property,
     Booking,
@@ -9,7 +19,7 @@ from .models import (
     ViewHistory,
     Notification
     )
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from .serializers import (
     PropertySerializer,
     BookingSerializer,
@@ -17,77 +27,213 @@ from .serializers import (
     UserSerializer,
     SearchHistorySerializer,
     ViewHistorySerializer,
-    NotificationSerializer
+    NotificationSerializer,
+    MarkReadSerializer,
+    BulkPropertySerializer,
+)
+from .availability import MAX_AVAILABILITY_WINDOW, free_ranges, save_booking
+from .bulk import parse_csv, save_properties
+from .cache import CachedReadMixin, property_cache
+from .counters import view_counter
+from .export import EXPORT_RENDERERS, export_response
+from .facets import FACET_PARAMS, cached_groups, count_facets
+from .filters import PropertyFilter, PropertySearchFilter, RankedOrderingFilter
+from .history import search_history_buffer, view_history_buffer
+from .metrics import registry
+from .notifications import (
+    mark_read,
+    notify_booking_created,
+    notify_booking_status_changed,
+    notify_new_review,
+    unread_count,
 )
+from .pagination import KeysetPagination
 from .permissions import (
     IsLandlordOrReadOnly,
     IsOwnerOrLandlordBooking,
     IsAuthenticatedOrReadOnly,
     IsOwnerOrReadOnly
 )
+from .profiling import SORT_KEYS, perf_buffer, summarize
+from .recommendations import recommend
 
 
-class PropertyViewSet(viewsets.ModelViewSet):
-    queryset = Property.objects.all()
-    serializer_class = PropertySerializer
-
-class BookingViewSet(viewsets.ModelViewSet):
-    queryset = Booking.objects.all()
-    serializer_class = BookingSerializer
-    permission_classes = [IsAuthenticated, IsOwnerOrReadOnly]
-
-    def perform_create(self, serializer):
-        booking = serializer.save(user=self.request.user)
-        notify_booking_created(booking)  # Уведомление о создании бронирования
-
-    def perform_update(self, serializer):
-        booking = serializer.save()
-        notify_booking_status_changed(booking)  # Уведомление о смене статуса бронирования
-
+# Размер списка рекомендаций по умолчанию и наибольший
+RECOMMENDED_LIMIT = 10
+MAX_RECOMMENDED_LIMIT = 50
 
-class ReviewViewSet(viewsets.ModelViewSet):
-    queryset = Review.objects.all()
-    serializer_class = ReviewSerializer
-    permission_classes = [IsAuthenticated, IsOwnerOrReadOnly]
-
-    def perform_create(self, serializer):
-        review = serializer.save(user=self.request.user)
-        notify_new_review(review)  # Уведомление о новом отзыве
 
 class UserViewSet(viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
 
-class PropertyViewSet(viewsets.ModelViewSet):
-    queryset = Property.objects.all()
+class PropertyViewSet(CachedReadMixin, viewsets.ModelViewSet):
+    queryset = Property.objects.with_summary()
     serializer_class = PropertySerializer
     permission_classes = [IsLandlordOrReadOnly]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
 
+    # Подключаем фильтры
+    filter_backends = [
+        DjangoFilterBackend,
+        PropertySearchFilter,
+        RankedOrderingFilter,
+    ]
+
+    # Поиск по ключевым словам в полях title и description
+    # через бэкенд из settings.PROPERTY_SEARCH_BACKEND (см. listing.search)
     search_fields = ['title', 'description']
-    filterset_fields = {
-        'price': ['gte', 'lte'],
-        'location': ['exact'],
-        'room_count': ['gte', 'lte'],
-        'property_type': ['exact'],
-    }
-    ordering_fields = ['price', 'created_at']
-    ordering = ['-created_at']
+
+    # Настройка фильтрации: цена, местоположение, комнаты, тип, свободные даты и координаты
+    filterset_class = PropertyFilter
+
+    # Настройка сортировки
+    # Сортировка по цене, дате добавления, рейтингу, популярности и расстоянию (при ?near=)
+    ordering_fields = ['price', 'created_at', 'rating_avg', 'trending', 'distance']
+    ordering = ['-created_at']  # По умолчанию сортируем по дате добавления (новые сначала)
+
+    # Keyset-пагинация включается параметрами `page_size` или `cursor`
+    pagination_class = KeysetPagination
 
     def list(self, request, *args, **kwargs):
         # Сохраняем историю поиска, если присутствует параметр `search`
+        # (запись в БД откладывается, см. listing.history)
         search_query = request.query_params.get('search', None)
         if search_query and request.user.is_authenticated:
-            SearchHistory.objects.create(user=request.user, keyword=search_query)
+            search_history_buffer.add(user_id=request.user.pk, keyword=search_query[:255])
         return super().list(request, *args, **kwargs)
 
     def retrieve(self, request, *args, **kwargs):
-        # Сохраняем историю просмотра при доступе к конкретному объекту
+        # Ответ может прийти из кэша (см. listing.cache), поэтому просмотр
+        # учитываем по pk из URL после успешного ответа
         response = super().retrieve(request, *args, **kwargs)
-        if request.user.is_authenticated:
-            ViewHistory.objects.create(user=request.user, property=self.get_object())
+        if response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            property_id = int(kwargs['pk'])
+            # Счетчик просмотров накапливается в памяти и сбрасывается в БД периодически
+            view_counter.incr(property_id)
+            # Сохраняем историю просмотра при доступе к конкретному объекту
+            if request.user.is_authenticated:
+                view_history_buffer.add(user_id=request.user.pk, property_id=property_id)
         return response
 
+    @action(detail=True, methods=['get'])
+    def availability(self, request, pk=None):
+        """
+        Свободные даты объекта в окне [from, to): GET /api/properties/{id}/availability/?from=&to=
+        """
+        prop = get_object_or_404(Property.objects.only('id'), pk=pk)
+        try:
+            date_from = parse_date(request.query_params.get('from') or '')
+            date_to = parse_date(request.query_params.get('to') or '')
+        except ValueError:
+            # Формат верный, но такой даты нет (например, 2025-02-30)
+            date_from = date_to = None
+        if date_from is None or date_to is None:
+            raise ValidationError({'detail': 'Параметры from и to обязательны (YYYY-MM-DD).'})
+        if date_from >= date_to or date_to - date_from > MAX_AVAILABILITY_WINDOW:
+            raise ValidationError({'detail': 'Некорректный диапазон дат.'})
+
+        return Response({
+            'property': prop.pk,
+            'from': date_from,
+            'to': date_to,
+            'free': [{'start': start, 'end': end} for start, end in free_ranges(prop.pk, date_from, date_to)],
+        })
+
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """
+        Массовое создание и обновление объектов: JSON-массив или CSV-файл в поле `file`.
+        Строки с `id` обновляют свои объекты. При ошибках ничего не записывается,
+        а в ответе перечисляются строки с ошибками.
+        """
+        upload = request.FILES.get('file')
+        if upload is None:
+            rows = request.data
+        else:
+            try:
+                rows = parse_csv(upload)
+            except (UnicodeDecodeError, csv.Error):
+                # Например, выгрузка Excel в cp1251 или UTF-16, либо не текстовый файл
+                return Response(
+                    {'file': ['Ожидается CSV-файл в кодировке UTF-8.']},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+        serializer = BulkPropertySerializer(data=rows, many=True, context=self.get_serializer_context())
+        if not serializer.is_valid():
+            errors = serializer.errors
+            if isinstance(errors, list):
+                errors = {'errors': [{'row': index, 'errors': error} for index, error in enumerate(errors) if error]}
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+
+        created, updated = save_properties(request.user, serializer.validated_data)
+        return Response(
+            {'created': [prop.pk for prop in created], 'updated': [prop.pk for prop in updated]},
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK,
+        )
+
+    @action(detail=False, methods=['get'])
+    def facets(self, request):
+        """
+        Счетчики фасетов (тип, город, комнаты, цена, категории) с теми же фильтрами,
+        что у списка: GET /api/properties/facets/?...
+        """
+        return property_cache.respond(
+            request,
+            lambda: property_cache.list_key(request, kind='facets'),
+            lambda: self.compute_facets(request),
+        )
+
+    def compute_facets(self, request):
+        filterset = PropertyFilter(request.query_params, queryset=Property.objects.all(), request=request)
+        if not filterset.is_valid():
+            raise translate_validation(filterset.errors)
+        selected = {name: filterset.form.cleaned_data.get(name) for name in FACET_PARAMS}
+
+        # Группы строятся без фасетных фильтров: они применяются к группам в listing.facets
+        params = request.query_params.copy()
+        for name in FACET_PARAMS:
+            params.pop(name, None)
+        queryset = PropertyFilter(params, queryset=Property.objects.all(), request=request).qs
+        queryset = PropertySearchFilter().filter_queryset(request, queryset, self)
+        return Response(count_facets(cached_groups(request, queryset), selected))
+
+    @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
+    def recommended(self, request):
+        """
+        Рекомендации по последним просмотрам пользователя: GET /api/properties/recommended/?limit=
+        """
+        try:
+            limit = int(request.query_params.get('limit', RECOMMENDED_LIMIT))
+        except ValueError:
+            raise ValidationError({'limit': 'Ожидается целое число.'})
+        if not 1 <= limit <= MAX_RECOMMENDED_LIMIT:
+            raise ValidationError({'limit': f'Допустимо от 1 до {MAX_RECOMMENDED_LIMIT}.'})
+
+        serializer = self.get_serializer(recommend(request.user.pk, limit, Property.objects.with_summary()), many=True)
+        return Response(serializer.data)
+
+    # Колонки выгрузки: имя в выгрузке -> поле queryset
+    export_fields = {
+        'id': 'id',
+        'title': 'title',
+        'location': 'location',
+        'price': 'price',
+        'room_count': 'room_count',
+        'property_type': 'property_type',
+        'status': 'status',
+        'views': 'views',
+        'created_at': 'created_at',
+    }
+
+    @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated], renderer_classes=EXPORT_RENDERERS)
+    def export(self, request):
+        """
+        Потоковая выгрузка объектов текущего арендодателя с фильтрами списка:
+        GET /api/properties/export/?format=ndjson|csv|json
+        """
+        queryset = self.filter_queryset(Property.objects.filter(owner=request.user))
+        return export_response(request.accepted_renderer, queryset, self.export_fields, 'properties')
+
 
 class BookingViewSet(viewsets.ModelViewSet):
     queryset = Booking.objects.all()
@@ -118,43 +264,49 @@ class BookingViewSet(viewsets.ModelViewSet):
 
         return Booking.objects.none()  # Другие пользователи не имеют доступа
 
-class ReviewViewSet(viewsets.ModelViewSet):
-    queryset = Review.objects.all()
-    serializer_class = ReviewSerializer
-    permission_classes = [IsAuthenticatedOrReadOnly]
+    def perform_create(self, serializer):
+        booking = save_booking(serializer, user=self.request.user)  # С проверкой пересечения дат
+        notify_booking_created(booking)  # Уведомление о создании бронирования
 
+    def perform_update(self, serializer):
+        booking = save_booking(serializer)
+        notify_booking_status_changed(booking)  # Уведомление о смене статуса бронирования
 
-class PropertyViewSet(viewsets.ModelViewSet):
-    queryset = Property.objects.all()
-    serializer_class = PropertySerializer
-    permission_classes = [IsLandlordOrReadOnly]
+    # Колонки выгрузки: имя в выгрузке -> поле queryset
+    export_fields = {
+        'id': 'id',
+        'property': 'property_id',
+        'property_title': 'property__title',
+        'user': 'user_id',
+        'start_date': 'start_date',
+        'end_date': 'end_date',
+        'status': 'status',
+        'created_at': 'created_at',
+    }
 
-    # Подключаем фильтры
-    filter_backends = [
-        DjangoFilterBackend,
-        filters.SearchFilter,
-        filters.OrderingFilter,
-    ]
+    @action(detail=False, methods=['get'], renderer_classes=EXPORT_RENDERERS)
+    def export(self, request):
+        """
+        Потоковая выгрузка всех доступных пользователю бронирований:
+        GET /api/bookings/export/?format=ndjson|csv|json
+        """
+        return export_response(request.accepted_renderer, self.get_queryset(), self.export_fields, 'bookings')
 
-    # Настройка поиска по ключевым словам в полях title и description
-    search_fields = ['title', 'description']
 
-    # Настройка фильтрации
-    filterset_fields = {
-        'price': ['gte', 'lte'],  # Фильтрация по минимальной и максимальной цене
-        'location': ['exact'],  # Фильтрация по местоположению
-        'room_count': ['gte', 'lte'],  # Фильтрация по диапазону количества комнат
-        'property_type': ['exact'],  # Фильтрация по типу жилья
-    }
+class ReviewViewSet(viewsets.ModelViewSet):
+    queryset = Review.objects.all()
+    serializer_class = ReviewSerializer
+    permission_classes = [IsAuthenticatedOrReadOnly]
 
-    # Настройка сортировки
-    ordering_fields = ['price', 'created_at']  # Сортировка по цене и дате добавления
-    ordering = ['-created_at']  # По умолчанию сортируем по дате добавления (новые сначала)
+    def perform_create(self, serializer):
+        review = serializer.save(user=self.request.user)
+        notify_new_review(review)  # Уведомление о новом отзыве
 
 
 class SearchHistoryViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = SearchHistorySerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         # Пропускаем выполнение при генерации схемы Swagger
@@ -167,6 +319,7 @@ class SearchHistoryViewSet(viewsets.ReadOnlyModelViewSet):
 class ViewHistoryViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = ViewHistorySerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         # Пропускаем выполнение при генерации схемы Swagger
@@ -175,37 +328,10 @@ class ViewHistoryViewSet(viewsets.ReadOnlyModelViewSet):
 
         return ViewHistory.objects.filter(user=self.request.user)
 
-def notify_booking_created(booking):
-    content = f'New booking created by {booking.user.username} for property {booking.property.title}.'
-    Notification.objects.create(
-        recipient=booking.property.owner,
-        event_type='booking_created',
-        content=content,
-        related_object_id=booking.id
-    )
-
-def notify_booking_status_changed(booking):
-    content = f'Booking status changed to {booking.status} for property {booking.property.title}.'
-    Notification.objects.create(
-        recipient=booking.user,
-        event_type='booking_status_changed',
-        content=content,
-        related_object_id=booking.id
-    )
-
-def notify_new_review(review):
-    content = f'New review from {review.user.username} on property {review.property.title}.'
-    Notification.objects.create(
-        recipient=review.property.owner,
-        event_type='new_review',
-        content=content,
-        related_object_id=review.id
-    )
-
-
 class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = NotificationSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         # Проверка, если это запрос на генерацию схемы, возвращаем пустой QuerySet
@@ -213,4 +339,54 @@ class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
             return Notification.objects.none()
 
         # Фильтрация уведомлений для текущего пользователя
-        return Notification.objects.filter(recipient=self.request.user).order_by('-created_at')
\ No newline at end of file
+        return Notification.objects.filter(recipient=self.request.user).order_by('-created_at')
+
+    @action(detail=False, methods=['get'], url_path='unread-count')
+    def unread_count(self, request):
+        """
+        Число непрочитанных уведомлений из счетчика пользователя, без COUNT(*).
+        """
+        return Response({'unread': unread_count(request.user)})
+
+    @action(detail=False, methods=['post'], url_path='mark-read')
+    def mark_read(self, request):
+        """
+        Отмечает прочитанными уведомления из списка `ids` или все до `up_to_id` включительно.
+        """
+        serializer = MarkReadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        marked = mark_read(request.user, **serializer.validated_data)
+        return Response({'marked': marked, 'unread': unread_count(request.user)})
+
+
+class MetricsView(APIView):
+    """
+    Метрики текущего процесса (буферы, кэши, очереди). Доступно только персоналу.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(registry.snapshot())
+
+
+class PerfView(APIView):
+    """
+    Самые медленные обработчики API по записям профилирования всех процессов
+    (listing.profiling): GET /api/_perf/?sort=p95_ms&limit=20. Доступно только персоналу.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        sort = request.query_params.get('sort', 'p95_ms')
+        if sort not in SORT_KEYS:
+            raise ValidationError({'sort': f'Одно из: {", ".join(SORT_KEYS)}.'})
+        try:
+            limit = int(request.query_params.get('limit', 20))
+        except ValueError:
+            raise ValidationError({'limit': 'Ожидается целое число.'})
+        records = perf_buffer.published()
+        return Response({
+            'enabled': settings.PERF_PROFILING['ENABLED'],
+            'requests': len(records),
+            'views': summarize(records, sort, limit),
+        })
@@ -51,6 +51,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Первым, чтобы время ответа включало остальные middleware; выключенный не стоит ничего
+    'listing.profiling.PerfProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -142,14 +144,79 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
-        'rest_framework.authentication.BasicAuthentication',  # Уберите, если не нужен
+        # Варианты JWTAuthentication и BasicAuthentication с кэшем пользователя
+        # и проверенных паролей (см. listing.authentication)
+        'listing.authentication.CachedJWTAuthentication',
+        'listing.authentication.CachedBasicAuthentication',  # Уберите, если не нужен
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
 }
 
+# Бэкенд полнотекстового поиска по объектам жилья (?search=).
+# Для MySQL FULLTEXT: 'listing.search.MySQLFulltextSearchBackend'
+PROPERTY_SEARCH_BACKEND = os.getenv('PROPERTY_SEARCH_BACKEND', 'listing.search.InvertedIndexSearchBackend')
+
+# Отложенная запись истории поиска и просмотров (listing.history)
+HISTORY_BUFFER = {
+    'MAX_SIZE': 500,  # Сбрасываем в БД при накоплении стольких записей
+    'FLUSH_INTERVAL': 5.0,  # ...или не реже, чем раз в столько секунд
+}
+
+# Счетчик просмотров объектов жилья (listing.counters)
+VIEW_COUNTER = {
+    'SHARDS': 16,  # Число шардов счетчика в памяти процесса
+    'FLUSH_INTERVAL': 10.0,  # Период сброса накопленных просмотров в БД, секунды
+}
+
+# Конвейер уведомлений (listing.notifications): очередь и размер пачки доставки
+NOTIFICATION_QUEUE = {
+    'QUEUE': 'listing.notifications.thread_queue',  # или 'listing.notifications.immediate_queue'
+    'MAX_SIZE': 500,  # Доставляем при накоплении стольких событий
+    'FLUSH_INTERVAL': 1.0,  # ...или не реже, чем раз в столько секунд
+}
+
+# Поток уведомлений /api/notifications/stream/ (listing.streaming). Для нескольких
+# процессов ASGI: 'listing.streaming.RedisHubBackend' и REDIS_URL
+NOTIFICATION_HUB = {
+    'BACKEND': os.getenv('NOTIFICATION_HUB_BACKEND', 'listing.streaming.LocalHubBackend'),
+    'REDIS_URL': os.getenv('REDIS_URL'),
+    'HEARTBEAT': 15.0,  # Интервал комментариев-heartbeat в простаивающем потоке, секунды
+    'RETRY_MS': 3000,  # Задержка переподключения EventSource, миллисекунды
+    'RECONNECT_MAX_DELAY': 30.0,  # Наибольшая пауза между попытками переподключения к Redis, секунды
+}
+
+# Кэши: 'api' хранит ответы анонимных запросов к объектам жилья (см. listing.cache).
+# В production задается REDIS_URL, иначе используется память процесса.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'api': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.getenv('REDIS_URL'),
+    } if os.getenv('REDIS_URL') else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'api',
+    },
+}
+
+API_CACHE = {
+    'ALIAS': 'api',
+    # Изменения объектов инвалидируют ответы сразу; TTL ограничивает
+    # устаревание полей, которые обновляются в обход сигналов (views)
+    'TIMEOUT': 300,
+}
+
+# Кэш аутентификации (listing.authentication). Общий кэш 'api' нужен, чтобы смена
+# пароля или деактивация сбрасывали записи сразу во всех процессах
+AUTH_CACHE = {
+    'ALIAS': 'api',
+    'CREDENTIALS_TTL': 60,  # Сколько секунд пара логин/пароль не проверяется повторно
+    'USER_TTL': 300,  # Время жизни закэшированного пользователя, секунды
+}
+
 # auth user model
 AUTH_USER_MODEL = 'listing.User'
 
@@ -162,6 +229,77 @@ SIMPLE_JWT = {
     'ALGORITHM': 'HS256',
     'SIGNING_KEY': SECRET_KEY,
     'AUTH_HEADER_TYPES': ('Bearer',),
+    # Отзыв токенов при ротации без token_blacklist: bloom-фильтр в памяти
+    # и таблица RevokedToken (listing.revocation)
+    'TOKEN_REFRESH_SERIALIZER': 'listing.revocation.RevocationTokenRefreshSerializer',
+    'TOKEN_VERIFY_SERIALIZER': 'listing.revocation.RevocationTokenVerifySerializer',
+}
+
+TOKEN_REVOCATION = {
+    'REFRESH_INTERVAL': 5.0,  # Как часто дочитывать новые отзывы из БД, секунды
+    'REBUILD_INTERVAL': 3600.0,  # Полная перестройка фильтра без истекших токенов, секунды
+    'LAG_SECONDS': 30,  # Перекрытие при дочитывании по revoked_at: запас на долгие транзакции и разницу часов
+    'CAPACITY': 100000,  # Начальная емкость bloom-фильтра
+    'ERROR_RATE': 0.001,  # Допустимая доля ложноположительных срабатываний
+}
+
+# Популярность объектов для ?ordering=-trending (listing.popularity, команда compute_trending)
+POPULARITY = {
+    'HALF_LIFE_DAYS': 7.0,  # За это время вклад события уменьшается вдвое
+    'WEIGHTS': {'views': 1.0, 'searches': 0.5, 'bookings': 5.0},  # Вес одного события источника
+    'SEARCH_MATCHES': 20,  # Сколько лучших результатов поиска получают вклад поискового запроса
+    'LAG_SECONDS': 60,  # Не читаем записи моложе этого: они могут еще фиксироваться
+    'CHUNK_SIZE': 10000,  # Записей истории в одной пачке
+}
+
+# Поиск по координатам (listing.geo). После изменения CELL_DEGREES: manage.py rebuild_geo_index
+GEO = {
+    'CELL_DEGREES': 0.1,  # Размер ячейки сетки, ~11 км по широте
+    'MAX_CELL_ROWS': 64,  # Больше строк сетки — вся полоса широт читается одним диапазоном
+    'MAX_RADIUS_KM': 500,  # Наибольший radius_km в ?near=
+}
+
+# Счетчики фасетов /api/properties/facets/ (listing.facets)
+FACETS = {
+    'PRICE_EDGES': [500, 1000, 1500, 2000, 3000],  # Границы диапазонов цены
+    'ROOMS_MAX': 5,  # Объекты с большим числом комнат считаются вместе («5+»)
+    'LOCATIONS_LIMIT': 20,  # Сколько городов с наибольшим числом объектов показывать
+}
+
+# Рекомендации по совместным просмотрам (listing.recommendations, команда build_similarity)
+RECOMMENDATIONS = {
+    'TOP_K': 20,  # Соседей, хранимых для каждого объекта
+    'HISTORY_DAYS': 180,  # Просмотры старше не учитываются
+    'MIN_COVIEWS': 2,  # Меньше общих зрителей — не сосед
+    'MAX_USER_ITEMS': 500,  # Пользователи с большим числом просмотренных объектов (боты) пропускаются
+    'BLOCK_SIZE': 2048,  # Строк матрицы близости в памяти при построении
+    'CHUNK_SIZE': 50000,  # Записей истории в одном запросе при построении
+    'RECENT_VIEWS': 20,  # Последних просмотров пользователя, по которым строятся рекомендации
+    'RECENCY_DECAY': 0.9,  # Вес каждого следующего (более старого) просмотра
+}
+
+# Битовый индекс фильтров списка объектов в памяти процесса (listing.bitmaps, команда bitmap_index)
+BITMAP_INDEX = {
+    'ENABLED': os.getenv('BITMAP_INDEX_ENABLED', '0') == '1',
+    'SNAPSHOT_PATH': os.getenv('BITMAP_INDEX_SNAPSHOT'),  # Файл снимка для быстрого старта; None — без снимка
+    'REFRESH_INTERVAL': 5.0,  # Как часто дочитывать изменения других процессов, секунды
+    'REBUILD_INTERVAL': 3600.0,  # Полная перестройка (убирает объекты, удаленные в других процессах), секунды
+    'LAG_SECONDS': 30,  # Запас при дочитывании на транзакции, зафиксированные позже своего updated_at
+    'MAX_IDS': 500,  # Больше подходящих объектов — фильтрует ORM: он быстрее находит страницу по индексу сортировки
+    'MEMORY_BUDGET_MB': 64,  # Больше — индекс не используется
+    'CHUNK_SIZE': 10000,  # Строк в одном запросе при построении
+}
+
+# Профилирование запросов API (listing.profiling, GET /api/_perf/, команда perf_report)
+PERF_PROFILING = {
+    'ENABLED': os.getenv('PERF_PROFILING_ENABLED', '0') == '1',
+    'SAMPLE_RATE': 1.0,  # Доля профилируемых запросов
+    'BUFFER_SIZE': 5000,  # Последних запросов в кольцевом буфере процесса
+    'N_PLUS_ONE_THRESHOLD': 5,  # Столько выполнений одного шаблона SQL за запрос — признак N+1
+    'PUBLISH_INTERVAL': 10.0,  # Как часто публиковать буфер в общий кэш, секунды
+    'RETENTION': 3600,  # Сколько хранить опубликованные записи процесса, секунды
+    'CACHE_ALIAS': 'api',  # Общий для процессов кэш
+    'EXCLUDE_PATHS': ['/api/_perf/', '/api/metrics/', '/api/notifications/stream/'],
 }
 
 # Swagger settings
@@ -16,8 +16,12 @@ from listing.views import (
     UserViewSet,
     SearchHistoryViewSet,
     ViewHistoryViewSet,
-    NotificationViewSet
+    NotificationViewSet,
+    MetricsView,
+    PerfView,
 )
+from listing.async_views import AsyncPropertyView
+from listing.streaming import notification_stream
 
 # Настройка схемы Swagger для документации API
 schema_view = get_schema_view(
@@ -45,7 +49,14 @@ urlpatterns = [
     path('api/', include(([
         path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
         path('redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
+        # До маршрутов роутера, иначе 'stream' совпадет с notifications/<pk>/
+        path('notifications/stream/', notification_stream, name='notification-stream'),
+        # Асинхронные обработчики чтения объектов для ASGI (listing.async_views)
+        path('async/properties/', AsyncPropertyView.as_view(), name='async-properties-list'),
+        path('async/properties/<int:pk>/', AsyncPropertyView.as_view(), name='async-properties-detail'),
         path('', include(router.urls)),
+        path('metrics/', MetricsView.as_view(), name='metrics'),
+        path('_perf/', PerfView.as_view(), name='perf'),
         path('token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
         path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
         path('token/verify/', TokenVerifyView.as_view(), name='token_verify'),